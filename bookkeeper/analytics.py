@@ -0,0 +1,199 @@
+"""
+Столбцовая аналитика расходов
+
+Модуль хранит снимок таблицы расходов в виде массивов numpy (сумма,
+категория, дата в секундах от начала эпохи) и вычисляет по нему группировки
+по категориям и периодам, процентили и скользящие средние векторными
+операциями, без создания объектов Expense.
+
+numpy - необязательная зависимость, она устанавливается вместе
+с дополнением analytics:
+
+    poetry install -E analytics
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable
+
+import numpy as np
+from numpy.typing import NDArray
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.connection_pool import EPOCH
+from bookkeeper.repository.query import Period
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+_DAY = 86400
+
+_ROW = np.dtype([('amount', np.float64), ('category', np.int64), ('date', np.int64)])
+
+
+def _seconds(value: datetime | date) -> int:
+    """ Дата -> секунды от начала эпохи """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+class ExpenseColumns:
+    """
+    Снимок расходов по столбцам: amount (float64), category (int64)
+    и date (int64, секунды от начала эпохи). Снимок не меняется при
+    изменении репозитория - для актуальных данных загрузите его заново.
+    """
+
+    def __init__(
+        self,
+        amount: NDArray[np.float64],
+        category: NDArray[np.int64],
+        date_: NDArray[np.int64]
+    ) -> None:
+        self.amount = amount
+        self.category = category
+        self.date = date_
+
+    @classmethod
+    def _from_rows(cls, rows: NDArray[Any]) -> 'ExpenseColumns':
+        return cls(rows['amount'], rows['category'], rows['date'])
+
+    @classmethod
+    def from_expenses(cls, exps: Iterable[Expense]) -> 'ExpenseColumns':
+        """
+        Построить снимок по объектам Expense (например, из MemoryRepository).
+        """
+        return cls._from_rows(np.fromiter(
+            ((exp.amount, exp.category, _seconds(exp.expense_date)) for exp in exps),
+            dtype=_ROW
+        ))
+
+    @classmethod
+    def from_sqlite(
+        cls,
+        repo: SQLiteRepository[Expense],
+        where: dict[str, Any] | None = None
+    ) -> 'ExpenseColumns':
+        """
+        Загрузить снимок из базы данных одним запросом: дата переводится
+        в секунды средствами СУБД, строки результата сразу записываются
+        в массив, минуя объекты Expense.
+
+        Parameters
+        ----------
+        repo - репозиторий расходов
+        where - условие выборки (как в get_all)
+
+        Returns
+        -------
+        Объект ExpenseColumns
+        """
+        sql_where, params = repo.build_where(where)
+        date_ = "CAST(expense_date AS INTEGER)" if repo.epoch_dates \
+            else "CAST(strftime('%s', expense_date) AS INTEGER)"
+        query = f"SELECT amount, category, {date_} FROM {repo.table_name} "
+        query += sql_where
+        with repo.span("columns", query) as span, repo.pool.cursor() as cur:
+            cur.execute(query, params)
+            cols = cls._from_rows(np.fromiter(cur, dtype=_ROW))
+            if span is not None:
+                span.rows = len(cols)
+            return cols
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def _select(self, mask: NDArray[np.bool_]) -> 'ExpenseColumns':
+        return ExpenseColumns(self.amount[mask], self.category[mask], self.date[mask])
+
+    def between(self, start: datetime | date, end: datetime | date) -> 'ExpenseColumns':
+        """
+        Расходы с датой в отрезке [start, end]. Дата end без времени
+        включается целиком, как день в daily и total.
+        """
+        upper = self.date <= _seconds(end) if isinstance(end, datetime) \
+            else self.date < _seconds(end + timedelta(days=1))
+        return self._select((self.date >= _seconds(start)) & upper)
+
+    def in_categories(self, categories: Iterable[int]) -> 'ExpenseColumns':
+        """ Расходы указанных категорий """
+        return self._select(np.isin(self.category, list(categories)))
+
+    @staticmethod
+    def _group(
+        keys: NDArray[np.int64],
+        weights: NDArray[np.float64]
+    ) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """
+        Суммы weights по значениям keys: (значения, суммы). Ключи - небольшие
+        целые (id категорий, номера дней), поэтому группировка выполняется
+        подсчетом (bincount) без сортировки.
+        """
+        if len(keys) == 0:
+            return keys, weights
+        low = int(keys.min())
+        shifted = keys - low
+        present = np.flatnonzero(np.bincount(shifted))
+        sums = np.bincount(shifted, weights=weights)[present]
+        return present + low, np.asarray(sums, dtype=np.float64)
+
+    def by_category(self) -> dict[int, float]:
+        """ Суммы расходов по категориям """
+        cats, sums = self._group(self.category, self.amount)
+        return dict(zip(cats.tolist(), sums.tolist()))
+
+    def by_period(self, unit: str = 'day') -> dict[str, float]:
+        """
+        Суммы расходов по периодам ('day', 'week', 'month'). Ключи совпадают
+        с ключами группировки Period в AbstractRepository.aggregate.
+        """
+        period = Period('expense_date', unit)
+        days, sums = self._group(self.date // _DAY, self.amount)
+        result: dict[str, float] = {}
+        for day, total in zip(days.tolist(), sums.tolist()):
+            key = str(period.key(EPOCH + timedelta(days=day)))
+            result[key] = result.get(key, 0.0) + total
+        return result
+
+    def percentile(self, q: float) -> float | None:
+        """ Процентиль q (от 0 до 100) сумм расходов; None, если расходов нет """
+        if len(self) == 0:
+            return None
+        return float(np.percentile(self.amount, q))
+
+    def daily(self, start: date, end: date) -> NDArray[np.float64]:
+        """ Суммы расходов за каждый день отрезка [start, end] """
+        first = _seconds(start) // _DAY
+        count = _seconds(end) // _DAY - first + 1
+        days = self.date // _DAY - first
+        mask = (days >= 0) & (days < count)
+        sums = np.bincount(days[mask], weights=self.amount[mask], minlength=count)
+        return np.asarray(sums, dtype=np.float64)
+
+    def moving_average(self, window: int, start: date, end: date) -> dict[date, float]:
+        """
+        Скользящее среднее дневных сумм расходов за window последних дней
+        (для первых дней отрезка - за дни от start) для каждого дня [start, end].
+        """
+        daily = self.daily(start, end)
+        cumsum = np.concatenate(([0.0], np.cumsum(daily)))
+        right = np.arange(1, len(daily) + 1)
+        left = np.maximum(right - window, 0)
+        averages = (cumsum[right] - cumsum[left]) / (right - left)
+        return {
+            start + timedelta(days=i): value
+            for i, value in enumerate(averages.tolist())
+        }
+
+    def total(
+        self,
+        days: int,
+        category: int | None = None,
+        today: date | None = None
+    ) -> float:
+        """
+        Сумма расходов за последние days дней, включая сегодняшний
+        (как ExpenseTotals.total).
+        """
+        today = today or date.today()
+        cols = self if category is None else self.in_categories([category])
+        daily = cols.daily(today - timedelta(days=days - 1), today)
+        return float(daily.sum())
@@ -0,0 +1,393 @@
+"""
+Нагрузочное тестирование репозиториев на синтетических данных
+
+Модуль генерирует детерминированное (при одинаковом seed) дерево категорий
+и журнал расходов заданного размера, загружает их в репозитории разных типов
+и измеряет пропускную способность и задержки (процентили) операций add, get,
+get_all, update, delete и aggregate (набор "operations"), а также скорость
+чтения всего журнала с созданием объектов или кортежей (набор "scans").
+Результаты выводятся таблицей или в формате JSON для отслеживания регрессий:
+
+    python -m bookkeeper.bench --expenses 1000000 --json bench.json
+    python -m bookkeeper.bench --benchmarks scans --backends sqlite
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from functools import partial
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Iterator, Sequence
+
+from bookkeeper.instrumentation import percentile
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.connection_pool import ConnectionPool
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Between, Period
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import read_tree
+
+START = datetime(2020, 1, 1)
+
+
+def category_tree(depth: int = 3, fanout: int = 5) -> list[str]:
+    """
+    Текст дерева категорий для read_tree: fanout категорий верхнего уровня,
+    у каждой категории, кроме последнего уровня, - fanout подкатегорий.
+    Названия категорий составлены из номеров по пути от корня ("cat 2.1.4").
+    """
+
+    def lines(prefix: str, level: int) -> Iterator[str]:
+        for i in range(1, fanout + 1):
+            name = f"{prefix}.{i}" if prefix else str(i)
+            yield "    " * level + f"cat {name}"
+            if level + 1 < depth:
+                yield from lines(name, level + 1)
+
+    return list(lines("", 0))
+
+
+def generate_categories(
+    repo: AbstractRepository[Category],
+    depth: int = 3,
+    fanout: int = 5
+) -> list[Category]:
+    """
+    Создать в репозитории дерево категорий (см. category_tree).
+
+    Returns
+    -------
+    Список созданных категорий
+    """
+    return Category.create_from_tree(read_tree(category_tree(depth, fanout)), repo)
+
+
+def generate_expenses(
+    categories: Sequence[int],
+    count: int,
+    seed: int = 0,
+    days: int = 3 * 365
+) -> Iterator[Expense]:
+    """
+    Детерминированный журнал расходов: count записей со случайными суммами,
+    категориями из categories и датами в течение days дней от START
+    (дата добавления совпадает с датой расхода).
+    """
+    rnd = random.Random(seed)
+    seconds = days * 86400
+    for _ in range(count):
+        expense_date = START + timedelta(seconds=rnd.randrange(seconds))
+        yield Expense(
+            round(rnd.lognormvariate(5, 1.2), 2),
+            rnd.choice(categories),
+            expense_date=expense_date,
+            added_date=expense_date,
+            comment=rnd.choice(("", "", "", "наличные", "карта", "подарок"))
+        )
+
+
+@dataclass
+# pylint: disable-next=too-many-instance-attributes
+class BenchResult:
+    """
+    Результат измерения операции: число операций ops за seconds секунд,
+    пропускная способность (операций в секунду) и задержки одного вызова
+    в миллисекундах (p50, p95, p99, max). Для add_many вызов - загрузка
+    пакета записей.
+    """
+    backend: str
+    operation: str
+    ops: int
+    seconds: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+def measure(
+    backend: str,
+    operation: str,
+    calls: Sequence[Callable[[], Any]],
+    ops: int | None = None
+) -> BenchResult:
+    """
+    Выполнить calls по очереди, измеряя время каждого вызова.
+    ops - общее число операций во всех вызовах (по умолчанию - по одной
+    операции на вызов).
+    """
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(backend, operation, latencies, ops)
+
+
+def summarize(
+    backend: str,
+    operation: str,
+    latencies: Sequence[float],
+    ops: int | None = None
+) -> BenchResult:
+    """
+    Результат измерения по задержкам вызовов latencies (в миллисекундах).
+    ops - общее число операций (по умолчанию - число вызовов).
+    """
+    seconds = sum(latencies) / 1000
+    ops = len(latencies) if ops is None else ops
+    return BenchResult(
+        backend, operation, ops, seconds,
+        ops / seconds if seconds else 0.0,
+        percentile(latencies, 50), percentile(latencies, 95),
+        percentile(latencies, 99), max(latencies, default=0.0)
+    )
+
+
+def repositories(
+    backend: str,
+    db_file: str
+) -> tuple[AbstractRepository[Category], AbstractRepository[Expense]]:
+    """
+    Пустые репозитории категорий и расходов с индексами, как в simple_client.
+
+    Parameters
+    ----------
+    backend - тип репозиториев (см. BACKENDS)
+    db_file - файл базы данных (для "sqlite")
+
+    Returns
+    -------
+    Пара (репозиторий категорий, репозиторий расходов)
+    """
+    if backend == "memory":
+        return (
+            MemoryRepository[Category](indexes=["name", "parent"]),
+            MemoryRepository[Expense](
+                indexes=["category"], sorted_indexes=["expense_date"]
+            )
+        )
+    if backend == "sqlite":
+        pool = ConnectionPool(db_file, journal_mode="WAL", synchronous="NORMAL")
+        return (
+            SQLiteRepository[Category](
+                db_file, Category, pool, indexes=["name", "parent"]
+            ),
+            SQLiteRepository[Expense](
+                db_file, Expense, pool,
+                indexes=[("expense_date", "category", "amount"), "category"]
+            )
+        )
+    raise ValueError(f'unknown backend {backend}')
+
+
+def _update(repo: AbstractRepository[Expense], pk: int) -> None:
+    exp = repo.get(pk)
+    if exp is not None:
+        exp.amount += 1
+        repo.update(exp)
+
+
+def _aggregate(repo: AbstractRepository[Expense], month: int) -> None:
+    start = START + timedelta(days=30 * month)
+    repo.aggregate(
+        "amount", "sum",
+        {"expense_date": Between(start, start + timedelta(days=30))},
+        [Period("expense_date", "day"), "category"]
+    )
+
+
+BACKENDS = ("memory", "sqlite")
+BENCHMARKS = ("operations", "scans")
+
+
+def run_backend(
+    backend: str,
+    expenses: int,
+    ops: int,
+    seed: int = 0,
+    batch_size: int = 10000
+) -> list[BenchResult]:
+    """
+    Измерить операции репозиториев одного типа (см. BACKENDS).
+
+    Parameters
+    ----------
+    backend - тип репозиториев
+    expenses - число расходов в журнале
+    ops - число измеряемых одиночных операций каждого вида
+        (aggregate - в 10 раз меньше)
+    seed - начальное значение генератора случайных чисел
+    batch_size - размер пакета add_many при загрузке журнала
+
+    Returns
+    -------
+    Список результатов измерений
+    """
+    rnd = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        cat_repo, exp_repo = repositories(backend, os.path.join(tmp, "bench.db"))
+        cats = [cat.pk for cat in generate_categories(cat_repo)]
+        ledger = list(generate_expenses(cats, expenses, seed))
+        results = [measure(backend, "add_many", [
+            partial(exp_repo.add_many, ledger[i:i + batch_size])
+            for i in range(0, expenses, batch_size)
+        ], expenses)]
+        results.append(measure(backend, "add", [
+            partial(exp_repo.add, exp)
+            for exp in generate_expenses(cats, ops, seed + 1)
+        ]))
+        pks = [exp.pk for exp in exp_repo.get_all()]
+        results.append(measure(backend, "get", [
+            partial(exp_repo.get, pk) for pk in rnd.choices(pks, k=ops)
+        ]))
+        results.append(measure(backend, "get_all", [
+            partial(
+                exp_repo.get_all, {"category": c}, "-expense_date", 100
+            )
+            for c in rnd.choices(cats, k=ops)
+        ]))
+        results.append(measure(backend, "update", [
+            partial(_update, exp_repo, pk) for pk in rnd.choices(pks, k=ops)
+        ]))
+        results.append(measure(backend, "delete", [
+            partial(exp_repo.delete, pk)
+            for pk in rnd.sample(pks, min(ops, len(pks)))
+        ]))
+        results.append(measure(backend, "aggregate", [
+            partial(_aggregate, exp_repo, rnd.randrange(36))
+            for _ in range(max(ops // 10, 1))
+        ]))
+        if isinstance(exp_repo, SQLiteRepository):
+            exp_repo.pool.close()
+    return results
+
+
+def run_scans(
+    backend: str,
+    expenses: int,
+    seed: int = 0,
+    repeat: int = 3
+) -> list[BenchResult]:
+    """
+    Измерить чтение всего журнала расходов: с созданием объектов (get_all,
+    iter_all) и, для SQLite, кортежами строк (get_rows). Каждое чтение
+    выполняется repeat раз, пропускная способность - в записях в секунду.
+
+    Parameters
+    ----------
+    backend - тип репозиториев (см. BACKENDS)
+    expenses - число расходов в журнале
+    seed - начальное значение генератора случайных чисел
+    repeat - число повторов каждого чтения
+
+    Returns
+    -------
+    Список результатов измерений
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        cat_repo, exp_repo = repositories(backend, os.path.join(tmp, "bench.db"))
+        cats = [cat.pk for cat in generate_categories(cat_repo)]
+        exp_repo.add_many(generate_expenses(cats, expenses, seed))
+        scans: dict[str, Callable[[], Any]] = {
+            "scan get_all": exp_repo.get_all,
+            "scan iter_all": lambda: list(exp_repo.iter_all()),
+        }
+        if isinstance(exp_repo, SQLiteRepository):
+            scans["scan get_rows"] = exp_repo.get_rows
+            scans["scan named_rows"] = partial(exp_repo.get_rows, named=True)
+        results = [
+            measure(backend, operation, [scan] * repeat, expenses * repeat)
+            for operation, scan in scans.items()
+        ]
+        if isinstance(exp_repo, SQLiteRepository):
+            exp_repo.pool.close()
+    return results
+
+
+def argument_parser(module: str, description: str) -> argparse.ArgumentParser:
+    """
+    Разбор общих аргументов командной строки: типы репозиториев, размер
+    журнала, seed и файл для результатов в формате JSON.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"python -m {module}", description=description
+    )
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--expenses", type=int, default=100_000,
+                        help="число расходов в журнале")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE",
+                        help="записать результаты в FILE в формате JSON ('-' - stdout)")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> list[BenchResult]:
+    """
+    Запуск из командной строки: python -m bookkeeper.bench --help
+    """
+    parser = argument_parser(
+        "bookkeeper.bench", "Нагрузочное тестирование репозиториев"
+    )
+    parser.add_argument("--ops", type=int, default=1000,
+                        help="число измеряемых операций каждого вида")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS,
+                        default=BENCHMARKS[:1],
+                        help="наборы измерений: операции репозиториев "
+                             "и/или чтение всего журнала")
+    args = parser.parse_args(argv)
+
+    results: list[BenchResult] = []
+    for backend in args.backends:
+        if "operations" in args.benchmarks:
+            results += run_backend(
+                backend, args.expenses, args.ops, args.seed, args.batch_size
+            )
+        if "scans" in args.benchmarks:
+            results += run_scans(backend, args.expenses, args.seed)
+    output(results, vars(args))
+    return results
+
+
+def output(results: Sequence[BenchResult], parameters: dict[str, Any]) -> None:
+    """
+    Вывести результаты таблицей или, если задан parameters["json"],
+    записать их в формате JSON вместе с параметрами запуска
+    и описанием платформы.
+    """
+    path = parameters.get("json")
+    if path is None:
+        print(f"{'backend':<8}{'operation':<16}{'ops':>9}{'ops/s':>13}"
+              f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for r in results:
+            print(f"{r.backend:<8}{r.operation:<16}{r.ops:>9}{r.throughput:>13,.0f}"
+                  f"{r.p50:>10.3f}{r.p95:>10.3f}{r.p99:>10.3f}")
+        return
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in parameters.items() if k != "json"},
+        "results": [asdict(r) for r in results],
+    }
+    if path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
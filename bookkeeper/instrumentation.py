@@ -0,0 +1,320 @@
+"""
+Измерение времени операций приложения
+
+Операции (запросы SQL, методы репозиториев, действия Presenter, перерисовка
+представления) записываются как вложенные интервалы (Span): интервал,
+начатый внутри другого интервала того же потока, становится его потомком.
+По завершенным интервалам накапливается статистика по каждой операции
+(число вызовов, суммарное время, процентили), операции дольше заданного
+порога записываются в журнал (logging) как медленные.
+
+Измерение выключено по умолчанию и включается для всего приложения:
+
+    from bookkeeper.instrumentation import INSTRUMENTATION
+    INSTRUMENTATION.enable(slow_ms=50)
+    ...
+    INSTRUMENTATION.dump("profile.json")
+"""
+
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Sequence, TextIO, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """ Процентиль q (от 0 до 100) значений с линейной интерполяцией """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+@dataclass
+class Span:
+    """
+    Интервал выполнения операции name вида category (например, "sql"
+    и "expense.get_all"). Статистика накапливается по паре (category, name),
+    поэтому name не должно зависеть от параметров вызова; подробности
+    (например, текст запроса) записываются в detail и выводятся только
+    в журнал медленных операций. duration - длительность в миллисекундах,
+    rows - число полученных или измененных строк (None, если неизвестно),
+    children - вложенные интервалы.
+    """
+    category: str
+    name: str
+    detail: str | None = None
+    start: float = 0.0
+    duration: float = 0.0
+    rows: int | None = None
+    children: list['Span'] = field(default_factory=list)
+
+
+@dataclass
+# pylint: disable-next=too-many-instance-attributes
+class OperationStats:
+    """
+    Статистика операции: число вызовов, суммарное и максимальное время
+    (мс), процентили времени по последним вызовам и суммарное число строк.
+    """
+    category: str
+    name: str
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    rows: int
+
+
+class _Timer:
+    """ Контекст, измеряющий интервал span """
+
+    def __init__(self, owner: 'Instrumentation', span: Span) -> None:
+        self.owner = owner
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.owner._stack().append(self.span)
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *args: Any) -> None:
+        self.span.duration = (time.perf_counter() - self.span.start) * 1000
+        self.owner._finish(self.span)
+
+
+class _Disabled:
+    """ Контекст для выключенного измерения: ничего не делает """
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+
+_DISABLED = _Disabled()
+
+
+# pylint: disable-next=too-many-instance-attributes
+class Instrumentation:
+    """
+    Сборщик интервалов и статистики операций.
+
+    slow_ms - порог (мс), начиная с которого операция записывается
+        в журнал как медленная (None - не записывать)
+    samples - число последних вызовов каждой операции, по которым
+        вычисляются процентили
+    traces - число последних интервалов верхнего уровня (с вложенными),
+        которые хранятся для просмотра (traces)
+    """
+
+    def __init__(
+        self,
+        slow_ms: float | None = None,
+        samples: int = 10000,
+        traces: int = 1000
+    ) -> None:
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.samples = samples
+        self.traces: deque[Span] = deque(maxlen=traces)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counts: dict[tuple[str, str], list[float]] = {}
+        self._durations: dict[tuple[str, str], deque[float]] = {}
+
+    def enable(self, slow_ms: float | None = None) -> None:
+        """ Включить измерение (и задать порог медленных операций) """
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        self.enabled = True
+
+    def disable(self) -> None:
+        """ Выключить измерение (накопленная статистика сохраняется) """
+        self.enabled = False
+
+    def reset(self) -> None:
+        """ Удалить накопленную статистику и интервалы """
+        with self._lock:
+            self.traces.clear()
+            self._counts.clear()
+            self._durations.clear()
+
+    def _stack(self) -> list[Span]:
+        stack: list[Span] | None = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, category: str, name: str, detail: str | None = None) -> Any:
+        """
+        Контекст, измеряющий операцию. Внутри контекста доступен объект
+        Span (например, чтобы записать число строк), а если измерение
+        выключено - None:
+
+            with INSTRUMENTATION.span("sql", "expense.get_all", query) as span:
+                rows = ...
+                if span is not None:
+                    span.rows = len(rows)
+        """
+        if not self.enabled:
+            return _DISABLED
+        return _Timer(self, Span(category, name, detail))
+
+    def record(
+        self,
+        category: str,
+        name: str,
+        duration: float,
+        rows: int | None = None,
+        detail: str | None = None
+    ) -> None:
+        """
+        Записать операцию, время которой (duration, мс) измерено вызывающим
+        кодом - например, сложено по частям, между которыми выполняется
+        посторонняя работа (чтение курсора генератором). Операция становится
+        потомком текущего интервала потока.
+        """
+        if not self.enabled:
+            return
+        span = Span(category, name, detail, time.perf_counter() - duration / 1000,
+                    duration, rows)
+        stack = self._stack()
+        self._record(span, stack[-1] if stack else None)
+
+    def _finish(self, span: Span) -> None:
+        stack = self._stack()
+        # интервалы обычно завершаются в обратном порядке, но удаляется
+        # именно завершенный интервал, а не верхний: его родитель - интервал,
+        # начатый перед ним
+        parent = None
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is span:
+                parent = stack[i - 1] if i else None
+                del stack[i]
+                break
+        self._record(span, parent)
+
+    def _record(self, span: Span, parent: Span | None) -> None:
+        key = (span.category, span.name)
+        with self._lock:
+            if parent is not None:
+                parent.children.append(span)
+            else:
+                self.traces.append(span)
+            counts = self._counts.setdefault(key, [0, 0.0, 0.0, 0])
+            counts[0] += 1
+            counts[1] += span.duration
+            counts[2] = max(counts[2], span.duration)
+            counts[3] += span.rows or 0
+            self._durations.setdefault(
+                key, deque(maxlen=self.samples)
+            ).append(span.duration)
+        if self.slow_ms is not None and span.duration >= self.slow_ms:
+            logger.warning(
+                "slow %s operation (%.1f ms, rows: %s): %s%s",
+                span.category, span.duration, span.rows, span.name,
+                "" if span.detail is None else f"\n{span.detail}"
+            )
+
+    def stats(self) -> list[OperationStats]:
+        """
+        Статистика операций по убыванию суммарного времени.
+        """
+        with self._lock:
+            items = [
+                (key, list(counts), list(self._durations[key]))
+                for key, counts in self._counts.items()
+            ]
+        result = [
+            OperationStats(
+                category, name, int(count), total,
+                percentile(durations, 50), percentile(durations, 95),
+                percentile(durations, 99), longest, int(rows)
+            )
+            for (category, name), (count, total, longest, rows), durations in items
+        ]
+        return sorted(result, key=lambda s: s.total, reverse=True)
+
+    def dump(self, file: str | TextIO) -> None:
+        """
+        Записать статистику операций в формате JSON в файл (путь или
+        открытый файл).
+        """
+        report = {
+            "slow_ms": self.slow_ms,
+            "operations": [asdict(s) for s in self.stats()],
+        }
+        if isinstance(file, str):
+            with open(file, "w", encoding="utf-8") as out:
+                json.dump(report, out, indent=2, ensure_ascii=False)
+        else:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    def report(self, top: int = 20) -> str:
+        """ Таблица top самых затратных операций """
+        lines = [f"{'category':<10}{'count':>8}{'total ms':>11}{'p50':>8}"
+                 f"{'p95':>8}{'p99':>8}  name"]
+        for s in self.stats()[:top]:
+            lines.append(
+                f"{s.category:<10}{s.count:>8}{s.total:>11.1f}{s.p50:>8.2f}"
+                f"{s.p95:>8.2f}{s.p99:>8.2f}  {' '.join(s.name.split())[:80]}"
+            )
+        return "\n".join(lines)
+
+    def status_line(self) -> str:
+        """ Краткая статистика для строки состояния """
+        stats = self.stats()
+        if not stats:
+            return "Нет данных об операциях"
+        sql = [s for s in stats if s.category == "sql"]
+        slowest = max(stats, key=lambda s: s.p95)
+        return (
+            f"Операций: {sum(s.count for s in stats)}, "
+            f"запросов SQL: {sum(s.count for s in sql)} "
+            f"({sum(s.total for s in sql):.0f} мс); "
+            f"p95 дольше всего у {slowest.category} "
+            f"{' '.join(slowest.name.split())[:40]}: {slowest.p95:.1f} мс"
+        )
+
+
+INSTRUMENTATION = Instrumentation()
+
+
+def timed(category: str) -> Callable[[F], F]:
+    """
+    Декоратор: измерять каждый вызов функции (метода) как операцию
+    category с именем функции. Если функция возвращает список,
+    его длина записывается как число строк.
+    """
+
+    def decorator(func: F) -> F:
+        name = func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not INSTRUMENTATION.enabled:
+                return func(*args, **kwargs)
+            with INSTRUMENTATION.span(category, name) as span:
+                result = func(*args, **kwargs)
+                if span is not None and isinstance(result, list):
+                    span.rows = len(result)
+                return result
+
+        return cast(F, wrapper)
+
+    return decorator
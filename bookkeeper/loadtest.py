@@ -0,0 +1,242 @@
+"""
+Нагрузочное тестирование Presenter без графического интерфейса
+
+Модуль воспроизводит сценарии работы пользователя (добавление, изменение
+и удаление расходов, добавление и удаление категорий, перерисовка, итоги
+по категориям) через обработчики HeadlessView и измеряет задержку каждого
+действия вместе со всем стеком Presenter + репозитории. Сценарий
+определяется начальным значением seed: при одинаковых параметрах
+выполняется одна и та же последовательность действий.
+
+    python -m bookkeeper.loadtest --expenses 100000 --steps 5000
+"""
+
+from datetime import timedelta
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Sequence
+
+from bookkeeper.bench import (
+    START, BenchResult, argument_parser, generate_categories, generate_expenses,
+    output, repositories, summarize
+)
+from bookkeeper.instrumentation import INSTRUMENTATION
+from bookkeeper.models.expense import Expense
+from bookkeeper.presenter import Bookkeeper
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.view.headless_view import HeadlessView
+
+# относительные частоты действий в сценарии
+ACTIONS = {
+    "add_expense": 40,
+    "edit_expense": 25,
+    "delete_expense": 10,
+    "refresh": 10,
+    "rollup": 5,
+    "add_category": 5,
+    "delete_category": 5,
+}
+
+
+class Driver:
+    """
+    Выполняет случайные действия пользователя через обработчики view.
+
+    view - представление, подключенное к Presenter
+    expenses - id существующих записей расходов
+    seed - начальное значение генератора случайных чисел
+    """
+
+    def __init__(self, view: HeadlessView, expenses: Sequence[int], seed: int = 0):
+        self.view = view
+        self.rnd = random.Random(seed)
+        self.expenses = list(expenses)
+        self.churn: list[str] = []
+        self.counter = 0
+        self.latencies: dict[str, list[float]] = {action: [] for action in ACTIONS}
+
+        self._actions: dict[str, Callable[[], bool]] = {
+            "add_expense": self.add_expense,
+            "edit_expense": self.edit_expense,
+            "delete_expense": self.delete_expense,
+            "refresh": self.refresh,
+            "rollup": self.rollup,
+            "add_category": self.add_category,
+            "delete_category": self.delete_category,
+        }
+
+    def _call(self, func: str, *args: Any) -> Any:
+        return self.view.handler(func)(*args)
+
+    def _category(self) -> str:
+        return str(self.rnd.choice(self._call("cat_all")).name)
+
+    def add_expense(self) -> bool:
+        """ Добавить расход в случайную категорию """
+        events = len(self.view.events)
+        self._call("exp_create", round(self.rnd.uniform(1, 1000), 2), self._category())
+        self.expenses += [pk for event, pk in self.view.events[events:]
+                          if event == "expense_added"]
+        return True
+
+    def edit_expense(self) -> bool:
+        """ Изменить сумму, комментарий, дату или категорию расхода """
+        if not self.expenses:
+            return False
+        exp = self._call("exp_read", self.rnd.choice(self.expenses))
+        field = self.rnd.choice(("amount", "comment", "expense_date", "category"))
+        value: Any
+        if field == "amount":
+            value = round(self.rnd.uniform(1, 1000), 2)
+        elif field == "comment":
+            value = f"comment {self.rnd.randrange(1000)}"
+        elif field == "expense_date":
+            value = START + timedelta(seconds=self.rnd.randrange(3 * 365 * 86400))
+        else:
+            value = self._call("cat_name2pk", self._category())
+        self._call("exp_update", exp, field, value)
+        return True
+
+    def delete_expense(self) -> bool:
+        """ Удалить случайный расход """
+        if not self.expenses:
+            return False
+        at = self.rnd.randrange(len(self.expenses))
+        self.expenses[at], self.expenses[-1] = self.expenses[-1], self.expenses[at]
+        self._call("exp_delete", self.expenses.pop())
+        return True
+
+    def refresh(self) -> bool:
+        """ Перерисовать представление (как при переключении виджетов) """
+        self.view.update()
+        return True
+
+    def rollup(self) -> bool:
+        """ Итоги по категориям за случайный месяц """
+        start = START + timedelta(days=30 * self.rnd.randrange(36))
+        self._call("exp_rollup", start, start + timedelta(days=30))
+        return True
+
+    def add_category(self) -> bool:
+        """
+        Добавить подкатегорию к случайной категории. Категории верхнего
+        уровня не создаются: при их удалении удалялись бы и расходы.
+        """
+        self.counter += 1
+        name = f"churn {self.counter}"
+        self._call("cat_create", name, self._category())
+        self.churn.append(name)
+        return True
+
+    def delete_category(self) -> bool:
+        """
+        Удалить одну из добавленных категорий (ее расходы переходят
+        к родителю).
+        """
+        if not self.churn:
+            return False
+        name = self.churn.pop(self.rnd.randrange(len(self.churn)))
+        self._call("cat_delete", name)
+        return True
+
+    def step(self) -> None:
+        """ Выполнить случайное действие, измерив его задержку """
+        action = self.rnd.choices(list(ACTIONS), list(ACTIONS.values()))[0]
+        start = time.perf_counter()
+        if self._actions[action]():
+            self.latencies[action].append((time.perf_counter() - start) * 1000)
+
+    def run(self, steps: int) -> None:
+        """ Выполнить steps случайных действий """
+        for _ in range(steps):
+            self.step()
+
+
+def run_session(
+    backend: str,
+    expenses: int,
+    steps: int,
+    seed: int = 0,
+    page_size: int | None = 100
+) -> list[BenchResult]:
+    """
+    Нагрузочный сценарий для Presenter с репозиториями одного типа.
+
+    Parameters
+    ----------
+    backend - тип репозиториев (см. bench.BACKENDS)
+    expenses - число расходов, загружаемых до запуска Presenter
+    steps - число действий пользователя
+    seed - начальное значение генератора случайных чисел
+    page_size - размер страницы расходов в HeadlessView
+
+    Returns
+    -------
+    Результаты измерений: запуск Presenter ("startup") и каждое действие
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        cat_repo, exp_repo = repositories(backend, os.path.join(tmp, "bench.db"))
+        cats = [cat.pk for cat in generate_categories(cat_repo)]
+        exp_repo.add_many(generate_expenses(cats, expenses, seed))
+
+        view = HeadlessView(page_size)
+        start = time.perf_counter()
+        Bookkeeper(view, exp_repo, cat_repo)
+        results = [summarize(
+            backend, "startup", [(time.perf_counter() - start) * 1000]
+        )]
+
+        driver = Driver(view, _pks(exp_repo), seed)
+        driver.run(steps)
+        results += [
+            summarize(backend, action, latencies)
+            for action, latencies in driver.latencies.items()
+        ]
+        if isinstance(exp_repo, SQLiteRepository):
+            exp_repo.pool.close()
+    return results
+
+
+def _pks(repo: AbstractRepository[Expense]) -> list[int]:
+    if isinstance(repo, SQLiteRepository):
+        return [row[0] for row in repo.get_rows()]
+    return [exp.pk for exp in repo.get_all()]
+
+
+def main(argv: Sequence[str] | None = None) -> list[BenchResult]:
+    """
+    Запуск из командной строки: python -m bookkeeper.loadtest --help
+    """
+    parser = argument_parser(
+        "bookkeeper.loadtest", "Нагрузочное тестирование Presenter без интерфейса"
+    )
+    parser.add_argument("--steps", type=int, default=2000,
+                        help="число действий пользователя")
+    parser.add_argument("--page-size", type=int, default=100,
+                        help="размер страницы расходов (0 - не запрашивать данные)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="записать в FILE статистику операций SQL, репозиториев, "
+                             "Presenter и представления (см. instrumentation)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        INSTRUMENTATION.reset()
+        INSTRUMENTATION.enable()
+
+    results = [
+        result for backend in args.backends
+        for result in run_session(
+            backend, args.expenses, args.steps, args.seed, args.page_size or None
+        )
+    ]
+    if args.profile:
+        INSTRUMENTATION.disable()
+        INSTRUMENTATION.dump(args.profile)
+    output(results, vars(args))
+    return results
+
+
+if __name__ == "__main__":
+    main()
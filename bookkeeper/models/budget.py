@@ -0,0 +1,110 @@
+"""
+Модель бюджета: суммы расходов за последние дни, неделю, месяц
+"""
+
+from datetime import date, timedelta
+
+from ..repository.abstract_repository import AbstractRepository
+from ..repository.query import Period
+from .expense import Expense
+
+
+class ExpenseTotals:
+    """
+    Суммы расходов по дням и категориям.
+
+    Хранит для каждого дня (и для каждой пары день-категория) сумму и число
+    расходов. Суммы обновляются при каждом добавлении/удалении расхода
+    (add/remove), поэтому сумма за окно из нескольких последних дней
+    вычисляется без обращения к репозиторию за время, зависящее только
+    от длины окна. rebuild заново строит суммы по репозиторию одним
+    агрегирующим запросом.
+    """
+
+    def __init__(self) -> None:
+        self._days: dict[date, list[float]] = {}
+        self._cats: dict[int, dict[date, list[float]]] = {}
+
+    def rebuild(self, repo: AbstractRepository[Expense]) -> None:
+        """
+        Построить суммы заново по всем расходам в репозитории.
+
+        Parameters
+        ----------
+        repo - репозиторий расходов
+        """
+        group_by: list[str | Period] = [Period("expense_date", "day"), "category"]
+        sums = repo.aggregate("amount", "sum", group_by=group_by)
+        counts = repo.aggregate("amount", "count", group_by=group_by)
+        self._days.clear()
+        self._cats.clear()
+        for (day, category), amount in sums.items():
+            self._change(
+                date.fromisoformat(day), category, amount, counts[day, category]
+            )
+
+    @staticmethod
+    def _bump(
+        buckets: dict[date, list[float]],
+        day: date,
+        amount: float,
+        count: float
+    ) -> None:
+        bucket = buckets.setdefault(day, [0.0, 0])
+        bucket[0] += amount
+        bucket[1] += count
+        if not bucket[1]:
+            del buckets[day]
+
+    def _change(self, day: date, category: int, amount: float, count: int) -> None:
+        self._bump(self._days, day, amount, count)
+        self._bump(self._cats.setdefault(category, {}), day, amount, count)
+        if not self._cats[category]:
+            del self._cats[category]
+
+    def add(self, exp: Expense) -> None:
+        """ Учесть добавленный расход """
+        self._change(exp.expense_date.date(), exp.category, exp.amount, 1)
+
+    def remove(self, exp: Expense) -> None:
+        """ Перестать учитывать удаленный расход """
+        self._change(exp.expense_date.date(), exp.category, -exp.amount, -1)
+
+    def move_category(self, old: int, new: int | None) -> None:
+        """
+        Перенести расходы категории old в категорию new
+        (или удалить их, если new is None).
+        """
+        buckets = self._cats.pop(old, {})
+        for day, (amount, count) in buckets.items():
+            if new is None:
+                self._bump(self._days, day, -amount, -count)
+            else:
+                self._bump(self._cats.setdefault(new, {}), day, amount, count)
+
+    def total(
+        self,
+        days: int,
+        category: int | None = None,
+        today: date | None = None
+    ) -> float:
+        """
+        Сумма расходов за последние days дней, включая сегодняшний.
+
+        Parameters
+        ----------
+        days - длина окна в днях (1 - день, 7 - неделя, 31 - месяц)
+        category - id категории или None для всех категорий
+        today - последний день окна (по умолчанию - сегодня)
+
+        Returns
+        -------
+        Сумма расходов
+        """
+        buckets = self._days if category is None else self._cats.get(category, {})
+        today = today or date.today()
+        return sum(
+            buckets[day][0]
+            for day in (today - timedelta(days=i) for i in range(days))
+            if day in buckets
+        )
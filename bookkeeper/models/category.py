@@ -116,9 +116,19 @@ class Category:
         -------
         Список созданных объектов Category
         """
+        # категории одного уровня добавляются одним пакетом: к этому моменту
+        # id всех их родителей уже известны
         created: dict[str, Category] = {}
+        levels: list[list[tuple[Category, str | None]]] = []
+        depth: dict[str, int] = {}
         for child, parent in tree:
-            cat = cls(child, created[parent].pk if parent is not None else None)
-            repo.add(cat)
-            created[child] = cat
+            depth[child] = depth[parent] + 1 if parent is not None else 0
+            if depth[child] == len(levels):
+                levels.append([])
+            created[child] = cls(child)
+            levels[depth[child]].append((created[child], parent))
+        for level in levels:
+            for cat, parent in level:
+                cat.parent = created[parent].pk if parent is not None else None
+            repo.add_many(cat for cat, _ in level)
         return list(created.values())
@@ -0,0 +1,69 @@
+"""
+Кэш категорий расходов для быстрого поиска по id и названию
+"""
+
+from ..repository.abstract_repository import AbstractRepository
+from .category import Category
+
+
+class CategoryCache:
+    """
+    Словари категорий pk -> категория, название -> pk и pk -> путь
+    (названия от категории верхнего уровня до данной), построенные по
+    репозиторию одним запросом. После изменения категорий в репозитории
+    кэш нужно сбросить методом invalidate: словари будут построены заново
+    при следующем обращении.
+    """
+
+    def __init__(self, repo: AbstractRepository[Category]) -> None:
+        self.repo = repo
+        self._cats: dict[int, Category] | None = None
+        self._pks: dict[str, int] = {}
+        self._paths: dict[int, list[str]] = {}
+
+    def invalidate(self) -> None:
+        """ Сбросить кэш после изменения категорий в репозитории """
+        self._cats = None
+        self._pks.clear()
+        self._paths.clear()
+
+    def _load(self) -> dict[int, Category]:
+        if self._cats is None:
+            self._cats = {cat.pk: cat for cat in self.repo.get_all()}
+            self._pks = {cat.name: cat.pk for cat in self._cats.values()}
+        return self._cats
+
+    def all(self) -> list[Category]:
+        """ Все категории в порядке добавления """
+        return list(self._load().values())
+
+    def get(self, pk: int) -> Category | None:
+        """ Категория по id (None, если такой нет) """
+        return self._load().get(pk)
+
+    def name(self, pk: int) -> str:
+        """ Название категории по id """
+        return self._load()[pk].name
+
+    def pk(self, name: str) -> int | None:
+        """ id категории по названию (None, если такой нет) """
+        self._load()
+        return self._pks.get(name)
+
+    def path(self, pk: int) -> list[str]:
+        """
+        Названия категорий от категории верхнего уровня до категории pk.
+
+        Parameters
+        ----------
+        pk - id категории
+
+        Returns
+        -------
+        Список названий, последнее из которых - название категории pk
+        """
+        if pk not in self._paths:
+            cat = self._load()[pk]
+            parent = [] if cat.parent is None else self.path(cat.parent)
+            self._paths[pk] = parent + [cat.name]
+        return self._paths[pk]
@@ -0,0 +1,247 @@
+"""
+Дерево категорий расходов с быстрыми запросами предков и потомков
+"""
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator
+
+from ..repository.abstract_repository import AbstractRepository
+from ..repository.query import In
+from .category import Category
+
+
+@dataclass
+class CategoryClosure:
+    """
+    Строка таблицы замыкания дерева категорий: категория ancestor является
+    предком категории descendant на расстоянии depth уровней
+    (каждая категория - предок самой себя с depth = 0).
+    """
+    ancestor: int
+    descendant: int
+    depth: int
+    pk: int = 0
+
+
+# pylint: disable-next=too-many-instance-attributes
+class CategoryTree:
+    """
+    Дерево категорий: списки смежности + эйлеров обход.
+
+    Обход в глубину нумерует категории так, что потомки категории занимают
+    в порядке обхода непрерывный отрезок сразу после нее. Поэтому проверка
+    "a - предок b" и глубина категории выполняются за O(1), список потомков -
+    за O(число потомков), список предков и путь - за O(глубина).
+    При изменении дерева (add/remove) списки смежности обновляются сразу,
+    а обход пересчитывается при следующем запросе.
+
+    Если задан репозиторий closure, дерево хранит в нем таблицу замыкания
+    (см. CategoryClosure). По такой таблице предков и потомков можно
+    получить запросом к СУБД, не строя дерево. Таблица записывается заново
+    при первом обращении (closure_table) или вызове save_closure и затем
+    поддерживается при add/remove; до этого add/remove ее не изменяют.
+    """
+
+    def __init__(
+        self,
+        cats: Iterable[Category],
+        closure: AbstractRepository[CategoryClosure] | None = None
+    ) -> None:
+        self.closure = closure
+        self._cats: dict[int, Category] = {}
+        self._children: dict[int | None, list[int]] = {None: []}
+        for cat in cats:
+            self._link(cat)
+
+        self._order: list[int] = []
+        self._tin: dict[int, int] = {}
+        self._tout: dict[int, int] = {}
+        self._depth: dict[int, int] = {}
+        self._dirty = True
+        self._closure_saved = False
+
+    @classmethod
+    def from_repo(
+        cls,
+        repo: AbstractRepository[Category],
+        closure: AbstractRepository[CategoryClosure] | None = None
+    ) -> 'CategoryTree':
+        """
+        Построить дерево по всем категориям репозитория.
+
+        Parameters
+        ----------
+        repo - репозиторий категорий
+        closure - репозиторий для таблицы замыкания (или None)
+
+        Returns
+        -------
+        Объект CategoryTree
+        """
+        return cls(repo.get_all(), closure)
+
+    def _link(self, cat: Category) -> None:
+        self._cats[cat.pk] = cat
+        self._children.setdefault(cat.pk, [])
+        self._children.setdefault(cat.parent, []).append(cat.pk)
+
+    def _tour(self) -> None:
+        """ Пересчитать эйлеров обход, если дерево изменилось """
+        if not self._dirty:
+            return
+        self._order.clear()
+        self._tin.clear()
+        self._tout.clear()
+        self._depth.clear()
+        stack = [(pk, 0) for pk in reversed(self._children[None])]
+        while stack:
+            pk, depth = stack.pop()
+            if pk < 0:
+                self._tout[~pk] = len(self._order)
+                continue
+            self._tin[pk] = len(self._order)
+            self._depth[pk] = depth
+            self._order.append(pk)
+            stack.append((~pk, depth))
+            stack += [(child, depth + 1) for child in reversed(self._children[pk])]
+        self._dirty = False
+
+    def __contains__(self, pk: int) -> bool:
+        return pk in self._cats
+
+    def __len__(self) -> int:
+        return len(self._cats)
+
+    def get(self, pk: int) -> Category:
+        """ Категория по id """
+        return self._cats[pk]
+
+    def roots(self) -> list[int]:
+        """ id категорий верхнего уровня """
+        return list(self._children[None])
+
+    def children(self, pk: int) -> list[int]:
+        """ id непосредственных подкатегорий """
+        return list(self._children[pk])
+
+    def depth(self, pk: int) -> int:
+        """ Уровень категории (0 - категория верхнего уровня) """
+        self._tour()
+        return self._depth[pk]
+
+    def is_ancestor(self, ancestor: int, pk: int) -> bool:
+        """ Является ли ancestor предком pk (или самой категорией pk) """
+        self._tour()
+        return self._tin[ancestor] <= self._tin[pk] < self._tout[ancestor]
+
+    def ancestors(self, pk: int) -> list[int]:
+        """ id предков категории от родителя до категории верхнего уровня """
+        result = []
+        parent = self._cats[pk].parent
+        while parent is not None:
+            result.append(parent)
+            parent = self._cats[parent].parent
+        return result
+
+    def descendants(self, pk: int) -> list[int]:
+        """ id всех подкатегорий (не включая саму категорию) в порядке обхода """
+        self._tour()
+        return self._order[self._tin[pk] + 1:self._tout[pk]]
+
+    def subtree(self, pk: int) -> list[int]:
+        """ id категории и всех ее подкатегорий """
+        self._tour()
+        return self._order[self._tin[pk]:self._tout[pk]]
+
+    def path(self, pk: int) -> list[str]:
+        """ Названия категорий от категории верхнего уровня до pk """
+        return [self._cats[i].name for i in reversed([pk] + self.ancestors(pk))]
+
+    def walk(self) -> Iterator[int]:
+        """ id всех категорий в порядке обхода в глубину """
+        self._tour()
+        return iter(list(self._order))
+
+    def rollup(self, values: dict[int, float]) -> dict[int, float]:
+        """
+        Итоги по поддеревьям: значение категории плюс значения всех ее
+        подкатегорий, за один проход по дереву снизу вверх.
+
+        Parameters
+        ----------
+        values - словарь {id категории: значение}, например, суммы расходов
+            по категориям. Категории, отсутствующие в дереве, не учитываются.
+
+        Returns
+        -------
+        Словарь {id категории: итог по поддереву} для всех категорий дерева
+        """
+        self._tour()
+        totals = {pk: values.get(pk, 0) for pk in self._order}
+        for pk in reversed(self._order):
+            parent = self._cats[pk].parent
+            if parent is not None:
+                totals[parent] += totals[pk]
+        return totals
+
+    def add(self, cat: Category) -> None:
+        """
+        Добавить в дерево категорию, уже сохраненную в репозитории
+        (с заполненным pk).
+        """
+        self._link(cat)
+        self._dirty = True
+        if self.closure is not None and self._closure_saved:
+            self.closure.add_many(self._closure_rows(cat.pk))
+
+    def remove(self, pk: int) -> None:
+        """
+        Удалить категорию из дерева. Ее подкатегории переходят к ее родителю.
+        """
+        cat = self._cats.pop(pk)
+        orphans = self._children.pop(pk)
+        siblings = self._children[cat.parent]
+        at = siblings.index(pk)
+        siblings[at:at + 1] = orphans
+        for child in orphans:
+            self._cats[child] = replace(self._cats[child], parent=cat.parent)
+        self._dirty = True
+        if self.closure is not None and self._closure_saved:
+            self._tour()
+            moved = [j for i in orphans for j in self.subtree(i)]
+            with self.closure.transaction():
+                self.closure.delete_where({"descendant": In([pk] + moved)})
+                self.closure.add_many(
+                    row for i in moved for row in self._closure_rows(i)
+                )
+
+    def _closure_rows(self, pk: int) -> Iterator[CategoryClosure]:
+        """ Строки таблицы замыкания с потомком pk """
+        yield CategoryClosure(pk, pk, 0)
+        for depth, ancestor in enumerate(self.ancestors(pk), 1):
+            yield CategoryClosure(ancestor, pk, depth)
+
+    def save_closure(self) -> None:
+        """
+        Записать таблицу замыкания заново (например, после изменения
+        категорий в обход дерева).
+        """
+        if self.closure is None:
+            raise ValueError('closure repository is not set')
+        with self.closure.transaction():
+            self.closure.delete_where({})
+            self.closure.add_many(
+                row for pk in self.walk() for row in self._closure_rows(pk)
+            )
+        self._closure_saved = True
+
+    def closure_table(self) -> AbstractRepository[CategoryClosure]:
+        """
+        Репозиторий с актуальной таблицей замыкания. При первом обращении
+        таблица записывается заново (save_closure), поэтому ее построение
+        откладывается до первого запроса по поддеревьям.
+        """
+        if self.closure is None:
+            raise ValueError('closure repository is not set')
+        if not self._closure_saved:
+            self.save_closure()
+        return self.closure
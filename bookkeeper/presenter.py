@@ -2,9 +2,16 @@
 Presenter для MVP модели приложения Bookkeeper.
 """
 
+from datetime import datetime
+
+from bookkeeper.instrumentation import timed
+from bookkeeper.models.budget import ExpenseTotals
 from bookkeeper.models.category import Category
+from bookkeeper.models.category_cache import CategoryCache
+from bookkeeper.models.category_tree import CategoryClosure, CategoryTree
 from bookkeeper.models.expense import Expense
 from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.query import Between
 from bookkeeper.view.abstract_view import AbstractView
 
 
@@ -17,15 +24,21 @@ class Bookkeeper:
         self,
         view: AbstractView,
         exp_repo: AbstractRepository[Expense],
-        cat_repo: AbstractRepository[Category]
+        cat_repo: AbstractRepository[Category],
+        closure_repo: AbstractRepository[CategoryClosure] | None = None
     ):
         self.exp_repo = exp_repo
         self.cat_repo = cat_repo
 
-        def _cat2pk(name: str) -> int | None:
-            cats = cat_repo.get_all({"name": name})
-            return cats[0].pk if cats else None
-        self.cat2pk = _cat2pk
+        self.totals = ExpenseTotals()
+        self.totals.rebuild(exp_repo)
+
+        self.cats = CategoryCache(cat_repo)
+        # closure_repo нужен только внешнему коду, которому нужна таблица
+        # замыкания категорий (tree.closure_table); сам Presenter ее
+        # не использует, и она строится при первом обращении
+        self.tree = CategoryTree.from_repo(cat_repo, closure_repo)
+        self.cat2pk = self.cats.pk
 
         self.view = view
         self.view.register_handlers(
@@ -34,19 +47,42 @@ class Bookkeeper:
             read=self.exp_repo.get,
             reads=self.exp_repo.get_all,
             update=self.update_expense,
-            delete=self.delete_expense
+            delete=self.delete_expense,
+            aggregate=self.exp_repo.aggregate,
+            total=self.totals.total,
+            rollup=self.category_totals
         )
 
         self.view.register_handlers(
             "cat",
             create=self.add_category,
-            read=self.cat_repo.get,
+            read=self.cats.get,
             reads=self.cat_repo.get_all,
-            delete=self.delete_category
+            delete=self.delete_category,
+            all=self.cats.all,
+            pk2name=self.cats.name,
+            name2pk=self.cats.pk,
+            path=self.cats.path
         )
 
         self.view.update()
 
+    @timed("presenter")
+    def category_totals(self, start: datetime, end: datetime) -> dict[int, float]:
+        """
+        Суммы расходов за период [start, end] по категориям, включая
+        расходы всех подкатегорий: один агрегирующий запрос с группировкой
+        по категории + один проход по дереву категорий.
+        """
+
+        sums = self.exp_repo.aggregate(
+            "amount", "sum",
+            where={"expense_date": Between(start, end)},
+            group_by=["category"]
+        )
+        return self.tree.rollup({cat: total for (cat,), total in sums.items()})
+
+    @timed("presenter")
     def add_category(self, name: str, parent: str) -> None:
         """
         Добавить категорию + перерисовать.
@@ -56,7 +92,7 @@ class Bookkeeper:
             self.view.status("Укажите название новой категории!")
             return
 
-        if self.cat_repo.get_all({"name": name}):
+        if self.cat2pk(name) is not None:
             self.view.status(f"Категория [{name}] уже существует!")
             return
 
@@ -68,62 +104,80 @@ class Bookkeeper:
                 self.view.status("Укажите правильного родителя!")
                 return
 
-        self.cat_repo.add(Category(name, parent_pk))
-        self.view.update(f"Создана категория [{name}].")
+        cat = Category(name, parent_pk)
+        pk = self.cat_repo.add(cat)
+        self.cats.invalidate()
+        self.tree.add(cat)
+        self.view.category_added(pk)
+        self.view.status(f"Создана категория [{name}].")
 
+    @timed("presenter")
     def delete_category(self, name: str) -> None:
         """
         Удалить категорию (и изменить соответствубщие записи) + перерисовать.
         """
 
-        cat = self.cat_repo.get_all({"name": name})[0]
+        cat_pk = self.cat2pk(name)
+        cat = None if cat_pk is None else self.cats.get(cat_pk)
+        if cat is None:
+            self.view.status(f"Категория [{name}] не существует!")
+            return
         cat_pk = cat.pk
         parent_pk = cat.parent
 
-        exps = self.exp_repo.get_all({"category": cat_pk})
-        cats = self.cat_repo.get_all({"parent": cat_pk})
-        if parent_pk is None:
-            for exp in exps:
-                self.exp_repo.delete(exp.pk)
-            for cat in cats:
-                cat.parent = None
-                self.cat_repo.update(cat)
-        else:
-            for exp in exps:
-                exp.category = parent_pk
-                self.exp_repo.update(exp)
-            for cat in cats:
-                cat.parent = parent_pk
-                self.cat_repo.update(cat)
-
-        self.cat_repo.delete(cat_pk)
-        self.view.update(f"Категория [{name}] удалена.")
-
+        with self.exp_repo.transaction(), self.cat_repo.transaction():
+            if parent_pk is None:
+                self.exp_repo.delete_where({"category": cat_pk})
+            else:
+                self.exp_repo.update_where(
+                    {"category": cat_pk}, {"category": parent_pk}
+                )
+            self.cat_repo.update_where({"parent": cat_pk}, {"parent": parent_pk})
+            self.cat_repo.delete(cat_pk)
+            self.tree.remove(cat_pk)
+        self.cats.invalidate()
+        self.totals.move_category(cat_pk, parent_pk)
+        self.view.category_deleted(cat_pk)
+        self.view.status(f"Категория [{name}] удалена.")
+
+    @timed("presenter")
     def add_expense(self, amount: float, name: str) -> None:
         """
         Добавить запись расхода + перерисовать.
         """
 
-        cat = self.cat_repo.get_all({"name": name})
-        if not cat:
+        cat_pk = self.cat2pk(name)
+        if cat_pk is None:
             self.view.status("Укажите правильного родителя!")
             return
-        self.exp_repo.add(Expense(amount, cat[0].pk))
-        self.view.update("Добавлена запись расходов.")
+        exp = Expense(amount, cat_pk)
+        self.exp_repo.add(exp)
+        self.totals.add(exp)
+        self.view.expense_added(exp.pk)
+        self.view.status("Добавлена запись расходов.")
 
+    @timed("presenter")
     def update_expense(self, exp: Expense, attr: str, value: object) -> None:
         """
         Обновить запись расхода + перерисовать.
         """
 
+        self.totals.remove(exp)
         setattr(exp, attr, value)
         self.exp_repo.update(exp)
-        self.view.update("Запись расходов обновлена.")
+        self.totals.add(exp)
+        self.view.expense_updated(exp.pk, attr)
+        self.view.status("Запись расходов обновлена.")
 
+    @timed("presenter")
     def delete_expense(self, pk: int) -> None:
         """
         Удалить запись расхода + перерисовать.
         """
 
+        exp = self.exp_repo.get(pk)
         self.exp_repo.delete(pk)
-        self.view.update("Запись расходов удалена.")
+        if exp is not None:
+            self.totals.remove(exp)
+        self.view.expense_deleted(pk)
+        self.view.status("Запись расходов удалена.")
@@ -8,7 +8,10 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Protocol, Any
+from contextlib import contextmanager
+from typing import Generic, Iterable, Iterator, Sequence, TypeVar, Protocol, Any
+
+from bookkeeper.repository.query import Period, aggregate_objects
 
 
 class Model(Protocol):  # pylint: disable=too-few-public-methods
@@ -30,6 +33,14 @@ class AbstractRepository(ABC, Generic[T]):
     get_all
     update
     delete
+
+    Пакетные методы add_many, update_many, delete_many по умолчанию
+    вызывают одиночные методы для каждого объекта, а update_where и
+    delete_where - пакетные методы для найденных get_all объектов;
+    репозитории могут переопределить их более эффективной реализацией.
+
+    Метод transaction по умолчанию ничего не делает; репозитории, которые
+    поддерживают транзакции, должны переопределить его.
     """
 
     @abstractmethod
@@ -44,12 +55,52 @@ class AbstractRepository(ABC, Generic[T]):
         """ Получить объект по id """
 
     @abstractmethod
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+    def get_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0
+    ) -> list[T]:
         """
         Получить все записи по некоторому условию
-        where - условие в виде словаря {'название_поля': значение}
+        where - условие в виде словаря {'название_поля': значение},
+        значением также может быть условие из модуля query (Between, In, Ge...)
         если условие не задано (по умолчанию), вернуть все записи
+        order_by - поле или список полей для сортировки ("-поле" - по убыванию)
+        limit, offset - вернуть не более limit записей, пропустив первые offset
+        """
+
+    def iter_all(  # pylint: disable=unused-argument
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[T]:
+        """
+        Перебрать все записи по некоторому условию, не загружая их в память
+        целиком. Параметры where и order_by - как у get_all, batch_size -
+        число записей, загружаемых из хранилища за раз.
+        По умолчанию перебирает результат get_all.
         """
+        yield from self.get_all(where, order_by)
+
+    def aggregate(
+        self,
+        field: str,
+        func: str = 'sum',
+        where: dict[str, Any] | None = None,
+        group_by: Sequence[str | Period] = ()
+    ) -> dict[tuple[Any, ...], Any]:
+        """
+        Вычислить агрегирующую функцию (sum, count, min, max, avg) от значений
+        поля field у записей, удовлетворяющих условию where (как у get_all),
+        сгруппировав их по полям или периодам времени (Period) group_by.
+        Вернуть словарь {(значения полей группировки): значение функции};
+        без группировки словарь содержит единственный ключ ().
+        По умолчанию вычисляется за один проход по iter_all.
+        """
+        return aggregate_objects(self.iter_all(where), field, func, group_by)
 
     @abstractmethod
     def update(self, obj: T) -> None:
@@ -58,3 +109,51 @@ class AbstractRepository(ABC, Generic[T]):
     @abstractmethod
     def delete(self, pk: int) -> None:
         """ Удалить запись """
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """
+        Добавить несколько объектов в репозиторий, вернуть список их id,
+        также записать id в атрибут pk каждого объекта.
+        """
+        return [self.add(obj) for obj in objs]
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        """ Обновить данные о нескольких объектах. """
+        for obj in objs:
+            self.update(obj)
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        """ Удалить несколько записей """
+        for pk in pks:
+            self.delete(pk)
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        """
+        Обновить все записи, удовлетворяющие условию, вернуть их количество.
+        where - условие в виде словаря {'название_поля': значение}
+        values - новые значения полей в виде словаря {'название_поля': значение}
+        """
+        objs = self.get_all(where)
+        for obj in objs:
+            for attr, value in values.items():
+                setattr(obj, attr, value)
+        self.update_many(objs)
+        return len(objs)
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        """
+        Удалить все записи, удовлетворяющие условию, вернуть их количество.
+        where - условие в виде словаря {'название_поля': значение}
+        """
+        pks = [obj.pk for obj in self.get_all(where)]
+        self.delete_many(pks)
+        return len(pks)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Выполнить все изменения внутри контекста как единое целое:
+        зафиксировать их по выходу из контекста, откатить при ошибке.
+        Транзакции могут быть вложенными.
+        """
+        yield
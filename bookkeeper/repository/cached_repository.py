@@ -0,0 +1,233 @@
+"""
+Модуль описывает кэширующую обертку над репозиторием
+
+CachedRepository хранит результаты get и get_all в памяти (с вытеснением
+давно не использованных, LRU) и сбрасывает при изменении только те
+результаты, на которые изменение может повлиять. Обертка подходит для
+данных, которые часто читаются и редко меняются, например, категорий.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Hashable, Iterable, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.query import Period, matches, parse_order
+
+
+@dataclass
+class CacheStats:
+    """
+    Статистика кэша: число обращений, обслуженных из кэша (hits) и
+    переданных в репозиторий (misses), число вытесненных (evictions)
+    и сброшенных при изменениях (invalidations) результатов.
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """ Доля обращений, обслуженных из кэша """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CachedRepository(AbstractRepository[T]):
+    """
+    Репозиторий, кэширующий результаты get и get_all репозитория inner.
+
+    Кэш объектов (get) и кэш запросов (get_all) ограничены max_items
+    записями каждый. Изменения записываются в inner сразу, после чего из кэша
+    удаляются:
+    - объекты с измененными pk;
+    - результаты запросов, содержащие измененные объекты или условию
+      которых удовлетворяет добавленный или измененный объект;
+    - при update и delete - результаты запросов с offset > 0 (удаление
+      или перемещение записи перед страницей сдвигает страницу).
+    После update_where, delete_where и отката транзакции кэш сбрасывается
+    целиком. Запросы iter_all и aggregate не кэшируются.
+
+    Как и MemoryRepository, обертка возвращает одни и те же объекты при
+    повторных обращениях: изменять их можно только через update. Обертка
+    не предназначена для использования из нескольких потоков.
+    """
+
+    def __init__(self, inner: AbstractRepository[T], max_items: int = 1024) -> None:
+        if max_items <= 0:
+            raise ValueError(f'max_items must be positive: {max_items}')
+        self.inner = inner
+        self.max_items = max_items
+        self.stats = CacheStats()
+        self._objects: OrderedDict[int, T | None] = OrderedDict()
+        self._queries: OrderedDict[
+            Hashable, tuple[dict[str, Any], int, list[T], set[int]]
+        ] = OrderedDict()
+
+    def clear_cache(self) -> None:
+        """ Сбросить кэш (например, после изменения данных в обход обертки) """
+        self.stats.invalidations += len(self._objects) + len(self._queries)
+        self._objects.clear()
+        self._queries.clear()
+
+    def _remember(self, cache: 'OrderedDict[Any, Any]', key: Any, value: Any) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_items:
+            cache.popitem(last=False)
+            self.stats.evictions += 1
+
+    def get(self, pk: int) -> T | None:
+        if pk in self._objects:
+            self.stats.hits += 1
+            self._objects.move_to_end(pk)
+            return self._objects[pk]
+        self.stats.misses += 1
+        obj = self.inner.get(pk)
+        self._remember(self._objects, pk, obj)
+        return obj
+
+    @staticmethod
+    def _key(
+        where: dict[str, Any] | None,
+        order_by: str | Sequence[str] | None,
+        limit: int | None,
+        offset: int
+    ) -> Hashable | None:
+        """ Ключ запроса в кэше; None, если условие нельзя хешировать """
+        key = (
+            tuple(sorted((where or {}).items())),
+            tuple(parse_order(order_by)),
+            limit,
+            offset
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0
+    ) -> list[T]:
+        key = self._key(where, order_by, limit, offset)
+        if key in self._queries:
+            self.stats.hits += 1
+            self._queries.move_to_end(key)
+            return list(self._queries[key][2])
+        self.stats.misses += 1
+        objs = self.inner.get_all(where, order_by, limit, offset)
+        if key is not None:
+            self._remember(
+                self._queries, key,
+                (dict(where or {}), offset, objs, {obj.pk for obj in objs})
+            )
+            for obj in objs:
+                self._remember(self._objects, obj.pk, obj)
+        return list(objs)
+
+    def iter_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[T]:
+        return self.inner.iter_all(where, order_by, batch_size)
+
+    def aggregate(
+        self,
+        field: str,
+        func: str = 'sum',
+        where: dict[str, Any] | None = None,
+        group_by: Sequence[str | Period] = ()
+    ) -> dict[tuple[Any, ...], Any]:
+        return self.inner.aggregate(field, func, where, group_by)
+
+    @staticmethod
+    def _matches(obj: T, where: dict[str, Any]) -> bool:
+        try:
+            return matches(obj, where)
+        except TypeError:
+            # условие вычисляется только СУБД (InSubtree): считаем,
+            # что объект может ему удовлетворять
+            return True
+
+    def _invalidate(self, objs: Iterable[T] = (), pks: Iterable[int] = ()) -> None:
+        """
+        Сбросить результаты, на которые влияют добавленные или измененные
+        объекты objs и измененные или удаленные записи pks.
+        """
+        objs = list(objs)
+        pks = set(pks)
+        changed = {obj.pk for obj in objs} | pks
+        for pk in changed & self._objects.keys():
+            del self._objects[pk]
+            self.stats.invalidations += 1
+        stale = [
+            key for key, (where, offset, _, result) in self._queries.items()
+            if not changed.isdisjoint(result)
+            or (pks and offset > 0)
+            or any(self._matches(obj, where) for obj in objs)
+        ]
+        for key in stale:
+            del self._queries[key]
+        self.stats.invalidations += len(stale)
+
+    def add(self, obj: T) -> int:
+        pk = self.inner.add(obj)
+        self._invalidate([obj])
+        return pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        objs = list(objs)
+        pks = self.inner.add_many(objs)
+        self._invalidate(objs)
+        return pks
+
+    def update(self, obj: T) -> None:
+        self.inner.update(obj)
+        self._invalidate([obj], [obj.pk])
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        objs = list(objs)
+        self.inner.update_many(objs)
+        self._invalidate(objs, [obj.pk for obj in objs])
+
+    def delete(self, pk: int) -> None:
+        self.inner.delete(pk)
+        self._invalidate(pks=[pk])
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pks = list(pks)
+        self.inner.delete_many(pks)
+        self._invalidate(pks=pks)
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        try:
+            return self.inner.update_where(where, values)
+        finally:
+            self.clear_cache()
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        try:
+            return self.inner.delete_where(where)
+        finally:
+            self.clear_cache()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Транзакция репозитория inner. При откате кэш сбрасывается целиком.
+        """
+        try:
+            with self.inner.transaction():
+                yield
+        except BaseException:
+            self.clear_cache()
+            raise
@@ -0,0 +1,204 @@
+"""
+Модуль описывает пул соединений с базой данных SQLite
+
+Пул хранит по одному соединению на поток и может использоваться несколькими
+репозиториями (например, для категорий и расходов), работающими с одним файлом.
+Транзакция, открытая на пуле, охватывает все эти репозитории.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+from typing import Any, Iterator
+
+
+def convert_timestamp(value: bytes) -> datetime:
+    """
+    Значение столбца TIMESTAMP -> datetime. В несколько раз быстрее
+    стандартного конвертера sqlite3, разбирающего строку по частям.
+    """
+    return datetime.fromisoformat(value.decode())
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def convert_epoch(value: bytes) -> datetime:
+    """
+    Значение столбца EPOCH (целое число секунд от начала эпохи) -> datetime.
+    """
+    return EPOCH + timedelta(seconds=int(value))
+
+
+sqlite3.register_converter("timestamp", convert_timestamp)
+sqlite3.register_converter("epoch", convert_epoch)
+
+
+# pylint: disable-next=too-many-instance-attributes
+class ConnectionPool:
+    """
+    Пул соединений с файлом базы данных SQLite: одно соединение на поток.
+
+    persistent - держать соединения открытыми между операциями. Если False,
+        соединение закрывается после каждой операции (как при sqlite3.connect
+        на каждый вызов).
+    journal_mode - режим журнала (PRAGMA journal_mode), например "WAL"
+    synchronous - уровень синхронизации (PRAGMA synchronous), например "NORMAL"
+    """
+
+    _shared: dict[str, 'ConnectionPool'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        db_file: str,
+        persistent: bool = True,
+        journal_mode: str | None = None,
+        synchronous: str | None = None
+    ) -> None:
+        self.db_file = db_file
+        self.persistent = persistent
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+
+        self._lock = threading.Lock()
+        self._connections: dict[int, sqlite3.Connection] = {}
+        self._users: dict[int, int] = {}
+        self._depth: dict[int, int] = {}
+
+    @classmethod
+    def shared(cls, db_file: str) -> 'ConnectionPool':
+        """
+        Получить общий для всех репозиториев пул без постоянных соединений
+        для указанного файла.
+        """
+
+        key = os.path.abspath(db_file)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(db_file, persistent=False)
+            return cls._shared[key]
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(
+            self.db_file,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False
+        )
+        if self.journal_mode is not None:
+            con.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        if self.synchronous is not None:
+            con.execute(f"PRAGMA synchronous = {self.synchronous}")
+        return con
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Получить соединение текущего потока (открыть, если его еще нет).
+        """
+
+        ident = threading.get_ident()
+        with self._lock:
+            con = self._connections.get(ident)
+            if con is None:
+                con = self._connections[ident] = self._connect()
+            return con
+
+    def _release(self, ident: int) -> None:
+        with self._lock:
+            self._users[ident] = self._users.get(ident, 1) - 1
+            if self._users[ident] or self.persistent:
+                return
+            del self._users[ident]
+            con = self._connections.pop(ident, None)
+        if con is not None:
+            con.close()
+
+    def _acquire(self) -> tuple[int, sqlite3.Connection]:
+        ident = threading.get_ident()
+        con = self.connection()
+        with self._lock:
+            self._users[ident] = self._users.get(ident, 0) + 1
+        return ident, con
+
+    def in_transaction(self) -> bool:
+        """
+        Открыта ли транзакция в текущем потоке.
+        """
+
+        return self._depth.get(threading.get_ident(), 0) > 0
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Получить курсор соединения текущего потока. По выходу из контекста
+        изменения фиксируются (при ошибке - откатываются), если только
+        курсор не используется внутри транзакции.
+        """
+
+        in_transaction = self.in_transaction()
+        ident, con = self._acquire()
+        cur = con.cursor()
+        try:
+            if in_transaction:
+                yield cur
+            else:
+                with con:
+                    yield cur
+        finally:
+            cur.close()
+            self._release(ident)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Выполнить все операции внутри контекста одной транзакцией:
+        зафиксировать по выходу из контекста, откатить при ошибке.
+        Вложенные транзакции реализованы точками сохранения (SAVEPOINT).
+        """
+
+        ident, con = self._acquire()
+        with self._lock:
+            depth = self._depth.get(ident, 0)
+            self._depth[ident] = depth + 1
+        savepoint = f"sp{depth}"
+        try:
+            con.execute("BEGIN" if depth == 0 else f"SAVEPOINT {savepoint}")
+            try:
+                yield con
+            except BaseException:
+                if depth == 0:
+                    con.rollback()
+                else:
+                    con.execute(f"ROLLBACK TO {savepoint}")
+                    con.execute(f"RELEASE {savepoint}")
+                raise
+            if depth == 0:
+                con.commit()
+            else:
+                con.execute(f"RELEASE {savepoint}")
+        finally:
+            with self._lock:
+                self._depth[ident] = depth
+            self._release(ident)
+
+    def close(self) -> None:
+        """
+        Закрыть все соединения пула. При следующем обращении соединение
+        будет открыто заново.
+        """
+
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._users.clear()
+            self._depth.clear()
+        for con in connections:
+            con.close()
+
+    def __enter__(self) -> 'ConnectionPool':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -2,42 +2,329 @@
 Модуль описывает репозиторий, работающий в оперативной памяти
 """
 
-from itertools import count
-from typing import Any
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from copy import copy
+from itertools import count, islice
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Sequence
 
+from bookkeeper.instrumentation import timed
 from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.query import (
+    Between, Condition, Eq, Ge, Gt, In, Le, Lt,
+    as_condition, order_objects, parse_order
+)
+
+_value = itemgetter(0)
 
 
 class MemoryRepository(AbstractRepository[T]):
     """
     Репозиторий, работающий в оперативной памяти. Хранит данные в словаре.
+
+    indexes - поля, по которым строятся хеш-индексы (поиск по равенству
+        и In за O(1) на значение)
+    sorted_indexes - поля, по которым строятся упорядоченные индексы
+        (поиск по диапазону за O(log n + k), сортировка по полю без
+        полного перебора). Значения None в упорядоченный индекс не попадают.
+    Индексы поддерживаются при add/update/delete. Объекты, хранящиеся
+    в репозитории, нельзя изменять в обход update, иначе индексы устареют
+    (а откат транзакции не восстановит прежние значения).
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        indexes: Iterable[str] = (),
+        sorted_indexes: Iterable[str] = ()
+    ) -> None:
         self._container: dict[int, T] = {}
         self._counter = count(1)
 
+        self._hash: dict[str, dict[Any, set[int]]] = {f: {} for f in indexes}
+        self._sorted: dict[str, list[tuple[Any, int]]] = {
+            f: [] for f in sorted_indexes
+        }
+        self._indexed = list(self._hash.keys() | self._sorted.keys())
+        self._keys: dict[int, tuple[Any, ...]] = {}
+        # журналы отката открытых транзакций: pk -> копия объекта до первого
+        # изменения в транзакции (None, если объекта не было)
+        self._undo: list[dict[int, T | None]] = []
+
+    def _index(self, pk: int, obj: T) -> None:
+        if not self._indexed:
+            return
+        keys = tuple(getattr(obj, attr) for attr in self._indexed)
+        self._keys[pk] = keys
+        for attr, value in zip(self._indexed, keys):
+            if attr in self._hash:
+                self._hash[attr].setdefault(value, set()).add(pk)
+            if attr in self._sorted and value is not None:
+                insort(self._sorted[attr], (value, pk))
+
+    def _unindex(self, pk: int) -> None:
+        keys = self._keys.pop(pk, None)
+        if keys is None:
+            return
+        for attr, value in zip(self._indexed, keys):
+            if attr in self._hash:
+                pks = self._hash[attr][value]
+                pks.discard(pk)
+                if not pks:
+                    del self._hash[attr][value]
+            if attr in self._sorted and value is not None:
+                index = self._sorted[attr]
+                del index[bisect_left(index, (value, pk))]
+
+    def _touch(self, pks: Iterable[int]) -> None:
+        """ Запомнить в журнале отката состояние объектов pks до изменения """
+        if not self._undo:
+            return
+        log = self._undo[-1]
+        for pk in pks:
+            if pk not in log:
+                obj = self._container.get(pk)
+                log[pk] = None if obj is None else copy(obj)
+
+    @timed("memory")
     def add(self, obj: T) -> int:
         if getattr(obj, 'pk', None) != 0:
             raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
         pk = next(self._counter)
+        self._touch([pk])
         self._container[pk] = obj
         obj.pk = pk
+        self._index(pk, obj)
         return pk
 
+    @timed("memory")
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        objs = list(objs)
+        for obj in objs:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        pks = []
+        for obj in objs:
+            pk = next(self._counter)
+            self._touch([pk])
+            self._container[pk] = obj
+            obj.pk = pk
+            self._index(pk, obj)
+            pks.append(pk)
+        return pks
+
+    @timed("memory")
     def get(self, pk: int) -> T | None:
         return self._container.get(pk)
 
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
-        if where is None:
-            return list(self._container.values())
-        return [obj for obj in self._container.values()
-                if all(getattr(obj, attr) == value for attr, value in where.items())]
+    @timed("memory")
+    def get_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0
+    ) -> list[T]:
+        conditions = [(attr, as_condition(value))
+                      for attr, value in (where or {}).items()]
+        end = None if limit is None else offset + limit
+        candidates = self._candidates(conditions)
+        order = parse_order(order_by)
+        if candidates is None and len(order) == 1 and self._covers(order[0][0]):
+            ordered = (self._container[pk] for pk in self._ordered(*order[0]))
+            return list(islice(self._test(ordered, conditions), offset, end))
+
+        objs = list(self._test(
+            self._container.values() if candidates is None
+            else (self._container[pk] for pk in sorted(candidates)),
+            conditions
+        ))
+        if order_by is None:
+            return objs[offset:end]
+        return order_objects(objs, order_by, limit, offset)
+
+    def iter_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[T]:
+        if order_by is not None:
+            yield from self.get_all(where, order_by)
+            return
+        conditions = [(attr, as_condition(value))
+                      for attr, value in (where or {}).items()]
+        candidates = self._candidates(conditions)
+        # перебираем копию ключей, чтобы репозиторий можно было менять
+        # во время перебора
+        pks = list(self._container) if candidates is None else sorted(candidates)
+        objs = (self._container[pk] for pk in pks if pk in self._container)
+        yield from self._test(objs, conditions)
+
+    @staticmethod
+    def _test(
+        objs: Iterable[T],
+        conditions: list[tuple[str, Condition]]
+    ) -> Iterator[T]:
+        if not conditions:
+            return iter(objs)
+        return (obj for obj in objs
+                if all(cond.test(getattr(obj, attr)) for attr, cond in conditions))
+
+    def _candidates(
+        self,
+        conditions: list[tuple[str, Condition]]
+    ) -> set[int] | list[int] | None:
+        """
+        Первичные ключи объектов, которые могут удовлетворять условиям,
+        по самому избирательному из индексов; None, если индексы не помогают.
+        """
+        best: set[int] | list[int] | None = None
+        for attr, cond in conditions:
+            pks = self._lookup(attr, cond)
+            if pks is not None and (best is None or len(pks) < len(best)):
+                best = pks
+        return best
 
+    def _lookup(self, attr: str, cond: Condition) -> set[int] | list[int] | None:
+        if attr in self._hash:
+            index = self._hash[attr]
+            if isinstance(cond, Eq):
+                return index.get(cond.value, set())
+            if isinstance(cond, In):
+                return set().union(*(index.get(v, ()) for v in cond.values))
+        if attr in self._sorted:
+            sorted_index = self._sorted[attr]
+            low, high = 0, len(sorted_index)
+            if isinstance(cond, (Gt, Ge)):
+                bisect = bisect_right if isinstance(cond, Gt) else bisect_left
+                low = bisect(sorted_index, cond.value, key=_value)
+            elif isinstance(cond, (Lt, Le)):
+                bisect = bisect_left if isinstance(cond, Lt) else bisect_right
+                high = bisect(sorted_index, cond.value, key=_value)
+            elif isinstance(cond, Between):
+                low = bisect_left(sorted_index, cond.low, key=_value)
+                high = bisect_right(sorted_index, cond.high, key=_value)
+            elif isinstance(cond, Eq) and cond.value is not None:
+                low = bisect_left(sorted_index, cond.value, key=_value)
+                high = bisect_right(sorted_index, cond.value, key=_value)
+            else:
+                return None
+            return [pk for _, pk in sorted_index[low:high]]
+        return None
+
+    def _covers(self, attr: str) -> bool:
+        """
+        Упорядоченный индекс по полю есть и содержит все объекты (значения
+        None в индекс не попадают). Пустой репозиторий без индекса по полю
+        индексом не покрыт.
+        """
+        index = self._sorted.get(attr)
+        return index is not None and len(index) == len(self._container)
+
+    def _ordered(self, attr: str, desc: bool) -> Iterator[int]:
+        """
+        Первичные ключи в порядке сортировки по полю; при равенстве значений
+        - в порядке добавления, как при устойчивой сортировке.
+        """
+        index = self._sorted[attr]
+        if not desc:
+            yield from (pk for _, pk in index)
+            return
+        end = len(index)
+        while end:
+            start = bisect_left(index, index[end - 1][0], hi=end, key=_value)
+            yield from (pk for _, pk in index[start:end])
+            end = start
+
+    @timed("memory")
     def update(self, obj: T) -> None:
         if obj.pk == 0:
             raise ValueError('attempt to update object with unknown primary key')
+        self._touch([obj.pk])
+        self._unindex(obj.pk)
         self._container[obj.pk] = obj
+        self._index(obj.pk, obj)
+
+    @timed("memory")
+    def update_many(self, objs: Iterable[T]) -> None:
+        objs = list(objs)
+        if any(obj.pk == 0 for obj in objs):
+            raise ValueError('attempt to update object with unknown primary key')
+        self._touch(obj.pk for obj in objs)
+        for obj in objs:
+            self._unindex(obj.pk)
+            self._container[obj.pk] = obj
+            self._index(obj.pk, obj)
 
+    @timed("memory")
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        objs = self.get_all(where)
+        self._touch(obj.pk for obj in objs)
+        for obj in objs:
+            self._unindex(obj.pk)
+            for attr, value in values.items():
+                setattr(obj, attr, value)
+            self._index(obj.pk, obj)
+        return len(objs)
+
+    @timed("memory")
     def delete(self, pk: int) -> None:
+        self._touch([pk])
         self._container.pop(pk)
+        self._unindex(pk)
+
+    @timed("memory")
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pks = list(pks)
+        missing = [pk for pk in pks if pk not in self._container]
+        if missing or len(set(pks)) != len(pks):
+            raise KeyError(f'trying to delete unexisting among primary keys {pks}')
+        self._touch(pks)
+        for pk in pks:
+            del self._container[pk]
+            self._unindex(pk)
+
+    @timed("memory")
+    def delete_where(self, where: dict[str, Any]) -> int:
+        objs = self.get_all(where)
+        self._touch(obj.pk for obj in objs)
+        for obj in objs:
+            del self._container[obj.pk]
+            self._unindex(obj.pk)
+        return len(objs)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Изменения внутри контекста записываются в журнал отката: для каждого
+        добавленного, измененного или удаленного объекта - его копия
+        до первого изменения. При ошибке восстанавливаются только эти
+        объекты, поэтому вход в транзакцию не зависит от числа объектов
+        в репозитории. Журнал вложенной транзакции при успешном выходе
+        переносится во внешнюю.
+        """
+        self._undo.append({})
+        try:
+            yield
+        except BaseException:
+            self._rollback(self._undo.pop())
+            raise
+        log = self._undo.pop()
+        if self._undo:
+            for pk, obj in log.items():
+                self._undo[-1].setdefault(pk, obj)
+
+    def _rollback(self, log: dict[int, T | None]) -> None:
+        restored = False
+        for pk, obj in log.items():
+            self._unindex(pk)
+            if obj is None:
+                self._container.pop(pk, None)
+                continue
+            restored = restored or pk not in self._container
+            self._container[pk] = obj
+            self._index(pk, obj)
+        if restored:
+            # удаленные объекты возвращаются на свои места в порядке pk
+            self._container = dict(sorted(self._container.items()))
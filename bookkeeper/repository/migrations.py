@@ -0,0 +1,268 @@
+"""
+Модуль описывает миграции схемы базы данных SQLite
+
+Версия схемы хранится в заголовке файла базы данных (PRAGMA user_version).
+Миграция - шаг с номером версии, который переводит базу данных
+из предыдущей версии в эту. Migrator при запуске применяет по порядку все
+шаги с номером больше текущей версии:
+
+    migrator = Migrator(pool, [
+        Migration(1, "индекс по дате", lambda con, progress: create_index(
+            con, "expense", ["expense_date"]
+        )),
+    ])
+    migrator.migrate()
+
+Вспомогательные функции изменяют таблицы средствами СУБД, не загружая
+строки в Python. Большие таблицы переписываются (rewrite_table) пакетами
+по rowid с отчетом о ходе выполнения. Например, перевод дат в формат
+SQLiteRepository(..., epoch_dates=True):
+
+    Migration(2, "даты в секундах", lambda con, progress: convert_dates(
+        con, "expense", ["expense_date"], epoch=True, progress=progress
+    ))
+"""
+
+from dataclasses import dataclass
+import sqlite3
+from typing import Callable, Iterable, Mapping, Sequence
+
+from bookkeeper.repository.connection_pool import ConnectionPool
+
+Progress = Callable[[str, int, int], None]
+""" Отчет о ходе выполнения: (описание этапа, выполнено, всего) """
+
+
+def _silent(*_: object) -> None:
+    """ Отчет о ходе выполнения, который никуда не выводится """
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Шаг миграции: apply(con, progress) переводит базу данных в версию
+    version. Шаг выполняется одной транзакцией вместе с записью новой
+    версии, поэтому прерванный шаг не оставляет изменений.
+    """
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection, Progress], object]
+
+
+class Migrator:
+    """
+    Применяет к базе данных недостающие шаги миграции.
+
+    pool - пул соединений с базой данных
+    migrations - шаги миграции (номера версий должны быть различными
+        и положительными)
+    """
+
+    def __init__(self, pool: ConnectionPool, migrations: Iterable[Migration]) -> None:
+        self.pool = pool
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        versions = [m.version for m in self.migrations]
+        if len(set(versions)) != len(versions) or any(v <= 0 for v in versions):
+            raise ValueError(
+                f'migration versions must be unique and positive: {versions}'
+            )
+
+    def version(self) -> int:
+        """ Текущая версия схемы базы данных """
+        with self.pool.cursor() as cur:
+            return int(cur.execute("PRAGMA user_version").fetchone()[0])
+
+    def pending(self) -> list[Migration]:
+        """ Шаги, которые еще не применены """
+        current = self.version()
+        return [m for m in self.migrations if m.version > current]
+
+    def migrate(self, progress: Progress | None = None) -> int:
+        """
+        Применить все недостающие шаги по порядку.
+
+        Parameters
+        ----------
+        progress - функция для отчета о ходе выполнения
+
+        Returns
+        -------
+        Версия схемы после миграции
+        """
+        progress = progress or _silent
+        for migration in self.pending():
+            progress(migration.description, 0, 1)
+            with self.pool.transaction() as con:
+                migration.apply(con, progress)
+                con.execute(f"PRAGMA user_version = {int(migration.version)}")
+            progress(migration.description, 1, 1)
+        return self.version()
+
+
+def columns(con: sqlite3.Connection, table: str) -> dict[str, str]:
+    """ Столбцы таблицы: {название: объявленный тип} в порядке объявления """
+    return {
+        row[1]: row[2]
+        for row in con.execute(f"PRAGMA table_info({table})").fetchall()
+    }
+
+
+def add_column(
+    con: sqlite3.Connection,
+    table: str,
+    column: str,
+    decl: str
+) -> bool:
+    """
+    Добавить в таблицу столбец (ALTER TABLE ADD COLUMN), если его нет.
+    Существующие строки не переписываются. Возвращает True, если столбец
+    был добавлен.
+    """
+    if column in columns(con, table):
+        return False
+    con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+def create_index(
+    con: sqlite3.Connection,
+    table: str,
+    index_columns: Sequence[str]
+) -> str:
+    """
+    Создать индекс по столбцам, если его нет. Возвращает название индекса
+    (mig_idx_<таблица>__<столбцы>): префикс отличается от индексов
+    SQLiteRepository (idx_), поэтому репозиторий не удаляет индексы,
+    созданные миграциями, даже с drop_undeclared.
+    """
+    name = f"mig_idx_{table}__" + '__'.join(index_columns)
+    con.execute(
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(index_columns)})"
+    )
+    return name
+
+
+def _index_sql(
+    con: sqlite3.Connection,
+    table: str,
+    keep_columns: Iterable[str]
+) -> list[str]:
+    """
+    Команды создания индексов таблицы (кроме автоматических), все столбцы
+    которых есть в keep_columns.
+    """
+    keep = set(keep_columns)
+    return [
+        sql for name, sql in con.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            [table]
+        ).fetchall()
+        if all(row[2] is None or row[2] in keep
+               for row in con.execute(f"PRAGMA index_info({name})"))
+    ]
+
+
+def rewrite_table(  # pylint: disable=too-many-arguments
+    con: sqlite3.Connection,
+    table: str,
+    new_columns: Mapping[str, str],
+    expressions: Mapping[str, str] | None = None,
+    *,
+    batch_size: int = 10000,
+    progress: Progress | None = None
+) -> int:
+    """
+    Переписать таблицу с новым набором столбцов, сохранив rowid. Строки
+    копируются запросами INSERT ... SELECT пакетами по batch_size строк
+    в порядке rowid, после каждого пакета вызывается progress. Затем старая
+    таблица удаляется, новая получает ее имя, и индексы старой таблицы
+    создаются заново теми же командами (из sqlite_master). Индексы
+    по столбцам, которых нет в new_columns, удаляются.
+
+    Parameters
+    ----------
+    con - соединение с базой данных (внутри транзакции)
+    table - название таблицы
+    new_columns - столбцы новой таблицы: {название: объявленный тип}
+    expressions - выражения SQL для значений столбцов новой таблицы
+        через столбцы старой; по умолчанию - одноименный столбец старой
+        таблицы или NULL, если его нет
+    batch_size - число строк в пакете
+    progress - функция для отчета о ходе выполнения
+
+    Returns
+    -------
+    Число скопированных строк
+    """
+    progress = progress or _silent
+    old = columns(con, table)
+    expressions = expressions or {}
+    values = ', '.join(
+        expressions.get(k, k if k in old else "NULL") for k in new_columns
+    )
+    new = f"{table}__new"
+    con.execute(f"DROP TABLE IF EXISTS {new}")
+    con.execute(f"CREATE TABLE {new}(" + ', '.join(
+        f"{k} {t}" for k, t in new_columns.items()
+    ) + ")")
+
+    total = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    done, last = 0, None
+    progress(f"{table}: перезапись", done, total)
+    while True:
+        low = last if last is not None else -1
+        last = con.execute(
+            f"SELECT MAX(rowid) FROM (SELECT rowid FROM {table} "
+            f"WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            [low, batch_size]
+        ).fetchone()[0]
+        if last is None:
+            break
+        done += con.execute(
+            f"INSERT INTO {new} (rowid, {', '.join(new_columns)}) "
+            f"SELECT rowid, {values} "
+            f"FROM {table} WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+            [low, last]
+        ).rowcount
+        progress(f"{table}: перезапись", done, total)
+
+    indexes = _index_sql(con, table, new_columns)
+    con.execute(f"DROP TABLE {table}")
+    con.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    for sql in indexes:
+        con.execute(sql)
+    return done
+
+
+def convert_dates(
+    con: sqlite3.Connection,
+    table: str,
+    date_columns: Sequence[str],
+    epoch: bool,
+    *,
+    progress: Progress | None = None
+) -> int:
+    """
+    Перевести столбцы дат в формат EPOCH (целое число секунд от начала
+    эпохи, epoch=True) или TIMESTAMP (текст ISO 8601, epoch=False).
+    Таблица переписывается (rewrite_table) с сохранением rowid и индексов;
+    столбцы, уже объявленные в нужном формате, не изменяются. Доли секунды
+    при переводе в EPOCH отбрасываются. Возвращает число скопированных
+    строк (0, если переписывать не нужно).
+    """
+    decl = "EPOCH" if epoch else "TIMESTAMP"
+    convert = (
+        "CAST(strftime('%s', {0}) AS INTEGER)" if epoch
+        else "datetime({0}, 'unixepoch')"
+    )
+    declared = columns(con, table)
+    dates = [k for k in date_columns if declared[k].upper() != decl]
+    if not dates:
+        return 0
+    return rewrite_table(
+        con, table,
+        {k: decl if k in dates else t for k, t in declared.items()},
+        {k: convert.format(k) for k in dates},
+        progress=progress
+    )
@@ -0,0 +1,349 @@
+"""
+Модуль описывает условия для выборки объектов из репозитория
+
+Условие выборки (where) задается словарем {'название_поля': значение}.
+Значением может быть как само значение поля (проверка на равенство),
+так и одно из условий, описанных в модуле:
+
+    {'expense_date': Between(start, end), 'category': In([1, 2, 3])}
+
+Условия на разные поля объединяются через И. Каждое условие умеет
+проверить значение поля объекта (для репозиториев в памяти) и представить
+себя в виде текста SQL (для репозиториев, работающих с СУБД).
+
+Также модуль описывает группировку по периодам времени (Period) для
+агрегирующих запросов.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+import heapq
+import operator
+from operator import attrgetter
+from typing import Any, Callable, ClassVar, Iterable, Sequence, TypeVar
+
+T = TypeVar('T')
+
+
+class Condition(ABC):
+    """
+    Условие на значение одного поля.
+    """
+
+    @abstractmethod
+    def test(self, value: Any) -> bool:
+        """ Проверить, удовлетворяет ли значение поля условию """
+
+    @abstractmethod
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        """ Текст условия SQL для поля field и список параметров к нему """
+
+
+@dataclass(frozen=True)
+class Eq(Condition):
+    """
+    Значение поля равно value. Eq(None) соответствует NULL в СУБД.
+    """
+    value: Any
+
+    def test(self, value: Any) -> bool:
+        return bool(value == self.value)
+
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        if self.value is None:
+            return f"{field} IS NULL", []
+        return f"{field} = ?", [self.value]
+
+
+@dataclass(frozen=True)
+class _Compare(Condition):
+    """
+    Сравнение значения поля с value. Значение None (NULL) не удовлетворяет
+    ни одному сравнению.
+    """
+    value: Any
+
+    op: ClassVar[str]
+
+    @abstractmethod
+    def compare(self, value: Any) -> bool:
+        """ Сравнить значение поля (не None) с value """
+
+    def test(self, value: Any) -> bool:
+        return value is not None and self.compare(value)
+
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        return f"{field} {self.op} ?", [self.value]
+
+
+class Ne(_Compare):
+    """ Значение поля не равно value """
+    op = "<>"
+
+    def compare(self, value: Any) -> bool:
+        return bool(value != self.value)
+
+
+class Lt(_Compare):
+    """ Значение поля меньше value """
+    op = "<"
+
+    def compare(self, value: Any) -> bool:
+        return bool(value < self.value)
+
+
+class Le(_Compare):
+    """ Значение поля меньше или равно value """
+    op = "<="
+
+    def compare(self, value: Any) -> bool:
+        return bool(value <= self.value)
+
+
+class Gt(_Compare):
+    """ Значение поля больше value """
+    op = ">"
+
+    def compare(self, value: Any) -> bool:
+        return bool(value > self.value)
+
+
+class Ge(_Compare):
+    """ Значение поля больше или равно value """
+    op = ">="
+
+    def compare(self, value: Any) -> bool:
+        return bool(value >= self.value)
+
+
+@dataclass(frozen=True)
+class Between(Condition):
+    """
+    Значение поля лежит в отрезке [low, high] (обе границы включены).
+    """
+    low: Any
+    high: Any
+
+    def test(self, value: Any) -> bool:
+        return value is not None and bool(self.low <= value <= self.high)
+
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        return f"{field} BETWEEN ? AND ?", [self.low, self.high]
+
+
+@dataclass(frozen=True, init=False)
+class In(Condition):
+    """
+    Значение поля совпадает с одним из values.
+    """
+    values: tuple[Any, ...]
+
+    def __init__(self, values: Iterable[Any]) -> None:
+        object.__setattr__(self, 'values', tuple(values))
+
+    def test(self, value: Any) -> bool:
+        return value is not None and value in self.values
+
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        return (
+            f"{field} IN ({', '.join('?' * len(self.values))})",
+            list(self.values)
+        )
+
+
+@dataclass(frozen=True)
+class InSubtree(Condition):
+    """
+    Значение поля - id записи root таблицы-дерева table или любого ее потомка
+    (потомки связаны с родителем полем parent), например, расходы категории
+    вместе со всеми ее подкатегориями:
+
+        {'category': InSubtree(cat_pk)}
+
+    Поддерево вычисляется рекурсивным запросом (WITH RECURSIVE) в СУБД,
+    поэтому условие работает только в репозиториях, использующих SQL.
+    В оперативной памяти используйте In(CategoryTree.subtree(root)).
+    """
+    root: int
+    table: str = 'category'
+    parent: str = 'parent'
+
+    def test(self, value: Any) -> bool:
+        raise TypeError('InSubtree can only be evaluated by a database')
+
+    def sql(self, field: str) -> tuple[str, list[Any]]:
+        return (
+            f"{field} IN (WITH RECURSIVE subtree(id) AS (SELECT ? UNION ALL "
+            f"SELECT t.rowid FROM {self.table} t "
+            f"JOIN subtree ON t.{self.parent} = subtree.id) "
+            f"SELECT id FROM subtree)",
+            [self.root]
+        )
+
+
+def as_condition(value: Any) -> Condition:
+    """
+    Значение из словаря-условия -> объект Condition.
+    """
+    return value if isinstance(value, Condition) else Eq(value)
+
+
+def matches(obj: Any, where: dict[str, Any] | None) -> bool:
+    """
+    Проверить, удовлетворяет ли объект условию where.
+    """
+    if not where:
+        return True
+    return all(
+        as_condition(cond).test(getattr(obj, attr))
+        for attr, cond in where.items()
+    )
+
+
+def parse_order(order_by: str | Sequence[str] | None) -> list[tuple[str, bool]]:
+    """
+    Порядок сортировки -> список пар (название поля, по убыванию).
+    Порядок задается названием поля или списком названий; знак "-"
+    перед названием означает сортировку по убыванию:
+
+        "-expense_date" или ["category", "-amount"]
+    """
+    if order_by is None:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    return [
+        (field[1:], True) if field.startswith('-') else (field, False)
+        for field in order_by
+    ]
+
+
+def _order_key(field: str) -> Callable[[Any], tuple[bool, Any]]:
+    """
+    Ключ сортировки по полю: значения None меньше любых других, как NULL
+    в SQLite (первые по возрастанию, последние по убыванию).
+    """
+    get = attrgetter(field)
+
+    def key(obj: Any) -> tuple[bool, Any]:
+        value = get(obj)
+        return value is not None, value
+    return key
+
+
+def order_objects(
+    objs: Iterable[T],
+    order_by: str | Sequence[str] | None = None,
+    limit: int | None = None,
+    offset: int = 0
+) -> list[T]:
+    """
+    Отсортировать объекты (сортировка устойчивая) и вернуть не более limit
+    из них, пропустив первые offset. Значения None упорядочиваются
+    как NULL в SQLite.
+    """
+    order = parse_order(order_by)
+    end = None if limit is None else offset + limit
+    if len(order) == 1 and end is not None:
+        # частичная сортировка: O(n log(limit)) вместо O(n log(n))
+        field, desc = order[0]
+        select = heapq.nlargest if desc else heapq.nsmallest
+        return select(end, objs, key=_order_key(field))[offset:]
+    result = list(objs)
+    for field, desc in reversed(order):
+        result.sort(key=_order_key(field), reverse=desc)
+    return result[offset:end]
+
+
+@dataclass(frozen=True)
+class Period:
+    """
+    Группировка по периоду времени: значение поля-даты field заменяется
+    строкой, обозначающей период: 'day' - "2023-03-12", 'week' - "2023-10"
+    (год и номер недели, неделя начинается с понедельника), 'month' - "2023-03".
+    """
+    field: str
+    unit: str = 'day'
+
+    formats: ClassVar[dict[str, str]] = {
+        'day': '%Y-%m-%d',
+        'week': '%Y-%W',
+        'month': '%Y-%m',
+    }
+
+    def __post_init__(self) -> None:
+        if self.unit not in self.formats:
+            raise ValueError(f'unknown period `{self.unit}`')
+
+    def key(self, value: datetime | None) -> str | None:
+        """ Период, к которому относится значение поля """
+        return None if value is None else value.strftime(self.formats[self.unit])
+
+    def sql(self, column: str, unixepoch: bool = False) -> str:
+        """
+        Выражение SQL для периода значения столбца column
+        (unixepoch - значения хранятся числом секунд от начала эпохи).
+        """
+        modifier = ", 'unixepoch'" if unixepoch else ""
+        return f"strftime('{self.formats[self.unit]}', {column}{modifier})"
+
+
+_REDUCERS: dict[str, Callable[[Any, Any], Any]] = {
+    'sum': operator.add,
+    'count': lambda acc, _: acc,  # значения не нужны, считает aggregate_objects
+    'min': min,
+    'max': max,
+    'avg': operator.add,
+}
+
+_FINALIZERS: dict[str, Callable[[Any, int], Any]] = {
+    'sum': lambda value, count: 0 if count == 0 else value,
+    'count': lambda value, count: count,
+    'min': lambda value, count: value,
+    'max': lambda value, count: value,
+    'avg': lambda value, count: None if count == 0 else value / count,
+}
+
+AGGREGATES = tuple(_REDUCERS)
+
+
+def _group_key(group: str | Period) -> Callable[[Any], Any]:
+    if isinstance(group, Period):
+        get = attrgetter(group.field)
+        return lambda obj: group.key(get(obj))
+    return attrgetter(group)
+
+
+def aggregate_objects(
+    objs: Iterable[Any],
+    field: str,
+    func: str = 'sum',
+    group_by: Sequence[str | Period] = ()
+) -> dict[tuple[Any, ...], Any]:
+    """
+    Вычислить агрегирующую функцию func (sum, count, min, max, avg)
+    от значений поля field за один проход по объектам, сгруппировав их
+    по полям (или периодам) group_by. Значения None не учитываются.
+    Результат - словарь {(значения полей группировки): значение функции};
+    без группировки результат содержит единственный ключ ().
+    """
+    if func not in _REDUCERS:
+        raise ValueError(f'unknown aggregate function `{func}`')
+    reduce = _REDUCERS[func]
+    keys = [_group_key(group) for group in group_by]
+    get_value = attrgetter(field)
+
+    acc: dict[tuple[Any, ...], list[Any]] = {}  # группа -> [значение, количество]
+    if not group_by:
+        acc[()] = [None, 0]
+    for obj in objs:
+        state = acc.setdefault(tuple(key(obj) for key in keys), [None, 0])
+        value = get_value(obj)
+        if value is None:
+            continue
+        state[0] = value if state[1] == 0 else reduce(state[0], value)
+        state[1] += 1
+
+    finalize = _FINALIZERS[func]
+    return {group: finalize(value, count) for group, (value, count) in acc.items()}
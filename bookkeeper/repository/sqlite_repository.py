@@ -1,131 +1,585 @@
-"""
-Модуль описывает репозиторий, работающий с базой данных посредством SQLite
-"""
-
-from datetime import datetime
-from inspect import get_annotations
-import sqlite3
-from typing import Any
-
-from bookkeeper.repository.abstract_repository import AbstractRepository, T
-
-
-class SQLiteRepository(AbstractRepository[T]):
-    """
-    Репозиторий, работающий в постоянной памяти. Хранит базу данных в файле.
-    """
-
-    def __init__(self, db_file: str, cls: type) -> None:
-        self.db_file = db_file
-        self.table_name = cls.__name__.lower()
-        self.fields = get_annotations(cls, eval_str=True)
-        self.fields.pop('pk')
-
-        self.lastrowid: int | None = 0
-
-        self.cls = cls
-
-        types_py2sql = {
-            str: "TEXT",
-            int: "INT",
-            float: "FLOAT",
-            datetime: "TIMESTAMP",
-        }
-
-        with sqlite3.connect(
-            self.db_file,
-            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-        ) as con:
-            cur = con.cursor()
-            res = cur.execute("SELECT name FROM sqlite_master")
-            tables = {i[0] for i in res.fetchall()}
-            if self.table_name not in tables:
-                names = ', '.join(
-                    f"{k} {types_py2sql.get(v, 'INT')}"
-                    for k, v in self.fields.items()
-                )
-                cur.execute(
-                    f"CREATE TABLE {self.table_name}({names})"
-                )
-        con.close()
-
-        fields = ', '.join(self.fields.keys())
-        query = ', '.join("?" * len(self.fields))
-        upd = ', '.join(f"{k}=?" for k in self.fields.keys())
-        self.sql: dict[str, str] = {
-            "pragma": "PRAGMA foreign_keys = ON",
-            "insert": f"INSERT INTO {self.table_name} ({fields}) VALUES ({query})",
-            "select": f"SELECT rowid, * FROM {self.table_name} ",
-            "update": f"UPDATE {self.table_name} SET {upd} ",
-            "delete": f"DELETE FROM {self.table_name} ",
-            "drop": f"DROP TABLE {self.table_name}",
-        }
-
-        def where(*keys: str) -> str:
-            if not keys:
-                return ""
-            return "WHERE " + ', '.join(f"{k}=?" for k in keys)
-        self.sql_where = where
-
-    def _execute(self, command: str, values: list[Any] | None = None) -> Any:
-        with sqlite3.connect(
-                    self.db_file,
-                    detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES) as con:
-            cur = con.cursor()
-            if values:
-                res = cur.execute(command, list(values))
-            else:
-                res = cur.execute(command)
-            ret, self.lastrowid = res.fetchall(), cur.lastrowid
-        con.close()
-        return ret
-
-    def add(self, obj: T) -> int:
-        if getattr(obj, 'pk', None) != 0:
-            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
-
-        values = [getattr(obj, x) for x in self.fields]
-        self._execute(self.sql["insert"], values)
-        if self.lastrowid is None:
-            raise RuntimeError(f'trying to add object {obj} failed')
-        obj.pk = self.lastrowid
-        return obj.pk
-
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
-        if where is None:
-            where = {}
-        res = self._execute(
-            self.sql["select"] + self.sql_where(*where.keys()),
-            list(where.values())
-        )
-        objs = []
-        for pk, *values in res:
-            obj = self.cls(**dict(zip(self.fields.keys(), values)))
-            obj.pk = pk
-            objs.append(obj)
-        return objs
-
-    def get(self, pk: int) -> T | None:
-        objs = self.get_all({'rowid': pk})
-        return objs[0] if objs else None
-
-    def update(self, obj: T) -> None:
-        if getattr(obj, 'pk', None) == 0:
-            raise ValueError(f'trying to update object {obj} with zero `pk` attribute')
-        self._execute(
-            self.sql["update"] + self.sql_where("rowid"),
-            [getattr(obj, x) for x in self.fields] + [obj.pk]
-        )
-
-    def delete(self, pk: int) -> None:
-        res = self._execute(self.sql["select"] + self.sql_where("rowid"), [pk])
-        if not res:
-            raise KeyError(f'trying to delete unexisting with primary key {pk}')
-        self._execute(self.sql["delete"] + self.sql_where("rowid"), [pk])
-
-    def clear(self) -> None:
-        """
-        Удалить все записи из базы данных
-        """
-
-        self._execute(self.sql["delete"])
+"""
+Модуль описывает репозиторий, работающий с базой данных посредством SQLite
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from dataclasses import fields as dataclass_fields, is_dataclass
+from datetime import datetime, timedelta
+from inspect import get_annotations
+from operator import itemgetter
+import time
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from bookkeeper.instrumentation import INSTRUMENTATION
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.connection_pool import EPOCH, ConnectionPool
+from bookkeeper.repository import migrations
+from bookkeeper.repository.query import (
+    AGGREGATES, Period, as_condition, parse_order
+)
+
+
+# pylint: disable-next=too-many-instance-attributes
+class SQLiteRepository(AbstractRepository[T]):
+    """
+    Репозиторий, работающий в постоянной памяти. Хранит базу данных в файле.
+
+    pool - пул соединений с базой данных. Если не задан, используется общий
+        для файла пул, открывающий соединение на каждую операцию. Для работы
+        с постоянным соединением передайте ConnectionPool(db_file), общий
+        для всех репозиториев этого файла.
+    indexes - поля, по которым нужно построить индексы: название поля или
+        кортеж названий для составного индекса. Недостающие индексы
+        создаются, существующие не удаляются.
+    drop_undeclared - удалить индексы, созданные ранее репозиторием
+        (idx_<таблица>__...) и отсутствующие в indexes. По умолчанию
+        выключено: иначе любой скрипт, открывший базу без indexes,
+        удалял бы индексы приложения. Устаревшие индексы лучше удалять
+        миграцией (migrations.Migrator).
+    epoch_dates - хранить даты (поля datetime) целым числом секунд от начала
+        эпохи (тип столбца EPOCH) вместо текста (TIMESTAMP): компактнее,
+        сравнение и индекс - числовые, доли секунды не сохраняются.
+        Если в существующей таблице даты хранятся в другом формате,
+        возбуждается ValueError: формат меняется миграцией
+        (migrations.convert_dates), а не открытием репозитория.
+
+    Если таблица уже существует, в нее добавляются столбцы для новых полей
+    класса. Для изменений схемы, которые нельзя вывести из полей класса,
+    используйте migrations.Migrator.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        db_file: str,
+        cls: type,
+        pool: ConnectionPool | None = None,
+        indexes: Iterable[str | tuple[str, ...]] = (),
+        epoch_dates: bool = False,
+        *,
+        drop_undeclared: bool = False
+    ) -> None:
+        if pool is None:
+            pool = ConnectionPool.shared(db_file)
+        elif pool.db_file != db_file:
+            raise ValueError(
+                f'connection pool for {pool.db_file} used with {db_file}'
+            )
+        self.db_file = db_file
+        self.pool = pool
+        self.table_name = cls.__name__.lower()
+        self.fields = get_annotations(cls, eval_str=True)
+        self.fields.pop('pk')
+
+        self.cls = cls
+
+        self.epoch_dates = epoch_dates
+        self._epoch = {
+            k for k, v in self.fields.items() if epoch_dates and v is datetime
+        }
+        types_py2sql = {
+            str: "TEXT",
+            int: "INT",
+            float: "FLOAT",
+            datetime: "EPOCH" if epoch_dates else "TIMESTAMP",
+        }
+
+        decls = {k: types_py2sql.get(v, 'INT') for k, v in self.fields.items()}
+        tables = {i[0] for i in self._execute(
+            "SELECT name FROM sqlite_master", operation="schema"
+        )}
+        if self.table_name not in tables:
+            names = ', '.join(f"{k} {v}" for k, v in decls.items())
+            self._execute(
+                f"CREATE TABLE {self.table_name}({names})", operation="schema"
+            )
+        else:
+            self._sync_schema(decls)
+
+        fields = ', '.join(self.fields.keys())
+        query = ', '.join("?" * len(self.fields))
+        upd = ', '.join(f"{k}=?" for k in self.fields.keys())
+        self.sql: dict[str, str] = {
+            "pragma": "PRAGMA foreign_keys = ON",
+            "insert": f"INSERT INTO {self.table_name} ({fields}) VALUES ({query})",
+            "select": f"SELECT rowid, {fields} FROM {self.table_name} ",
+            "update": f"UPDATE {self.table_name} SET {upd} ",
+            "delete": f"DELETE FROM {self.table_name} ",
+            "drop": f"DROP TABLE {self.table_name}",
+        }
+
+        def where(*keys: str) -> str:
+            if not keys:
+                return ""
+            return "WHERE " + ' AND '.join(f"{k}=?" for k in keys)
+        self.sql_where = where
+
+        self._make = self._row_factory()
+        self.row_type = namedtuple(  # type: ignore[misc]
+            f"{cls.__name__}Row", ['pk', *self.fields]
+        )
+
+        self._create_indexes(indexes, drop_undeclared)
+
+    def _sync_schema(self, decls: dict[str, str]) -> None:
+        """
+        Привести существующую таблицу в соответствие с полями класса:
+        добавить недостающие столбцы (в существующих строках - NULL).
+        Столбцы дат должны быть объявлены в формате репозитория (EPOCH
+        или TIMESTAMP): от объявленного типа зависит разбор значений,
+        а перевод дат переписывает всю таблицу, поэтому он выполняется
+        только миграцией (migrations.convert_dates).
+        """
+        with self.pool.transaction() as con:
+            declared = migrations.columns(con, self.table_name)
+            for name, decl in decls.items():
+                if self.fields[name] is datetime and name in declared \
+                        and declared[name].upper() != decl:
+                    raise ValueError(
+                        f'column {self.table_name}.{name} is declared as '
+                        f'{declared[name]}, expected {decl}: convert it with '
+                        f'migrations.convert_dates'
+                    )
+            for name, decl in decls.items():
+                migrations.add_column(con, self.table_name, name, decl)
+
+    def _adapt(self, name: str, value: Any) -> Any:
+        """ Значение поля -> значение параметра запроса """
+        if name in self._epoch and isinstance(value, datetime):
+            return (value - EPOCH) // timedelta(seconds=1)
+        return value
+
+    def _values(self, obj: Any) -> list[Any]:
+        """ Значения полей объекта в порядке столбцов таблицы """
+        if not self._epoch:
+            return [getattr(obj, x) for x in self.fields]
+        return [self._adapt(x, getattr(obj, x)) for x in self.fields]
+
+    def _create_indexes(
+        self,
+        indexes: Iterable[str | tuple[str, ...]],
+        drop_undeclared: bool = False
+    ) -> None:
+        """
+        Создать недостающие индексы и, если drop_undeclared, удалить лишние.
+        """
+        prefix = f"idx_{self.table_name}__"
+        declared: dict[str, str] = {}
+        for index in indexes:
+            names = [self._column(x) for x in
+                     ((index,) if isinstance(index, str) else index)]
+            declared[prefix + '__'.join(names)] = ', '.join(names)
+
+        existing = {i[0] for i in self._execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            [self.table_name], "schema"
+        )}
+        with self.transaction():
+            for name in existing - declared.keys():
+                if drop_undeclared and name.startswith(prefix):
+                    self._execute(f"DROP INDEX {name}", operation="schema")
+            for name, columns in declared.items():
+                if name not in existing:
+                    self._execute(
+                        f"CREATE INDEX {name} ON {self.table_name}({columns})",
+                        operation="schema"
+                    )
+
+    def _column(self, name: str) -> str:
+        """
+        Название поля объекта -> название столбца таблицы.
+        """
+        if name in ('pk', 'rowid'):
+            return 'rowid'
+        if name not in self.fields:
+            raise ValueError(f'unknown field `{name}` of {self.cls.__name__}')
+        return name
+
+    def build_where(self, where: dict[str, Any] | None) -> tuple[str, list[Any]]:
+        """
+        Условие в виде словаря -> текст WHERE и список параметров.
+        Значение None соответствует NULL в базе данных.
+        """
+        if not where:
+            return "", []
+        conditions, params = [], []
+        for name, value in where.items():
+            sql, values = as_condition(value).sql(self._column(name))
+            conditions.append(sql)
+            params += [self._adapt(name, v) for v in values]
+        return "WHERE " + ' AND '.join(conditions), params
+
+    def _order(
+        self,
+        order_by: str | Sequence[str] | None,
+        limit: int | None,
+        offset: int
+    ) -> tuple[str, list[Any]]:
+        """
+        Порядок сортировки и ограничения -> текст ORDER BY/LIMIT и параметры.
+        При равенстве полей сортировки записи упорядочены по rowid,
+        как и в MemoryRepository. Страницы без order_by тоже упорядочены
+        по rowid: иначе SQLite не гарантирует, что соседние страницы
+        не пересекаются.
+        """
+        paged = limit is not None or offset
+        order = parse_order(order_by)
+        if not order:
+            sql = " ORDER BY rowid" if paged else ""
+        else:
+            sql = " ORDER BY " + ', '.join(
+                self._column(name) + (" DESC" if desc else "")
+                for name, desc in order
+            ) + ", rowid"
+        if not paged:
+            return sql, []
+        return sql + " LIMIT ? OFFSET ?", [-1 if limit is None else limit, offset]
+
+    def _select(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0
+    ) -> tuple[str, list[Any]]:
+        sql_where, params = self.build_where(where)
+        sql_order, order_params = self._order(order_by, limit, offset)
+        return self.sql["select"] + sql_where + sql_order, params + order_params
+
+    def span(self, operation: str, command: str) -> Any:
+        """
+        Интервал измерения (INSTRUMENTATION.span) запроса command операции
+        operation. Статистика собирается по таблице и операции
+        ("expense.get_all"), а не по тексту запроса: текст зависит
+        от условий (например, от числа значений In) и записывается только
+        в журнал медленных операций.
+        """
+        return INSTRUMENTATION.span("sql", f"{self.table_name}.{operation}", command)
+
+    def _execute(
+        self,
+        command: str,
+        values: list[Any] | None = None,
+        operation: str = "execute"
+    ) -> Any:
+        """ Выполнить запрос, вернуть полученные строки """
+        return self._run(command, values, operation)[0]
+
+    def _write(
+        self,
+        command: str,
+        values: list[Any] | None,
+        operation: str
+    ) -> tuple[int | None, int]:
+        """ Выполнить изменяющую команду, вернуть lastrowid и rowcount """
+        _, lastrowid, rowcount = self._run(command, values, operation)
+        return lastrowid, rowcount
+
+    def _run(
+        self,
+        command: str,
+        values: list[Any] | None,
+        operation: str
+    ) -> tuple[list[Any], int | None, int]:
+        """
+        Выполнить команду, вернуть строки результата, lastrowid и rowcount
+        курсора. Значения курсора не сохраняются в репозитории: его методы
+        вызываются и из других потоков (view.loader.Loader), и запрос
+        из другого потока мог бы их перезаписать.
+        """
+        with self.span(operation, command) as span, self.pool.cursor() as cur:
+            if values:
+                res = cur.execute(command, list(values))
+            else:
+                res = cur.execute(command)
+            rows = res.fetchall()
+            if span is not None:
+                span.rows = len(rows) or max(cur.rowcount, 0)
+            return rows, cur.lastrowid, cur.rowcount
+
+    def _executemany(
+        self,
+        command: str,
+        values: list[list[Any]],
+        operation: str
+    ) -> int:
+        """
+        Выполнить команду для каждого набора параметров в одной транзакции,
+        вернуть число затронутых строк.
+        """
+        with self.span(operation, command) as span, self.pool.cursor() as cur:
+            cur.executemany(command, values)
+            if span is not None:
+                span.rows = cur.rowcount
+            return cur.rowcount
+
+    def add(self, obj: T) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+
+        lastrowid, _ = self._write(self.sql["insert"], self._values(obj), "add")
+        if lastrowid is None:
+            raise RuntimeError(f'trying to add object {obj} failed')
+        obj.pk = lastrowid
+        return obj.pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        objs = list(objs)
+        for obj in objs:
+            if getattr(obj, 'pk', None) != 0:
+                raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        if not objs:
+            return []
+
+        values = [self._values(obj) for obj in objs]
+        with self.span("add_many", self.sql["insert"]) as span, \
+                self.pool.cursor() as cur:
+            if span is not None:
+                span.rows = len(objs)
+            # без AUTOINCREMENT sqlite выдает новым строкам max(rowid) + 1,
+            # блокировка на запись не дает вклиниться другим соединениям
+            if not cur.connection.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            first = cur.execute(
+                f"SELECT IFNULL(MAX(rowid), 0) + 1 FROM {self.table_name}"
+            ).fetchone()[0]
+            cur.executemany(self.sql["insert"], values)
+            last = cur.execute(
+                f"SELECT MAX(rowid) FROM {self.table_name}"
+            ).fetchone()[0]
+            if last != first + len(objs) - 1:
+                raise RuntimeError(f'trying to add {len(objs)} objects failed')
+        for pk, obj in enumerate(objs, first):
+            obj.pk = pk
+        return list(range(first, last + 1))
+
+    def get_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0
+    ) -> list[T]:
+        query, params = self._select(where, order_by, limit, offset)
+        return list(map(self._make, self._execute(query, params, "get_all")))
+
+    def get_rows(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        named: bool = False
+    ) -> list[tuple[Any, ...]]:
+        """
+        То же, что get_all, но без создания объектов: строки в виде кортежей
+        (pk, поля в порядке объявления в классе), при named=True -
+        именованных кортежей row_type.
+        """
+        query, params = self._select(where, order_by, limit, offset)
+        res = self._execute(query, params, "get_rows")
+        if named:
+            return list(map(self.row_type._make, res))  # type: ignore[attr-defined]
+        return res  # type: ignore[no-any-return]
+
+    def _row_factory(self) -> Callable[[Sequence[Any]], T]:
+        """
+        Функция, создающая объект по строке таблицы (rowid, поля...).
+        Для датакласса, все поля которого передаются в __init__, объект
+        создается позиционными аргументами: порядок полей __init__ вычисляется
+        один раз. Для остальных классов - именованными аргументами.
+        """
+        cls = self.cls
+        columns = ['pk', *self.fields]
+        init = [
+            f.name for f in dataclass_fields(cls) if f.init
+        ] if is_dataclass(cls) else []
+        if sorted(init) == sorted(columns):
+            if init == columns:
+                return lambda row: cls(*row)
+            getter = itemgetter(*(columns.index(name) for name in init))
+            return lambda row: cls(*getter(row))
+
+        names = list(self.fields)
+
+        def make(row: Sequence[Any]) -> T:
+            pk, *values = row
+            obj: T = cls(**dict(zip(names, values)))
+            obj.pk = pk
+            return obj
+        return make
+
+    def iter_all(
+        self,
+        where: dict[str, Any] | None = None,
+        order_by: str | Sequence[str] | None = None,
+        batch_size: int = 1000
+    ) -> Iterator[T]:
+        # между пакетами управление у вызывающего кода, поэтому измеряется
+        # только время запроса и чтения пакетов, и операция записывается
+        # одна, после чтения курсора
+        query, params = self._select(where, order_by)
+        elapsed, count = 0.0, 0
+        try:
+            with self.pool.cursor() as cur:
+                start = time.perf_counter()
+                cur.execute(query, params)
+                while rows := cur.fetchmany(batch_size):
+                    elapsed += time.perf_counter() - start
+                    count += len(rows)
+                    yield from (self._make(row) for row in rows)
+                    start = time.perf_counter()
+                elapsed += time.perf_counter() - start
+        finally:
+            INSTRUMENTATION.record(
+                "sql", f"{self.table_name}.iter_all", elapsed * 1000, count, query
+            )
+
+    def aggregate(
+        self,
+        field: str,
+        func: str = 'sum',
+        where: dict[str, Any] | None = None,
+        group_by: Sequence[str | Period] = ()
+    ) -> dict[tuple[Any, ...], Any]:
+        if func not in AGGREGATES:
+            raise ValueError(f'unknown aggregate function `{func}`')
+        value = f"{func.upper()}({self._column(field)})"
+        if func == 'sum':
+            value = f"COALESCE({value}, 0)"
+        if func in ('min', 'max') and self.fields.get(field) is datetime:
+            value += ' AS "value [epoch]"' if field in self._epoch \
+                else ' AS "value [timestamp]"'
+        groups = [
+            group.sql(self._column(group.field), group.field in self._epoch)
+            if isinstance(group, Period)
+            else self._column(group)
+            for group in group_by
+        ]
+        sql_where, params = self.build_where(where)
+        query = f"SELECT {', '.join(groups + [value])} FROM {self.table_name} "
+        query += sql_where
+        if groups:
+            query += " GROUP BY " + ', '.join(groups)
+        rows = self._execute(query, params, "aggregate")
+        return {tuple(row[:-1]): row[-1] for row in rows}
+
+    def descendants(self, pk: int, parent: str = 'parent') -> list[T]:
+        """
+        Все потомки записи pk в таблице-дереве (записи связаны с родителем
+        полем parent), не включая саму запись. Выполняется одним
+        рекурсивным запросом, в порядке добавления записей.
+        """
+        query = (
+            f"WITH RECURSIVE subtree(id) AS ("
+            f"SELECT rowid FROM {self.table_name} WHERE {self._column(parent)} = ? "
+            f"UNION ALL SELECT t.rowid FROM {self.table_name} t "
+            f"JOIN subtree ON t.{self._column(parent)} = subtree.id) "
+            + self.sql["select"] + "WHERE rowid IN subtree ORDER BY rowid"
+        )
+        return [self._make(row) for row in self._execute(query, [pk], "descendants")]
+
+    def ancestors(self, pk: int, parent: str = 'parent') -> list[T]:
+        """
+        Все предки записи pk в таблице-дереве от родителя до корня.
+        Выполняется одним рекурсивным запросом.
+        """
+        query = (
+            f"WITH RECURSIVE chain(id, depth) AS ("
+            f"SELECT {self._column(parent)}, 1 FROM {self.table_name} "
+            f"WHERE rowid = ? "
+            f"UNION ALL SELECT t.{self._column(parent)}, chain.depth + 1 "
+            f"FROM {self.table_name} t JOIN chain ON t.rowid = chain.id) "
+            f"SELECT t.rowid, {', '.join('t.' + f for f in self.fields)} "
+            f"FROM {self.table_name} t "
+            f"JOIN chain ON t.rowid = chain.id ORDER BY chain.depth"
+        )
+        return [self._make(row) for row in self._execute(query, [pk], "ancestors")]
+
+    def get(self, pk: int) -> T | None:
+        objs = self.get_all({'rowid': pk})
+        return objs[0] if objs else None
+
+    def update(self, obj: T) -> None:
+        if getattr(obj, 'pk', None) == 0:
+            raise ValueError(f'trying to update object {obj} with zero `pk` attribute')
+        self._execute(
+            self.sql["update"] + self.sql_where("rowid"),
+            self._values(obj) + [obj.pk], "update"
+        )
+
+    def update_many(self, objs: Iterable[T]) -> None:
+        objs = list(objs)
+        for obj in objs:
+            if getattr(obj, 'pk', None) == 0:
+                raise ValueError(
+                    f'trying to update object {obj} with zero `pk` attribute'
+                )
+        self._executemany(
+            self.sql["update"] + self.sql_where("rowid"),
+            [self._values(obj) + [obj.pk] for obj in objs], "update_many"
+        )
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        if not values:
+            return 0
+        sql_where, params = self.build_where(where)
+        _, rowcount = self._write(
+            f"UPDATE {self.table_name} SET "
+            + ', '.join(f"{self._column(k)}=?" for k in values) + " " + sql_where,
+            [self._adapt(k, v) for k, v in values.items()] + params,
+            "update_where"
+        )
+        return rowcount
+
+    def delete(self, pk: int) -> None:
+        _, rowcount = self._write(
+            self.sql["delete"] + self.sql_where("rowid"), [pk], "delete"
+        )
+        if not rowcount:
+            raise KeyError(f'trying to delete unexisting with primary key {pk}')
+
+    def delete_many(self, pks: Iterable[int]) -> None:
+        pks = list(pks)
+        command = self.sql["delete"] + self.sql_where("rowid")
+        with self.span("delete_many", command) as span, self.pool.cursor() as cur:
+            cur.executemany(command, [[pk] for pk in pks])
+            if span is not None:
+                span.rows = cur.rowcount
+            if cur.rowcount != len(pks):
+                raise KeyError(f'trying to delete unexisting among primary keys {pks}')
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        sql_where, params = self.build_where(where)
+        _, rowcount = self._write(self.sql["delete"] + sql_where, params, "delete_where")
+        return rowcount
+
+    def clear(self) -> None:
+        """
+        Удалить все записи из базы данных
+        """
+
+        self._execute(self.sql["delete"], operation="clear")
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Транзакция открывается на пуле соединений и поэтому охватывает
+        все репозитории, работающие через тот же пул.
+        """
+        with self.pool.transaction():
+            yield
+
+    def close(self) -> None:
+        """
+        Закрыть соединения с базой данных. При следующем обращении
+        к репозиторию соединение будет открыто заново.
+        """
+
+        self.pool.close()
+
+    def __enter__(self) -> 'SQLiteRepository[T]':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -3,26 +3,64 @@
 """
 
 from datetime import datetime
+import logging
 import sys
 
 from PySide6.QtWidgets import QApplication
 
+from bookkeeper.instrumentation import INSTRUMENTATION
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
 from bookkeeper.presenter import Bookkeeper
+from bookkeeper.repository.cached_repository import CachedRepository
+from bookkeeper.repository.connection_pool import ConnectionPool
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.migrations import Migration, Migrator
 from bookkeeper.repository.sqlite_repository import SQLiteRepository
 from bookkeeper.view.qtview import QtView
 from bookkeeper.utils import read_tree
 
 USE_SQLITE = True
 
+# измерять время операций: медленные (дольше SLOW_MS мс) записываются
+# в журнал, статистика - по F12 в строке состояния и в profile.json
+PROFILE = False
+SLOW_MS = 50
+
+if PROFILE:
+    logging.basicConfig()
+    INSTRUMENTATION.enable(slow_ms=SLOW_MS)
+
+MIGRATIONS = [
+    Migration(1, "статистика для планировщика запросов",
+              lambda con, progress: con.execute("ANALYZE")),
+    # приложение не использует таблицу замыкания категорий, а прежние
+    # версии создавали ее пустой
+    Migration(2, "удаление таблицы замыкания категорий",
+              lambda con, progress: con.execute(
+                  "DROP TABLE IF EXISTS categoryclosure"
+              )),
+]
+
 if USE_SQLITE:
-    cat_repo = SQLiteRepository[Category]("database.db", Category)
-    exp_repo = SQLiteRepository[Expense]("database.db", Expense)
+    pool = ConnectionPool("database.db", journal_mode="WAL", synchronous="NORMAL")
+    cat_repo = CachedRepository(SQLiteRepository[Category](
+        "database.db", Category, pool, indexes=["name", "parent"]
+    ))
+    exp_repo = SQLiteRepository[Expense](
+        "database.db", Expense, pool,
+        indexes=[("expense_date", "category", "amount"), "category"]
+    )
+    Migrator(pool, MIGRATIONS).migrate(
+        lambda stage, done, total: print(f'{stage}: {done}/{total}')
+    )
 else:
-    cat_repo = MemoryRepository[Category]()  # type: ignore[assignment]
-    exp_repo = MemoryRepository[Expense]()  # type: ignore[assignment]
+    cat_repo = MemoryRepository[Category](  # type: ignore[assignment]
+        indexes=["name", "parent"]
+    )
+    exp_repo = MemoryRepository[Expense](  # type: ignore[assignment]
+        indexes=["category"], sorted_indexes=["expense_date"]
+    )
 
     cats = '''
     Продукты
@@ -81,11 +119,14 @@ else:
         exp_repo.add(exp)
 
 app = QApplication(sys.argv)
-view = QtView()
+view = QtView(background=USE_SQLITE)
 bk = Bookkeeper(view, exp_repo, cat_repo)
 view.window.show()
 
-sys.exit(app.exec())
+code = app.exec()
+if PROFILE:
+    INSTRUMENTATION.dump("profile.json")
+sys.exit(code)
 
 
 CODE = """
@@ -6,6 +6,7 @@ from abc import abstractmethod
 from typing import Any, Protocol, Callable
 
 from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
 
 
 class AbstractView(Protocol):
@@ -27,12 +28,17 @@ class AbstractView(Protocol):
 
         return [self.cat_read(0)]
 
+    def exp_read(self, pk: int) -> Expense | None:
+        """
+        Костыль для mypy.
+        """
+
+        return Expense(amount=0.0, category=0, pk=pk)
+
     # cat_update: Callable[[Category], None] = lambda self, x: None
     # cat_delete: Callable[[int], None]      = lambda self, x: None
 
     # exp_create: Callable[[Expense], None] = lambda self, x: None
-    # exp_read:   Callable[[int], Expense]  =
-    #    lambda self, x: Expense(pk=x, amount=0.0, category=0)
     # exp_reads:  Callable[[dict[str, Any]], list[Expense]] = lambda self, x: []
     # exp_update: Callable[[Expense], None] = lambda self, x: None
     # exp_delete: Callable[[int], None]     = lambda self, x: None
@@ -66,6 +72,42 @@ class AbstractView(Protocol):
         Перерисовать с учетом изменений в репозиториях.
         """
 
+    def expense_added(self, pk: int) -> None:
+        """
+        Добавлена запись расхода pk. По умолчанию - перерисовать все.
+        """
+
+        self.update()
+
+    def expense_updated(self, pk: int, field: str) -> None:
+        """
+        Изменено поле field записи расхода pk. По умолчанию - перерисовать все.
+        """
+
+        self.update()
+
+    def expense_deleted(self, pk: int) -> None:
+        """
+        Удалена запись расхода pk. По умолчанию - перерисовать все.
+        """
+
+        self.update()
+
+    def category_added(self, pk: int) -> None:
+        """
+        Добавлена категория pk. По умолчанию - перерисовать все.
+        """
+
+        self.update()
+
+    def category_deleted(self, pk: int) -> None:
+        """
+        Удалена категория pk (ее расходы и подкатегории перенесены
+        к родителю). По умолчанию - перерисовать все.
+        """
+
+        self.update()
+
     @abstractmethod
     def status(self, text: str) -> None:
         """
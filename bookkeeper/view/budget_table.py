@@ -2,13 +2,11 @@
 Отображение бюджета.
 """
 
-from datetime import datetime, timedelta
 from typing import Any, Callable
 
 from PySide6 import QtWidgets
 from PySide6.QtCore import Qt
 
-from bookkeeper.models.expense import Expense
 from bookkeeper.view import utils
 
 
@@ -19,12 +17,12 @@ class BudgetWidget(QtWidgets.QWidget):
 
     def __init__(
         self,
-        get_exps: Callable[[], list[Expense]],
+        get_total: Callable[[int], float],
         *args: Any, **kwargs: Any
     ):
         super().__init__(*args, **kwargs)
 
-        self.get_exps = get_exps
+        self.get_total = get_total
 
         self.table = QtWidgets.QTableWidget(3, 3)
         self.table.setHorizontalHeaderLabels("|Сумма|Бюджет".split('|'))
@@ -82,13 +80,8 @@ class BudgetWidget(QtWidgets.QWidget):
     def update(self, *args: Any, **kwargs: Any) -> None:
         super().update(*args, **kwargs)
 
-        today = datetime.today()
         for i, days in enumerate([1, 7, 31]):
-            amount = sum(
-                exp.amount
-                for exp in self.get_exps()
-                if today - exp.expense_date < timedelta(**{"days": days})
-            )
+            amount = self.get_total(days)
             item = QtWidgets.QTableWidgetItem(f"{amount:.2f}")
             item.setFlags(
                 Qt.ItemIsSelectable  # type: ignore[attr-defined]
@@ -11,9 +11,228 @@ from PySide6.QtWidgets import QAbstractItemView
 
 from bookkeeper.models.expense import Expense
 from bookkeeper.view import utils
+from bookkeeper.view.loader import Loader
 
 
-class ExpensesTable(QtWidgets.QTableWidget):
+# pylint: disable-next=too-many-instance-attributes
+class ExpensesModel(QtCore.QAbstractTableModel):
+    """
+    Модель таблицы расходов, загружающая записи из репозитория страницами
+    по мере прокрутки (canFetchMore/fetchMore). Текст ячейки формируется
+    только при ее отображении.
+
+    Страницы запрашиваются через loader (по умолчанию - в потоке
+    интерфейса). При фоновой загрузке следующая страница не запрашивается,
+    пока не получена предыдущая, а reset отменяет ожидаемую страницу.
+    Страница запрашивается по числу загруженных записей (offset), поэтому
+    после удаления записи ожидаемая страница запрашивается заново.
+    """
+
+    headers = "Дата|Сумма|Категория|Комментарий".split('|')
+    fields = ["expense_date", "amount", "category", "comment"]
+
+    def __init__(
+        self,
+        get_exps: Callable[..., list[Expense]],
+        expense2text: Callable[[Expense, int], str],
+        set_text: Callable[[int, int, str], None],
+        page_size: int = 100,
+        loader: Loader | None = None
+    ):
+        super().__init__()
+        self.get_exps = get_exps
+        self.expense2text = expense2text
+        self.set_text = set_text
+        self.page_size = page_size
+        self.loader = loader or Loader(False, self)
+
+        self.rows: list[Expense] = []
+        self.exhausted = False
+        self.loading = False
+
+    def rowCount(self, parent: Any = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: Any = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Any,
+        role: Any = Qt.DisplayRole  # type: ignore[attr-defined]
+    ) -> Any:
+        if (role == Qt.DisplayRole  # type: ignore[attr-defined]
+                and orientation == Qt.Horizontal):  # type: ignore[attr-defined]
+            return self.headers[section]
+        return None
+
+    def data(
+        self,
+        index: Any,
+        role: Any = Qt.DisplayRole  # type: ignore[attr-defined]
+    ) -> Any:
+        if not index.isValid() or role not in (
+            Qt.DisplayRole,  # type: ignore[attr-defined]
+            Qt.EditRole  # type: ignore[attr-defined]
+        ):
+            return None
+        return self.expense2text(self.rows[index.row()], index.column())
+
+    def setData(
+        self,
+        index: Any,
+        value: Any,
+        role: Any = Qt.EditRole  # type: ignore[attr-defined]
+    ) -> bool:
+        if not index.isValid() or role != Qt.EditRole:  # type: ignore[attr-defined]
+            return False
+        self.set_text(index.row(), index.column(), str(value))
+        return True
+
+    def flags(self, index: Any) -> Any:
+        flags = (
+            Qt.ItemIsSelectable  # type: ignore[attr-defined]
+            | Qt.ItemIsEnabled  # type: ignore[attr-defined]
+        )
+        if index.column() != 0:
+            flags |= Qt.ItemIsEditable  # type: ignore[attr-defined]
+        return flags
+
+    def canFetchMore(self, parent: Any = QtCore.QModelIndex()) -> bool:
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent: Any = QtCore.QModelIndex()) -> None:
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        self._request_page()
+
+    def _request_page(self) -> None:
+        """
+        Запросить страницу, следующую за загруженными записями
+        (предыдущий запрос страницы отменяется).
+        """
+
+        offset = len(self.rows)
+        self.loader.request(
+            "expenses",
+            lambda: self.get_exps(
+                order_by="-expense_date", limit=self.page_size, offset=offset
+            ),
+            self.page_loaded
+        )
+
+    def page_loaded(self, page: list[Expense]) -> None:
+        """
+        Добавить в конец таблицы полученную страницу записей.
+        """
+
+        self.loading = False
+        self.exhausted = len(page) < self.page_size
+        # записи, добавленные в таблицу, пока страница загружалась
+        loaded = {exp.pk for exp in self.rows}
+        page = [exp for exp in page if exp.pk not in loaded]
+        if not page:
+            return
+        self.beginInsertRows(
+            QtCore.QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1
+        )
+        self.rows += page
+        self.endInsertRows()
+
+    def reset(self) -> None:
+        """
+        Сбросить загруженные записи и загрузить первую страницу заново.
+        """
+
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def expense(self, row: int) -> Expense:
+        """
+        Запись расхода, отображаемая в строке row.
+        """
+
+        return self.rows[row]
+
+    def row_of(self, pk: int) -> int | None:
+        """
+        Номер строки, в которой отображается запись расхода pk
+        (None, если запись еще не загружена).
+        """
+
+        return next(
+            (row for row, exp in enumerate(self.rows) if exp.pk == pk), None
+        )
+
+    def _position(self, exp: Expense) -> int | None:
+        """
+        Строка, в которую нужно вставить запись, чтобы сохранить порядок
+        загрузки (по убыванию даты); None, если запись попадает в еще
+        не загруженные страницы.
+        """
+
+        row = next(
+            (row for row, other in enumerate(self.rows)
+             if other.expense_date < exp.expense_date),
+            len(self.rows)
+        )
+        if row == len(self.rows) and not self.exhausted:
+            return None
+        return row
+
+    def insert_expense(self, exp: Expense) -> None:
+        """
+        Вставить добавленную запись расхода на ее место в таблице.
+        """
+
+        row = self._position(exp)
+        if row is None:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.rows.insert(row, exp)
+        self.endInsertRows()
+
+    def remove_expense(self, pk: int) -> None:
+        """
+        Убрать удаленную запись расхода из таблицы.
+        """
+
+        row = self.row_of(pk)
+        if row is not None:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self.rows[row]
+            self.endRemoveRows()
+        if self.loading:
+            # ожидаемая страница запрошена до удаления: ее смещение указывает
+            # на одну запись дальше, и запись пропустилась бы
+            self._request_page()
+
+    def update_expense(self, exp: Expense, field: str) -> None:
+        """
+        Обновить ячейку поля field записи расхода. Если изменилась дата,
+        запись перемещается на новое место.
+        """
+
+        row = self.row_of(exp.pk)
+        if row is None:
+            self.insert_expense(exp)
+            return
+        if field == "expense_date":
+            self.remove_expense(exp.pk)
+            self.insert_expense(exp)
+            return
+        self.rows[row] = exp
+        index = self.index(row, self.fields.index(field))
+        self.dataChanged.emit(index, index)
+
+
+class ExpensesTable(QtWidgets.QTableView):
     """
     Таблица с возможностью выбора одной ячейки.
     """
@@ -23,7 +242,7 @@ class ExpensesTable(QtWidgets.QTableWidget):
         del_row: Callable[[int], None],
         *args: Any, **kwargs: Any
     ):
-        super().__init__(3, 4, *args, **kwargs)
+        super().__init__(*args, **kwargs)
         self.del_row = del_row
         self.menu = QtWidgets.QMenu()
 
@@ -54,9 +273,11 @@ class ExpensesWidget(QtWidgets.QWidget):
         self,
         pk2cat: Callable[[int], str],
         cat2pk: Callable[[str], int],
-        get_exps: Callable[[], list[Expense]],
+        get_exps: Callable[..., list[Expense]],
         get_cats: Callable[[], list[str]],
-        *args: Any, **kwargs: Any
+        *args: Any,
+        loader: Loader | None = None,
+        **kwargs: Any
     ):
         super().__init__(*args, **kwargs)
 
@@ -69,17 +290,37 @@ class ExpensesWidget(QtWidgets.QWidget):
         self.datetime_edit.setEnabled(False)
         self.datetime_edit.connected = False
 
+        self.text2expenseattr: dict[str, Callable[[str], Any]] = {
+            "expense_date": utils.str2datetime,
+            "amount": float,
+            "category": cat2pk,
+            "comment": str,
+        }
+        self.col2attr = list(self.text2expenseattr.keys())
+
+        self.col2text: list[Callable[[Expense], str]] = [
+            lambda exp: utils.datetime2str(exp.expense_date),
+            lambda exp: f"{exp.amount:.2f}",
+            lambda exp: pk2cat(exp.category),
+            lambda exp: exp.comment,
+        ]
+
+        self.model = ExpensesModel(
+            get_exps,
+            lambda exp, col: self.col2text[col](exp),
+            self.cell_changed,
+            loader=loader
+        )
+
         self.table = ExpensesTable(lambda row: self.delete_expense.emit(
-            self.displayed[row].pk
+            self.model.expense(row).pk
         ))
-        self.table.setHorizontalHeaderLabels(
-            "Дата|Сумма|Категория|Комментарий".split('|')
-        )
+        self.table.setModel(self.model)
         self.table.setEditTriggers(
             QAbstractItemView.DoubleClicked  # type: ignore[attr-defined]
         )
-        self.table.cellDoubleClicked.connect(  # type: ignore[attr-defined]
-            self.double_click
+        self.table.doubleClicked.connect(  # type: ignore[attr-defined]
+            lambda index: self.double_click(index.row(), index.column())
         )
         self.table.verticalHeader().hide()
 
@@ -131,23 +372,6 @@ class ExpensesWidget(QtWidgets.QWidget):
             self.table
         ))
 
-        self.text2expenseattr: dict[str, Callable[[str], Any]] = {
-            "expense_date": utils.str2datetime,
-            "amount": float,
-            "category": cat2pk,
-            "comment": str,
-        }
-        self.col2attr = list(self.text2expenseattr.keys())
-
-        self.expense2texts: Callable[[Expense], tuple[str, str, str, str]] = lambda exp: (
-            utils.datetime2str(exp.expense_date),
-            f"{exp.amount:.2f}",
-            pk2cat(exp.category),
-            exp.comment,
-        )
-
-        self.displayed: list[Expense] = []
-
     def double_click(self, row: int, col: int) -> None:
         """
         Обработать двойноу нажатие по таблице.
@@ -158,60 +382,67 @@ class ExpensesWidget(QtWidgets.QWidget):
                 self.datetime_edit.connected = False
                 self.datetime_edit.dateTimeChanged.disconnect()
 
+            exp = self.model.expense(row)
             self.datetime_edit.setDateTime(
-                utils.str2qdatetime(self.table.item(row, col).text())
+                utils.datetime2qdatetime(exp.expense_date)
             )
             self.datetime_edit.setEnabled(True)
             self.datetime_edit.setFocus()
             self.datetime_edit.connected = True
             self.datetime_edit.dateTimeChanged.connect(
                 lambda time: self.update_expense.emit(
-                    self.displayed[row],
+                    exp,
                     "expense_date",
                     utils.qdatetime2datetime(time)
                 )
             )
-        else:
-            self.table.cellChanged.connect(  # type: ignore[attr-defined]
-                self.cell_changed
-            )
 
-    def cell_changed(self, row: int, col: int) -> None:
+    def cell_changed(self, row: int, col: int, text: str) -> None:
         """
         Обновить сумму/категорию/заметку записи расхода, выбранной в таблице.
         """
 
-        self.table.cellChanged.disconnect(self.cell_changed)  # type: ignore[attr-defined]
         attr = self.col2attr[col]
         self.update_expense.emit(
-            self.displayed[row],
+            self.model.expense(row),
             attr,
-            self.text2expenseattr[attr](self.table.item(row, col).text())
-        )
-
-    def update(self, *args: Any, **kwargs: Any) -> None:
-        super().update(*args, **kwargs)
-
-        entries = sorted(
-            self.get_exps(),
-            key=lambda exp: exp.expense_date,
-            reverse=True
+            self.text2expenseattr[attr](text)
         )
 
-        self.table.setRowCount(len(entries))
-        self.displayed = []
-        for row, exp in enumerate(entries):
-            self.displayed.append(exp)
-            for col, text in enumerate(self.expense2texts(exp)):
-                item = QtWidgets.QTableWidgetItem(text)
-                if col == 0:
-                    item.setFlags(
-                        Qt.ItemIsSelectable  # type: ignore[attr-defined]
-                        | Qt.ItemIsEnabled  # type: ignore[attr-defined]
-                    )
-                self.table.setItem(row, col, item)
+    def release_datetime_edit(self) -> None:
+        """
+        Отключить поле редактирования даты от записи расхода.
+        """
 
         self.datetime_edit.setEnabled(False)
         if self.datetime_edit.connected:
             self.datetime_edit.connected = False
             self.datetime_edit.dateTimeChanged.disconnect()
+
+    def expense_added(self, exp: Expense) -> None:
+        """
+        Добавить в таблицу строку новой записи расхода.
+        """
+
+        self.model.insert_expense(exp)
+
+    def expense_updated(self, exp: Expense, field: str) -> None:
+        """
+        Обновить в таблице ячейку измененной записи расхода.
+        """
+
+        self.model.update_expense(exp, field)
+
+    def expense_deleted(self, pk: int) -> None:
+        """
+        Убрать из таблицы строку удаленной записи расхода.
+        """
+
+        self.release_datetime_edit()
+        self.model.remove_expense(pk)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+
+        self.model.reset()
+        self.release_datetime_edit()
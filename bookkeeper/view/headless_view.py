@@ -0,0 +1,105 @@
+"""
+AbstractView без графического интерфейса.
+"""
+
+from typing import Any, Callable
+
+from bookkeeper.instrumentation import timed
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.view.abstract_view import AbstractView
+
+
+# pylint: disable-next=too-many-instance-attributes
+class HeadlessView(AbstractView):
+    """
+    AbstractView без графического интерфейса (не требует PySide6 и дисплея)
+    для тестирования и нагрузочного профилирования Presenter.
+
+    Представление запоминает обращения Presenter (updates, statuses, events)
+    и дает доступ к зарегистрированным обработчикам (handlers). Как и QtView,
+    при перерисовке оно запрашивает у Presenter данные, которые отображал бы
+    интерфейс: первую страницу расходов, категории и бюджет; при изменении
+    записи расхода - эту запись и бюджет.
+
+    page_size - размер страницы расходов (None - не запрашивать данные)
+    """
+
+    budget_days = (1, 7, 31)
+
+    def __init__(self, page_size: int | None = 100):
+        self.page_size = page_size
+        self.handlers: dict[str, Callable[..., Any]] = {}
+
+        self.updates = 0
+        self.statuses: list[str] = []
+        self.events: list[tuple[str, int]] = []
+
+        self.expenses: list[Expense] = []
+        self.categories: list[Category] = []
+        self.budget: list[float] = []
+
+    def register_handlers(
+        self,
+        name: str,
+        **functions: Callable[..., Any]
+    ) -> None:
+        super().register_handlers(name, **functions)
+        self.handlers.update(
+            {name + "_" + key: value for key, value in functions.items()}
+        )
+
+    def handler(self, func: str) -> Callable[..., Any]:
+        """
+        Зарегистрированный обработчик по имени (например, "exp_create").
+        """
+
+        return self.handlers[func]
+
+    def _load_budget(self) -> None:
+        self.budget = [self.call_crud("exp_total", days) for days in self.budget_days]
+
+    @timed("view")
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self.updates += 1
+        if self.page_size is None or "exp_reads" not in self.handlers:
+            return
+        self.expenses = self.call_crud(
+            "exp_reads", order_by="-expense_date", limit=self.page_size
+        )
+        self.categories = self.call_crud("cat_all")
+        self._load_budget()
+
+    def _expense_changed(self, event: str, pk: int) -> None:
+        self.events.append((event, pk))
+        if self.page_size is None:
+            return
+        if event != "expense_deleted":
+            self.exp_read(pk)
+        self._load_budget()
+
+    @timed("view")
+    def expense_added(self, pk: int) -> None:
+        self._expense_changed("expense_added", pk)
+
+    @timed("view")
+    def expense_updated(self, pk: int, field: str) -> None:
+        self._expense_changed("expense_updated", pk)
+
+    @timed("view")
+    def expense_deleted(self, pk: int) -> None:
+        self._expense_changed("expense_deleted", pk)
+
+    @timed("view")
+    def category_added(self, pk: int) -> None:
+        self.events.append(("category_added", pk))
+        if self.page_size is not None:
+            self.categories = self.call_crud("cat_all")
+
+    @timed("view")
+    def category_deleted(self, pk: int) -> None:
+        self.events.append(("category_deleted", pk))
+        self.update()
+
+    def status(self, text: str) -> None:
+        self.statuses.append(text)
@@ -0,0 +1,145 @@
+"""
+Загрузка данных из репозиториев в фоновом потоке.
+"""
+
+from typing import Any, Callable
+
+from PySide6 import QtCore
+
+
+class _Task(QtCore.QRunnable):
+    """
+    Запрос к репозиторию, выполняемый в потоке пула.
+    """
+
+    def __init__(self, run: Callable[[], None]):
+        super().__init__()
+        self.setAutoDelete(False)
+        self._run = run
+
+    def run(self) -> None:
+        self._run()
+
+
+class Loader(QtCore.QObject):
+    """
+    Выполняет запросы к репозиториям в фоновом потоке и передает результаты
+    виджетам в потоке интерфейса, чтобы медленный запрос не блокировал
+    цикл обработки событий.
+
+    Запросы различаются ключом (например, "expenses"). Новый запрос с тем же
+    ключом отменяет предыдущий: если тот еще не начал выполняться, он
+    снимается с очереди, иначе его результат отбрасывается.
+
+    background - выполнять запросы в фоновом потоке. Если False, запрос
+        выполняется сразу при вызове request (для репозиториев, которые
+        нельзя использовать из нескольких потоков, например, MemoryRepository).
+    """
+
+    finished: QtCore.Signal = QtCore.Signal(str, int, object, object)
+    # запрос завершился ошибкой: ключ, исключение
+    failed: QtCore.Signal = QtCore.Signal(str, object)
+
+    def __init__(
+        self,
+        background: bool = True,
+        parent: QtCore.QObject | None = None
+    ):
+        super().__init__(parent)
+        self.background = background
+
+        # один поток: запросы выполняются по очереди на одном соединении
+        # с базой данных, поток не завершается между запросами
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.pool.setExpiryTimeout(-1)
+
+        self._generation: dict[str, int] = {}
+        # запущенные задачи хранятся до получения результата: объект
+        # QRunnable не должен быть удален, пока он выполняется
+        self._tasks: dict[tuple[str, int], _Task] = {}
+        self._callbacks: dict[str, Callable[[Any], None]] = {}
+
+        self.finished.connect(self._deliver)
+
+    def request(
+        self,
+        key: str,
+        func: Callable[[], Any],
+        callback: Callable[[Any], None]
+    ) -> int:
+        """
+        Выполнить func и передать результат в callback (в потоке интерфейса).
+
+        Parameters
+        ----------
+        key - ключ запроса
+        func - функция, выполняющая запрос к репозиторию
+        callback - функция, получающая результат запроса
+
+        Returns
+        -------
+        Номер запроса с этим ключом
+        """
+
+        generation = self.cancel(key)
+        if not self.background:
+            callback(func())
+            return generation
+
+        def run() -> None:
+            if self._generation.get(key) != generation:
+                self.finished.emit(key, generation, None, None)
+                return
+            try:
+                self.finished.emit(key, generation, func(), None)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self.finished.emit(key, generation, None, error)
+
+        self._callbacks[key] = callback
+        task = self._tasks[key, generation] = _Task(run)
+        self.pool.start(task)
+        return generation
+
+    def cancel(self, key: str) -> int:
+        """
+        Отменить запрос с ключом key. Возвращает номер следующего запроса.
+        """
+
+        previous = self._generation.get(key, 0)
+        task = self._tasks.get((key, previous))
+        if task is not None and self.pool.tryTake(task):
+            del self._tasks[key, previous]
+        self._callbacks.pop(key, None)
+        self._generation[key] = previous + 1
+        return previous + 1
+
+    def pending(self, key: str) -> bool:
+        """
+        Ожидается ли результат запроса с ключом key.
+        """
+
+        return key in self._callbacks
+
+    def wait(self, msecs: int = -1) -> bool:
+        """
+        Дождаться выполнения запросов в фоновом потоке.
+        """
+
+        return bool(self.pool.waitForDone(msecs))
+
+    def _deliver(
+        self,
+        key: str,
+        generation: int,
+        result: Any,
+        error: Exception | None
+    ) -> None:
+        self._tasks.pop((key, generation), None)
+        if self._generation.get(key) != generation:
+            return
+        callback = self._callbacks.pop(key)
+        if error is not None:
+            self.failed.emit(key, error)
+        else:
+            callback(result)
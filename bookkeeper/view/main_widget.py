@@ -11,6 +11,7 @@ from bookkeeper.models.expense import Expense
 from bookkeeper.view import utils
 from bookkeeper.view.budget_table import BudgetWidget
 from bookkeeper.view.expenses_table import ExpensesWidget
+from bookkeeper.view.loader import Loader
 
 
 class ExpenseInput(QtWidgets.QWidget):
@@ -83,25 +84,29 @@ class MainWidget(QtWidgets.QWidget):
 
     button_edit_categories: QtCore.Signal = QtCore.Signal()
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         pk2cat: Callable[[int], str],
         cat2pk: Callable[[str], int],
-        get_exps: Callable[[], list[Expense]],
+        get_exps: Callable[..., list[Expense]],
         get_cats: Callable[[], list[Category]],
-        *args: Any, **kwargs: Any
+        get_total: Callable[[int], float],
+        *args: Any,
+        loader: Loader | None = None,
+        **kwargs: Any
     ):
         super().__init__(*args, **kwargs)
 
         self.expenses = ExpensesWidget(
             pk2cat, cat2pk,
             get_exps=get_exps,
-            get_cats=lambda: [cat.name for cat in get_cats()]
+            get_cats=lambda: [cat.name for cat in get_cats()],
+            loader=loader
         )
         self.expenses.delete_expense.connect(self.delete_expense.emit)
         self.expenses.update_expense.connect(self.update_expense.emit)
 
-        self.budget = BudgetWidget(get_exps)
+        self.budget = BudgetWidget(get_total)
 
         self.input = ExpenseInput(get_cats)
         self.input.add_expense.connect(self.add_expense.emit)
@@ -123,3 +128,30 @@ class MainWidget(QtWidgets.QWidget):
         super().update(*args, **kwargs)
         for widget in (self.expenses, self.budget, self.input):
             widget.update()
+
+    def expense_added(self, exp: Expense) -> None:
+        """
+        Добавлена запись расхода: новая строка таблицы + бюджет.
+        """
+
+        self.expenses.expense_added(exp)
+        self.budget.update()
+        self.input.amount.setText("")
+
+    def expense_updated(self, exp: Expense, field: str) -> None:
+        """
+        Изменено поле field записи расхода: ячейка таблицы
+        (+ бюджет, если изменилась сумма или дата).
+        """
+
+        self.expenses.expense_updated(exp, field)
+        if field in ("amount", "expense_date"):
+            self.budget.update()
+
+    def expense_deleted(self, pk: int) -> None:
+        """
+        Удалена запись расхода: строка таблицы + бюджет.
+        """
+
+        self.expenses.expense_deleted(pk)
+        self.budget.update()
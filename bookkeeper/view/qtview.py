@@ -4,38 +4,46 @@ AbstractView, реализованный с помощью PySide6.
 
 from typing import Any, Callable
 
-from PySide6 import QtWidgets
+from PySide6 import QtGui, QtWidgets
 
+from bookkeeper.instrumentation import INSTRUMENTATION, timed
 from bookkeeper.view.abstract_view import AbstractView
+from bookkeeper.view.loader import Loader
 from bookkeeper.view.main_widget import MainWidget
 from bookkeeper.view.secondary_widget import SecondaryWidget
 from bookkeeper.view.utils import stack
 
 
+# pylint: disable-next=too-many-instance-attributes
 class QtView(AbstractView):
     """
     AbstractView, реализованный с помощью PySide6.
+
+    background - загружать записи расходов в фоновом потоке (только для
+        репозиториев, которые можно использовать из нескольких потоков,
+        например, SQLiteRepository)
     """
 
-    def __init__(self, *args: Any, **kwargs: Any):
+    def __init__(self, *args: Any, background: bool = False, **kwargs: Any):
         super().__init__(*args, **kwargs)
 
         self._status = QtWidgets.QStatusBar()
 
+        self.loader = Loader(background)
+        self.loader.failed.connect(
+            lambda key, error: self.status(f"Ошибка загрузки: {error}")
+        )
+
         def handler(func: str) -> Callable[..., Any]:
             return lambda *args, **kwargs: self.call_crud(func, *args, **kwargs)
 
-        def pk2cat(pk: int) -> str:
-            return self.cat_read(pk).name
-
-        def cat2pk(name: str) -> int:
-            return self.cat_reads({"name": name})[0].pk
-
         self.main = MainWidget(
-            pk2cat,
-            cat2pk,
+            handler("cat_pk2name"),
+            handler("cat_name2pk"),
             handler("exp_reads"),
-            handler("cat_reads")
+            handler("cat_all"),
+            handler("exp_total"),
+            loader=self.loader
         )
         self.main.add_expense.connect(handler("exp_create"))
         self.main.update_expense.connect(handler("exp_update"))
@@ -43,7 +51,7 @@ class QtView(AbstractView):
         self.main.button_edit_categories.connect(self.switch)
 
         self.second = SecondaryWidget(
-            lambda: [cat.name for cat in handler("cat_reads")()]
+            lambda: [cat.name for cat in handler("cat_all")()]
         )
         self.second.add_category.connect(handler("cat_create"))
         self.second.delete_category.connect(handler("cat_delete"))
@@ -63,15 +71,54 @@ class QtView(AbstractView):
         self.window.setStatusBar(self._status)
         self.window.setCentralWidget(self.stack)
 
+        self.stats_shortcut = QtGui.QShortcut(QtGui.QKeySequence("F12"), self.window)
+        self.stats_shortcut.activated.connect(self.show_stats)
+
+    @timed("view")
     def update(self, text: str = "...") -> None:
         self.window.update()
         self.main.update()
         self.second.update()
         self.status(text)
 
+    @timed("view")
+    def expense_added(self, pk: int) -> None:
+        exp = self.exp_read(pk)
+        if exp is not None:
+            self.main.expense_added(exp)
+
+    @timed("view")
+    def expense_updated(self, pk: int, field: str) -> None:
+        exp = self.exp_read(pk)
+        if exp is not None:
+            self.main.expense_updated(exp, field)
+
+    @timed("view")
+    def expense_deleted(self, pk: int) -> None:
+        self.main.expense_deleted(pk)
+
+    @timed("view")
+    def category_added(self, pk: int) -> None:
+        self.main.input.update()
+        self.second.update()
+
+    @timed("view")
+    def category_deleted(self, pk: int) -> None:
+        # расходы удаленной категории переносятся к родителю или удаляются
+        # все разом, поэтому таблица расходов перезагружается целиком
+        self.main.update()
+        self.second.update()
+
     def status(self, text: str) -> None:
         self._status.showMessage(text)
 
+    def show_stats(self) -> None:
+        """
+        Показать в строке состояния статистику операций (F12).
+        """
+
+        self.status(INSTRUMENTATION.status_line())
+
     def switch(self) -> None:
         """
         Переключиться между главными виджетами (расходы <-> категории).
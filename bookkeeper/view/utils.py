@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import Any, TypeVar, Union
 
 from PySide6 import QtWidgets
-from PySide6.QtCore import QDateTime, QRegularExpression
+from PySide6.QtCore import QDate, QDateTime, QRegularExpression, QTime
 from PySide6.QtGui import QRegularExpressionValidator
 
 
@@ -111,7 +111,7 @@ def str2datetime(time: str) -> datetime:
     строка -> формат datetime
     """
 
-    return datetime.strptime(time, datetime_formats["datetime"])
+    return datetime.fromisoformat(time)
 
 
 def str2qdatetime(time: str) -> QDateTime:
@@ -127,15 +127,18 @@ def datetime2str(time: datetime) -> str:
     формат datetime -> строка
     """
 
-    return time.strftime(datetime_formats["datetime"])
+    return time.isoformat(" ", "seconds")
 
 
 def datetime2qdatetime(time: datetime) -> QDateTime:
     """
-    формат datetime -> формат QDateTime
+    формат datetime -> формат QDateTime (по компонентам, без строки)
     """
 
-    return str2qdatetime(datetime2str(time))
+    return QDateTime(
+        QDate(time.year, time.month, time.day),
+        QTime(time.hour, time.minute, time.second)
+    )
 
 
 def qdatetime2str(time: QDateTime) -> str:
@@ -148,7 +151,11 @@ def qdatetime2str(time: QDateTime) -> str:
 
 def qdatetime2datetime(time: QDateTime) -> datetime:
     """
-    формат QDateTime -> формат datetime
+    формат QDateTime -> формат datetime (по компонентам, без строки)
     """
 
-    return str2datetime(qdatetime2str(time))
+    date, clock = time.date(), time.time()
+    return datetime(
+        date.year(), date.month(), date.day(),
+        clock.hour(), clock.minute(), clock.second()
+    )
@@ -0,0 +1,119 @@
+"""
+Тесты для столбцовой аналитики (пропускаются, если numpy не установлен)
+"""
+from datetime import date, datetime, timedelta
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from bookkeeper.analytics import ExpenseColumns  # noqa: E402
+from bookkeeper.instrumentation import INSTRUMENTATION  # noqa: E402
+from bookkeeper.models.budget import ExpenseTotals  # noqa: E402
+from bookkeeper.models.expense import Expense  # noqa: E402
+from bookkeeper.repository.memory_repository import MemoryRepository  # noqa: E402
+from bookkeeper.repository.query import Between, Period  # noqa: E402
+from bookkeeper.repository.sqlite_repository import SQLiteRepository  # noqa: E402
+
+TODAY = date(2023, 3, 12)
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository()
+    for i in range(60):
+        repo.add(Expense(
+            float(i % 7 + 1), i % 4 + 1,
+            expense_date=datetime(2023, 1, 10, 12) + timedelta(days=i)
+        ))
+    return repo
+
+
+@pytest.fixture
+def cols(repo):
+    return ExpenseColumns.from_expenses(repo.get_all())
+
+
+def test_from_sqlite(repo, cols):
+    path = "test_analytics.db"
+    if os.path.exists(path):
+        os.unlink(path)
+    sqlite = SQLiteRepository(path, Expense)
+    sqlite.add_many(Expense(e.amount, e.category, e.expense_date) for e in repo.get_all())
+    loaded = ExpenseColumns.from_sqlite(sqlite)
+    assert np.array_equal(loaded.amount, cols.amount)
+    assert np.array_equal(loaded.category, cols.category)
+    assert np.array_equal(loaded.date, cols.date)
+    start, end = datetime(2023, 2, 1), datetime(2023, 2, 10)
+    INSTRUMENTATION.enable()
+    try:
+        part = ExpenseColumns.from_sqlite(sqlite, {'expense_date': Between(start, end)})
+        (stats,) = INSTRUMENTATION.stats()
+    finally:
+        INSTRUMENTATION.disable()
+        INSTRUMENTATION.reset()
+    assert len(part) == len(cols.between(start, end)) == 9
+    assert (stats.category, stats.name, stats.rows) == ("sql", "expense.columns", 9)
+    os.unlink(path)
+
+
+def test_groupings_match_aggregate(repo, cols):
+    expected = repo.aggregate('amount', group_by=['category'])
+    assert cols.by_category() == pytest.approx(
+        {cat: total for (cat,), total in expected.items()}
+    )
+    for unit in ('day', 'week', 'month'):
+        expected = repo.aggregate('amount', group_by=[Period('expense_date', unit)])
+        assert cols.by_period(unit) == pytest.approx(
+            {key: total for (key,), total in expected.items()}
+        )
+
+
+def test_between_dates(cols):
+    start, end = date(2023, 2, 1), date(2023, 2, 10)
+    part = cols.between(start, end)
+    assert len(part) == 10
+    assert part.amount.sum() == pytest.approx(cols.daily(start, end).sum())
+    assert len(cols.between(start, datetime(2023, 2, 10))) == 9
+    assert len(cols.between(end, end)) == 1
+
+
+def test_percentile(cols):
+    assert cols.percentile(50) == np.median(cols.amount)
+    assert cols.percentile(100) == 7
+    assert ExpenseColumns.from_expenses([]).percentile(50) is None
+
+
+def test_total_matches_budget(repo, cols):
+    totals = ExpenseTotals()
+    totals.rebuild(repo)
+    for days in (1, 7, 31):
+        assert cols.total(days, today=TODAY) \
+            == pytest.approx(totals.total(days, today=TODAY))
+        assert cols.total(days, 2, today=TODAY) \
+            == pytest.approx(totals.total(days, 2, today=TODAY))
+
+
+def test_moving_average(cols):
+    start = date(2023, 1, 10)
+    averages = cols.moving_average(7, start, start + timedelta(days=13))
+    daily = [i % 7 + 1 for i in range(14)]
+    assert list(averages) == [start + timedelta(days=i) for i in range(14)]
+    assert averages[start] == daily[0]
+    assert averages[start + timedelta(days=13)] == pytest.approx(sum(daily[7:14]) / 7)
+
+
+def test_from_sqlite_epoch(repo, cols):
+    path = "test_analytics.db"
+    if os.path.exists(path):
+        os.unlink(path)
+    sqlite = SQLiteRepository(path, Expense, epoch_dates=True)
+    sqlite.add_many(Expense(e.amount, e.category, e.expense_date) for e in repo.get_all())
+    loaded = ExpenseColumns.from_sqlite(
+        sqlite, {'expense_date': Between(datetime(2023, 2, 1), datetime(2023, 2, 10))}
+    )
+    assert np.array_equal(loaded.date, cols.between(
+        datetime(2023, 2, 1), datetime(2023, 2, 10)
+    ).date)
+    os.unlink(path)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from bookkeeper import bench
+from bookkeeper.models.category import Category
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+def test_generators_are_deterministic():
+    repo = MemoryRepository[Category]()
+    cats = bench.generate_categories(repo, depth=2, fanout=3)
+    assert len(cats) == 3 + 9
+    parent = repo.get_all({'name': 'cat 2'})[0]
+    assert parent.parent is None
+    assert repo.get_all({'name': 'cat 2.3'})[0].parent == parent.pk
+
+    pks = [c.pk for c in cats]
+    first = list(bench.generate_expenses(pks, 50, seed=1))
+    second = list(bench.generate_expenses(pks, 50, seed=1))
+    assert first == second
+    assert first != list(bench.generate_expenses(pks, 50, seed=2))
+    assert all(exp.category in pks for exp in first)
+
+
+def test_percentile():
+    assert bench.percentile([], 50) == 0.0
+    assert bench.percentile([3, 1, 2], 50) == 2
+    assert bench.percentile([1, 2, 3, 4], 50) == 2.5
+    assert bench.percentile(range(101), 99) == 99
+
+
+@pytest.mark.parametrize('backend', bench.BACKENDS)
+def test_run_backend(backend):
+    results = bench.run_backend(backend, expenses=300, ops=20, batch_size=100)
+    assert [r.operation for r in results] == [
+        'add_many', 'add', 'get', 'get_all', 'update', 'delete', 'aggregate'
+    ]
+    assert results[0].ops == 300
+    assert all(r.backend == backend and r.throughput > 0 for r in results)
+    assert all(r.p50 <= r.p95 <= r.p99 <= r.max for r in results)
+
+
+@pytest.mark.parametrize('backend', bench.BACKENDS)
+def test_run_scans(backend):
+    results = bench.run_scans(backend, expenses=200, repeat=2)
+    operations = ['scan get_all', 'scan iter_all']
+    if backend == 'sqlite':
+        operations += ['scan get_rows', 'scan named_rows']
+    assert [r.operation for r in results] == operations
+    assert all(r.ops == 400 and r.throughput > 0 for r in results)
+
+
+def test_main_json(tmp_path):
+    path = tmp_path / 'bench.json'
+    bench.main(['--backends', 'memory', '--expenses', '100', '--ops', '10',
+                '--json', str(path)])
+    report = json.loads(path.read_text())
+    assert report['parameters']['expenses'] == 100
+    assert len(report['results']) == 7
+    assert report['results'][0]['backend'] == 'memory'
+
+
+def test_main_table(capsys):
+    bench.main(['--backends', 'sqlite', '--expenses', '100', '--ops', '10'])
+    assert 'aggregate' in capsys.readouterr().out
+
+
+def test_main_scans(capsys):
+    results = bench.main(['--backends', 'sqlite', '--expenses', '100',
+                          '--benchmarks', 'scans'])
+    assert [r.operation for r in results][0] == 'scan get_all'
+    assert 'scan named_rows' in capsys.readouterr().out
@@ -0,0 +1,179 @@
+import io
+import json
+import logging
+import os
+
+import pytest
+
+from bookkeeper.instrumentation import INSTRUMENTATION, Instrumentation, timed
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.presenter import Bookkeeper
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.view.headless_view import HeadlessView
+
+
+@pytest.fixture
+def instrumentation():
+    INSTRUMENTATION.reset()
+    INSTRUMENTATION.enable()
+    yield INSTRUMENTATION
+    INSTRUMENTATION.disable()
+    INSTRUMENTATION.slow_ms = None
+    INSTRUMENTATION.reset()
+
+
+def test_disabled():
+    inst = Instrumentation()
+    with inst.span("sql", "SELECT 1") as span:
+        assert span is None
+    assert inst.stats() == []
+
+
+def test_nested_spans():
+    inst = Instrumentation()
+    inst.enable()
+    with inst.span("presenter", "action") as outer:
+        with inst.span("sql", "SELECT 1") as inner:
+            inner.rows = 3
+        with inst.span("sql", "SELECT 1"):
+            pass
+    assert [s.name for s in outer.children] == ["SELECT 1", "SELECT 1"]
+    assert list(inst.traces) == [outer]
+    assert outer.duration >= sum(s.duration for s in outer.children)
+    stats = {(s.category, s.name): s for s in inst.stats()}
+    assert stats["sql", "SELECT 1"].count == 2
+    assert stats["sql", "SELECT 1"].rows == 3
+    assert stats["presenter", "action"].count == 1
+    sql = stats["sql", "SELECT 1"]
+    assert sql.p50 <= sql.p95 <= sql.p99 <= sql.max <= sql.total
+
+
+def test_spans_closed_out_of_order():
+    inst = Instrumentation()
+    inst.enable()
+    with inst.span("presenter", "outer") as outer:
+        first = inst.span("sql", "first")
+        first.__enter__()
+        with inst.span("sql", "second"):
+            first.__exit__(None, None, None)
+        inst.record("sql", "third", 1.5, rows=2)
+    assert [s.name for s in outer.children] == ["first", "second", "third"]
+    assert all(s.children == [] for s in outer.children)
+    assert list(inst.traces) == [outer]
+    assert inst._stack() == []
+
+
+def test_slow_log(caplog):
+    inst = Instrumentation(slow_ms=0)
+    inst.enable()
+    with caplog.at_level(logging.WARNING, logger="bookkeeper.instrumentation"):
+        with inst.span("sql", "SELECT 1"):
+            pass
+    assert "SELECT 1" in caplog.text
+    inst.enable(slow_ms=10_000)
+    caplog.clear()
+    with inst.span("sql", "SELECT 2"):
+        pass
+    assert caplog.text == ""
+
+
+def test_dump_and_report(instrumentation):
+    with instrumentation.span("sql", "SELECT\n    1"):
+        pass
+    out = io.StringIO()
+    instrumentation.dump(out)
+    report = json.loads(out.getvalue())
+    assert report["operations"][0]["name"] == "SELECT\n    1"
+    assert "SELECT 1" in instrumentation.report()
+    assert "запросов SQL: 1" in instrumentation.status_line()
+
+
+def test_timed(instrumentation):
+    @timed("test")
+    def func(n):
+        return list(range(n))
+
+    assert func(3) == [0, 1, 2]
+    instrumentation.disable()
+    func(4)
+    (stats,) = instrumentation.stats()
+    assert (stats.category, stats.count, stats.rows) == ("test", 1, 3)
+    assert stats.name.endswith("func")
+
+
+def test_sqlite_statements(instrumentation):
+    path = "test_instrumentation.db"
+    if os.path.exists(path):
+        os.unlink(path)
+    repo = SQLiteRepository(path, Category)
+    repo.add_many([Category("a"), Category("b")])
+    repo.get_all()
+    repo.delete_many([1, 2])
+    os.unlink(path)
+    stats = {s.name: s for s in instrumentation.stats() if s.category == "sql"}
+    assert stats["category.add_many"].rows == 2
+    assert stats["category.get_all"].rows == 2
+    assert stats["category.delete_many"].rows == 2
+    assert stats["category.schema"].count >= 1
+
+
+def test_sqlite_keys_bounded(instrumentation, caplog):
+    path = "test_instrumentation.db"
+    if os.path.exists(path):
+        os.unlink(path)
+    repo = SQLiteRepository(path, Category)
+    repo.add_many(Category(str(i)) for i in range(10))
+    instrumentation.reset()
+    for n in range(1, 6):
+        repo.get_all({'pk': In(range(1, n + 1))})
+    assert [c.pk for c in repo.iter_all(batch_size=3)] == list(range(1, 11))
+    instrumentation.enable(slow_ms=0)
+    with caplog.at_level(logging.WARNING, logger="bookkeeper.instrumentation"):
+        repo.get_all({'pk': In([1, 2])})
+    repo.pool.close()
+    os.unlink(path)
+    stats = {(s.name, s.count, s.rows) for s in instrumentation.stats()}
+    assert stats == {("category.get_all", 6, 17), ("category.iter_all", 1, 10)}
+    assert "category.get_all" in caplog.text
+    assert "IN (?, ?)" in caplog.text
+
+
+def test_sqlite_iter_all_between_spans(instrumentation):
+    path = "test_instrumentation.db"
+    if os.path.exists(path):
+        os.unlink(path)
+    repo = SQLiteRepository(path, Category)
+    repo.add_many(Category(str(i)) for i in range(5))
+    instrumentation.reset()
+    it = repo.iter_all(batch_size=2)
+    next(it)
+    with instrumentation.span("presenter", "outer") as outer:
+        with instrumentation.span("presenter", "consumer"):
+            assert len(list(it)) == 4
+    repo.pool.close()
+    os.unlink(path)
+    (trace,) = instrumentation.traces
+    assert trace is outer
+    (consumer,) = outer.children
+    (scan,) = consumer.children
+    assert (scan.name, scan.rows, scan.children) == ("category.iter_all", 5, [])
+    json.dumps(instrumentation.stats(), default=vars)
+
+
+def test_presenter_spans(instrumentation):
+    view = HeadlessView()
+    cat_repo = MemoryRepository[Category]()
+    cat_repo.add(Category("food"))
+    Bookkeeper(view, MemoryRepository[Expense](), cat_repo)
+    instrumentation.reset()
+    view.handler("exp_create")(10.0, "food")
+    (trace,) = instrumentation.traces
+    assert trace.name == "Bookkeeper.add_expense"
+    names = [span.name for span in trace.children]
+    assert "MemoryRepository.add" in names
+    assert "HeadlessView.expense_added" in names
+    categories = {s.category for s in instrumentation.stats()}
+    assert categories == {"presenter", "memory", "view"}
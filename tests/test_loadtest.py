@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from bookkeeper import bench, loadtest
+
+
+@pytest.mark.parametrize('backend', bench.BACKENDS)
+def test_run_session(backend):
+    results = loadtest.run_session(backend, expenses=200, steps=200, seed=1)
+    assert [r.operation for r in results] == ['startup', *loadtest.ACTIONS]
+    assert sum(r.ops for r in results[1:]) <= 200
+    assert all(r.backend == backend for r in results)
+    assert all(r.ops > 0 for r in results)
+
+
+def test_deterministic():
+    first = loadtest.run_session('memory', expenses=50, steps=100, seed=3)
+    second = loadtest.run_session('memory', expenses=50, steps=100, seed=3)
+    assert [r.ops for r in first] == [r.ops for r in second]
+
+
+def test_main_json(tmp_path):
+    path = tmp_path / 'load.json'
+    loadtest.main(['--backends', 'sqlite', '--expenses', '50', '--steps', '50',
+                   '--page-size', '0', '--json', str(path)])
+    report = json.loads(path.read_text())
+    assert report['parameters']['steps'] == 50
+    assert report['results'][0]['operation'] == 'startup'
@@ -0,0 +1,73 @@
+"""
+Тесты для сумм расходов
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from bookkeeper.models.budget import ExpenseTotals
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+TODAY = date(2023, 3, 12)
+
+
+def days_ago(days):
+    return datetime.combine(TODAY - timedelta(days=days), datetime.min.time())
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository()
+    for amount, category, days in [(1, 1, 0), (2, 2, 0), (4, 1, 3),
+                                   (8, 2, 10), (16, 1, 40)]:
+        repo.add(Expense(amount, category, expense_date=days_ago(days)))
+    return repo
+
+
+@pytest.fixture
+def totals(repo):
+    totals = ExpenseTotals()
+    totals.rebuild(repo)
+    return totals
+
+
+def test_rebuild(totals):
+    assert totals.total(1, today=TODAY) == 3
+    assert totals.total(7, today=TODAY) == 7
+    assert totals.total(31, today=TODAY) == 15
+    assert totals.total(31, category=1, today=TODAY) == 5
+    assert totals.total(31, category=3, today=TODAY) == 0
+
+
+def test_add_remove(totals):
+    exp = Expense(32, 1, expense_date=days_ago(1))
+    totals.add(exp)
+    assert totals.total(7, today=TODAY) == 39
+    totals.remove(exp)
+    assert totals.total(7, today=TODAY) == 7
+    totals.remove(Expense(1, 1, expense_date=days_ago(0)))
+    totals.remove(Expense(2, 2, expense_date=days_ago(0)))
+    assert totals.total(1, today=TODAY) == 0
+    assert totals._days.keys() == {TODAY - timedelta(days=d) for d in (3, 10, 40)}
+
+
+def test_move_category(totals):
+    totals.move_category(1, 2)
+    assert totals.total(31, category=1, today=TODAY) == 0
+    assert totals.total(31, category=2, today=TODAY) == 15
+    totals.move_category(2, None)
+    assert totals.total(31, today=TODAY) == 0
+
+
+def test_matches_rebuild(repo, totals):
+    exp = Expense(64, 2, expense_date=days_ago(2))
+    repo.add(exp)
+    totals.add(exp)
+    expected = ExpenseTotals()
+    expected.rebuild(repo)
+    for days in (1, 7, 31, 365):
+        for category in (None, 1, 2):
+            assert totals.total(days, category, TODAY) \
+                == expected.total(days, category, TODAY)
@@ -0,0 +1,62 @@
+"""
+Тесты для кэша категорий
+"""
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_cache import CategoryCache
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository()
+    Category.create_from_tree(
+        [('продукты', None), ('мясо', 'продукты'), ('сырое мясо', 'мясо'),
+         ('книги', None)],
+        repo
+    )
+    return repo
+
+
+@pytest.fixture
+def cache(repo):
+    return CategoryCache(repo)
+
+
+def test_lookups(repo, cache):
+    meat = cache.pk('мясо')
+    assert meat == repo.get_all({'name': 'мясо'})[0].pk
+    assert cache.name(meat) == 'мясо'
+    assert cache.get(meat) == repo.get(meat)
+    assert cache.pk('рыба') is None
+    assert cache.get(-1) is None
+    assert cache.path(cache.pk('сырое мясо')) == ['продукты', 'мясо', 'сырое мясо']
+    assert cache.path(cache.pk('книги')) == ['книги']
+    assert [c.name for c in cache.all()] == [c.name for c in repo.get_all()]
+
+
+def test_single_query(repo, cache, monkeypatch):
+    calls = []
+    get_all = repo.get_all
+    monkeypatch.setattr(
+        repo, 'get_all', lambda *args: calls.append(args) or get_all(*args)
+    )
+    for _ in range(10):
+        cache.name(cache.pk('мясо'))
+        cache.path(cache.pk('сырое мясо'))
+    assert len(calls) == 1
+
+
+def test_invalidate(repo, cache):
+    assert cache.pk('рыба') is None
+    fish = repo.add(Category('рыба', cache.pk('продукты')))
+    assert cache.pk('рыба') is None
+    cache.invalidate()
+    assert cache.pk('рыба') == fish
+    assert cache.path(fish) == ['продукты', 'рыба']
+    repo.delete(fish)
+    cache.invalidate()
+    assert cache.pk('рыба') is None
+    with pytest.raises(KeyError):
+        cache.path(fish)
@@ -0,0 +1,149 @@
+"""
+Тесты для дерева категорий
+"""
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_tree import CategoryClosure, CategoryTree
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+TREE = [('продукты', None), ('мясо', 'продукты'), ('сырое мясо', 'мясо'),
+        ('рыба', 'мясо'), ('хлеб', 'продукты'), ('книги', None)]
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository()
+    Category.create_from_tree(TREE, repo)
+    return repo
+
+
+@pytest.fixture
+def pks(repo):
+    return {cat.name: cat.pk for cat in repo.get_all()}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def closure(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRepository(indexes=['ancestor', 'descendant'])
+    return SQLiteRepository(
+        str(tmp_path / 'closure.db'), CategoryClosure,
+        indexes=['ancestor', 'descendant']
+    )
+
+
+def closure_set(closure):
+    return {(row.ancestor, row.descendant, row.depth) for row in closure.get_all()}
+
+
+def expected_closure(tree):
+    return {
+        (ancestor, pk, depth)
+        for pk in tree.walk()
+        for depth, ancestor in enumerate([pk] + tree.ancestors(pk))
+    }
+
+
+def test_queries(repo, pks):
+    tree = CategoryTree.from_repo(repo)
+    assert len(tree) == len(TREE)
+    assert tree.roots() == [pks['продукты'], pks['книги']]
+    assert tree.children(pks['мясо']) == [pks['сырое мясо'], pks['рыба']]
+    assert tree.depth(pks['продукты']) == 0
+    assert tree.depth(pks['рыба']) == 2
+    assert tree.ancestors(pks['рыба']) == [pks['мясо'], pks['продукты']]
+    assert tree.path(pks['рыба']) == ['продукты', 'мясо', 'рыба']
+    assert tree.descendants(pks['продукты']) == [
+        pks[name] for name in ['мясо', 'сырое мясо', 'рыба', 'хлеб']
+    ]
+    assert tree.subtree(pks['книги']) == [pks['книги']]
+    assert tree.is_ancestor(pks['продукты'], pks['рыба'])
+    assert tree.is_ancestor(pks['рыба'], pks['рыба'])
+    assert not tree.is_ancestor(pks['рыба'], pks['мясо'])
+    assert not tree.is_ancestor(pks['книги'], pks['рыба'])
+    assert list(tree.walk()) == [pks[name] for name, _ in TREE]
+
+
+def test_same_as_category_methods(repo):
+    tree = CategoryTree.from_repo(repo)
+    for cat in repo.get_all():
+        assert tree.ancestors(cat.pk) == [c.pk for c in cat.get_all_parents(repo)]
+        assert sorted(tree.descendants(cat.pk)) == sorted(
+            c.pk for c in cat.get_subcategories(repo)
+        )
+
+
+def test_add_remove(repo, pks):
+    tree = CategoryTree.from_repo(repo)
+    assert tree.depth(pks['рыба']) == 2
+    cat = Category('икра', pks['рыба'])
+    repo.add(cat)
+    tree.add(cat)
+    assert tree.depth(cat.pk) == 3
+    assert cat.pk in tree.descendants(pks['продукты'])
+
+    tree.remove(pks['мясо'])
+    assert pks['мясо'] not in tree
+    assert tree.children(pks['продукты']) == [
+        pks['сырое мясо'], pks['рыба'], pks['хлеб']
+    ]
+    assert tree.depth(cat.pk) == 2
+    assert tree.path(cat.pk) == ['продукты', 'рыба', 'икра']
+    # объекты репозитория не изменяются деревом
+    assert repo.get(pks['рыба']).parent == pks['мясо']
+
+
+def test_closure(repo, pks, closure):
+    tree = CategoryTree.from_repo(repo, closure)
+    tree.save_closure()
+    assert closure_set(closure) == expected_closure(tree)
+    rows = closure.get_all({'ancestor': pks['мясо']})
+    assert {row.descendant for row in rows} == {
+        pks['мясо'], pks['сырое мясо'], pks['рыба']
+    }
+
+    cat = Category('икра', pks['рыба'])
+    repo.add(cat)
+    tree.add(cat)
+    assert closure_set(closure) == expected_closure(tree)
+
+    tree.remove(pks['мясо'])
+    assert closure_set(closure) == expected_closure(tree)
+    tree.remove(pks['продукты'])
+    assert closure_set(closure) == expected_closure(tree)
+    rows = closure.get_all({'descendant': cat.pk, 'depth': 1})
+    assert [row.ancestor for row in rows] == [pks['рыба']]
+
+
+
+def test_closure_lazy(repo, pks, closure):
+    tree = CategoryTree.from_repo(repo, closure)
+    cat = Category('икра', pks['рыба'])
+    repo.add(cat)
+    tree.add(cat)
+    tree.remove(pks['хлеб'])
+    assert closure.get_all() == []
+
+    assert tree.closure_table() is closure
+    assert closure_set(closure) == expected_closure(tree)
+    tree.remove(pks['мясо'])
+    assert closure_set(closure) == expected_closure(tree)
+
+def test_save_closure_without_repo(repo):
+    with pytest.raises(ValueError):
+        CategoryTree.from_repo(repo).save_closure()
+    with pytest.raises(ValueError):
+        CategoryTree.from_repo(repo).closure_table()
+
+
+def test_rollup(repo, pks):
+    tree = CategoryTree.from_repo(repo)
+    totals = tree.rollup({pks['сырое мясо']: 1, pks['рыба']: 2, pks['мясо']: 4,
+                          pks['хлеб']: 8, pks['книги']: 16, -1: 32})
+    assert totals == {
+        pks['продукты']: 15, pks['мясо']: 7, pks['сырое мясо']: 1,
+        pks['рыба']: 2, pks['хлеб']: 8, pks['книги']: 16,
+    }
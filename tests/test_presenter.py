@@ -0,0 +1,177 @@
+from bookkeeper.bench import (
+	START, generate_categories, generate_expenses, repositories
+)
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_tree import CategoryClosure
+from bookkeeper.models.expense import Expense
+from bookkeeper.presenter import Bookkeeper
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Between, InSubtree
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.view.headless_view import HeadlessView
+
+from datetime import datetime, timedelta
+
+import pytest
+
+NOW = datetime.now()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repos(request, tmp_path):
+	cat_repo, exp_repo = repositories(request.param, str(tmp_path / 'presenter.db'))
+	yield cat_repo, exp_repo
+	if isinstance(exp_repo, SQLiteRepository):
+		exp_repo.pool.close()
+
+
+@pytest.fixture
+def pks(repos):
+	"""
+	food
+		meat
+			fish
+		milk
+	books
+	"""
+	cat_repo, exp_repo = repos
+	pks = {}
+	for name, parent in [('food', None), ('meat', 'food'), ('fish', 'meat'),
+			('milk', 'food'), ('books', None)]:
+		pks[name] = cat_repo.add(Category(name, pks.get(parent)))
+	amounts = {'food': 1.0, 'meat': 10.0, 'fish': 100.0, 'milk': 1000.0, 'books': 10000.0}
+	exp_repo.add_many(
+		Expense(amount, pks[name], expense_date=NOW - timedelta(days=days))
+		for name, amount in amounts.items() for days in (0, 40)
+	)
+	return pks
+
+
+@pytest.fixture
+def bk(repos, pks):
+	cat_repo, exp_repo = repos
+	return Bookkeeper(HeadlessView(page_size=None), exp_repo, cat_repo)
+
+
+def _expenses(bk):
+	return sorted(
+		(bk.cats.name(exp.category), exp.amount) for exp in bk.exp_repo.get_all()
+	)
+
+
+def _parents(bk):
+	return {
+		cat.name: None if cat.parent is None else bk.cats.name(cat.parent)
+		for cat in bk.cat_repo.get_all()
+	}
+
+
+def _totals(bk):
+	return {
+		name: bk.totals.total(31, bk.cats.pk(name))
+		for name in ('food', 'meat', 'fish', 'milk', 'books')
+		if bk.cats.pk(name) is not None
+	}
+
+
+def test_delete_leaf(bk, pks):
+	bk.delete_category('fish')
+	assert bk.view.statuses[-1] == "Категория [fish] удалена."
+	assert ('category_deleted', pks['fish']) in bk.view.events
+	assert _parents(bk) == {'food': None, 'meat': 'food', 'milk': 'food', 'books': None}
+	assert _expenses(bk) == sorted(
+		2 * [('food', 1.0), ('meat', 10.0), ('meat', 100.0), ('milk', 1000.0),
+			('books', 10000.0)]
+	)
+	assert _totals(bk) == {'food': 1.0, 'meat': 110.0, 'milk': 1000.0, 'books': 10000.0}
+	assert bk.totals.total(31) == 11111.0
+	assert pks['fish'] not in bk.tree
+	assert bk.tree.children(pks['meat']) == []
+	assert bk.tree.subtree(pks['food']) == [pks['food'], pks['meat'], pks['milk']]
+
+
+def test_delete_inner(bk, pks):
+	bk.delete_category('meat')
+	assert _parents(bk) == {'food': None, 'fish': 'food', 'milk': 'food', 'books': None}
+	assert _expenses(bk) == sorted(
+		2 * [('food', 1.0), ('food', 10.0), ('fish', 100.0), ('milk', 1000.0),
+			('books', 10000.0)]
+	)
+	assert _totals(bk) == {'food': 11.0, 'fish': 100.0, 'milk': 1000.0, 'books': 10000.0}
+	assert bk.totals.total(31) == 11111.0
+	assert pks['meat'] not in bk.tree
+	assert bk.tree.children(pks['food']) == [pks['fish'], pks['milk']]
+	assert bk.tree.depth(pks['fish']) == 1
+	assert bk.tree.path(pks['fish']) == ['food', 'fish']
+	assert bk.cats.path(pks['fish']) == ['food', 'fish']
+
+
+def test_delete_top_level(bk, pks):
+	bk.delete_category('food')
+	assert _parents(bk) == {'meat': None, 'fish': 'meat', 'milk': None, 'books': None}
+	assert _expenses(bk) == sorted(
+		2 * [('meat', 10.0), ('fish', 100.0), ('milk', 1000.0), ('books', 10000.0)]
+	)
+	assert _totals(bk) == {'meat': 10.0, 'fish': 100.0, 'milk': 1000.0, 'books': 10000.0}
+	assert bk.totals.total(31) == 11110.0
+	assert pks['food'] not in bk.tree
+	assert bk.tree.roots() == [pks['meat'], pks['milk'], pks['books']]
+	assert bk.tree.depth(pks['fish']) == 1
+	assert bk.cats.pk('food') is None
+
+
+def test_delete_unknown(bk):
+	expenses = _expenses(bk)
+	bk.delete_category('cars')
+	assert bk.view.statuses[-1] == "Категория [cars] не существует!"
+	assert _expenses(bk) == expenses
+
+
+def test_closure_built_lazily(repos, pks):
+	cat_repo, exp_repo = repos
+	closure = MemoryRepository[CategoryClosure](indexes=['ancestor', 'descendant'])
+	bk = Bookkeeper(HeadlessView(page_size=None), exp_repo, cat_repo, closure)
+	bk.add_category('cheese', 'milk')
+	bk.delete_category('meat')
+	assert closure.get_all() == []
+
+	assert bk.tree.closure_table() is closure
+	rows = closure.get_all({'descendant': bk.cats.pk('fish')})
+	assert sorted((row.ancestor, row.depth) for row in rows) \
+		== [(pks['food'], 1), (pks['fish'], 0)]
+	bk.add_category('eggs', 'fish')
+	rows = closure.get_all({'ancestor': pks['food']})
+	assert {row.descendant for row in rows} == {
+		bk.cats.pk(name) for name in ('food', 'fish', 'eggs', 'milk', 'cheese')
+	}
+
+
+def test_category_totals(repos):
+	cat_repo, exp_repo = repos
+	cats = generate_categories(cat_repo, depth=3, fanout=3)
+	exp_repo.add_many(generate_expenses([cat.pk for cat in cats], 500, days=60))
+	bk = Bookkeeper(HeadlessView(page_size=None), exp_repo, cat_repo)
+	parents = {cat.pk: cat.parent for cat in cats}
+
+	def chain(pk):
+		while pk is not None:
+			yield pk
+			pk = parents[pk]
+
+	start, end = START + timedelta(days=10), START + timedelta(days=40)
+	expected = dict.fromkeys(parents, 0)
+	for exp in exp_repo.get_all():
+		if start <= exp.expense_date <= end:
+			for pk in chain(exp.category):
+				expected[pk] += exp.amount
+	totals = bk.category_totals(start, end)
+	assert totals.keys() == expected.keys()
+	assert all(abs(totals[pk] - expected[pk]) < 1e-6 for pk in expected)
+	assert any(expected[pk] for pk in bk.tree.roots())
+	if isinstance(exp_repo, SQLiteRepository):
+		# те же итоги рекурсивным запросом в СУБД
+		for pk in expected:
+			total = exp_repo.aggregate('amount', 'sum', {
+				'expense_date': Between(start, end), 'category': InSubtree(pk)
+			})[()]
+			assert abs(total - expected[pk]) < 1e-6
@@ -18,3 +18,20 @@ def test_can_create_subclass():
 
     t = Test()
     assert isinstance(t, AbstractRepository)
+
+
+def test_default_bulk_methods():
+    class Test(AbstractRepository):
+        def __init__(self): self.log = []
+        def add(self, obj): self.log.append(('add', obj)); return obj
+        def get(self, pk): pass
+        def get_all(self, where=None): pass
+        def update(self, obj): self.log.append(('update', obj))
+        def delete(self, pk): self.log.append(('delete', pk))
+
+    t = Test()
+    assert t.add_many([1, 2]) == [1, 2]
+    t.update_many([3])
+    t.delete_many([4, 5])
+    assert t.log == [('add', 1), ('add', 2), ('update', 3),
+                     ('delete', 4), ('delete', 5)]
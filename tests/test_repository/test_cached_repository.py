@@ -0,0 +1,162 @@
+from bookkeeper.repository.cached_repository import CachedRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.query import Ge, InSubtree
+
+import pytest
+
+from dataclasses import dataclass
+
+import os
+
+
+@dataclass
+class Custom():
+	name: str = ""
+	value: int = 0
+	parent: int | None = None
+	pk: int = 0
+
+
+class CountingRepository(MemoryRepository):
+	def __init__(self):
+		super().__init__()
+		self.calls = 0
+
+	def get(self, pk):
+		self.calls += 1
+		return super().get(pk)
+
+	def get_all(self, *args, **kwargs):
+		self.calls += 1
+		return super().get_all(*args, **kwargs)
+
+
+@pytest.fixture
+def inner():
+	repo = CountingRepository()
+	repo.add_many(Custom(str(i), i % 3) for i in range(10))
+	repo.calls = 0
+	return repo
+
+
+@pytest.fixture
+def repo(inner):
+	return CachedRepository(inner, max_items=4)
+
+
+def test_get_cached(repo, inner):
+	assert repo.get(1) is repo.get(1)
+	assert repo.get(100) is None
+	assert repo.get(100) is None
+	assert inner.calls == 2
+	assert (repo.stats.hits, repo.stats.misses) == (2, 2)
+	assert repo.stats.hit_rate == 0.5
+
+
+def test_get_all_cached(repo, inner):
+	first = repo.get_all({'value': 1}, order_by='-name')
+	second = repo.get_all({'value': 1}, order_by=['-name'])
+	assert first == second
+	assert first is not second
+	assert inner.calls == 1
+	assert repo.get(first[0].pk) is first[0]
+	assert inner.calls == 1
+
+
+def test_lru_eviction(repo, inner):
+	for pk in range(1, 6):
+		repo.get(pk)
+	assert repo.stats.evictions == 1
+	repo.get(2)
+	repo.get(6)
+	assert repo.stats.evictions == 2
+	inner.calls = 0
+	repo.get(2)
+	assert inner.calls == 0
+	repo.get(1)
+	repo.get(3)
+	assert inner.calls == 2
+
+
+def test_add_invalidates_matching(repo, inner):
+	repo.get_all({'value': 1})
+	repo.get_all({'value': 2})
+	repo.get(11)
+	obj = Custom('new', 1)
+	repo.add(obj)
+	inner.calls = 0
+	assert obj in repo.get_all({'value': 1})
+	assert inner.calls == 1
+	repo.get_all({'value': 2})
+	assert inner.calls == 1
+	assert repo.get(11) is obj
+
+
+def test_update_invalidates(repo, inner):
+	ones = repo.get_all({'value': 1})
+	repo.get_all({'value': 2})
+	repo.get_all({'value': 0})
+	obj = ones[0]
+	obj.value = 2
+	repo.update(obj)
+	inner.calls = 0
+	assert obj not in repo.get_all({'value': 1})
+	assert obj in repo.get_all({'value': 2})
+	repo.get_all({'value': 0})
+	assert inner.calls == 2
+
+
+def test_delete_invalidates(repo, inner):
+	repo.get_all({'value': Ge(1)}, limit=2)
+	repo.get_all({'value': 0}, limit=2)
+	repo.get_all({'value': 0}, order_by='pk', limit=2, offset=2)
+	repo.delete(2)
+	inner.calls = 0
+	repo.get_all({'value': 0}, limit=2)
+	assert inner.calls == 0
+	assert 2 not in [o.pk for o in repo.get_all({'value': Ge(1)}, limit=2)]
+	assert inner.calls == 1
+	repo.get_all({'value': 0}, order_by='pk', limit=2, offset=2)
+	assert inner.calls == 2
+	assert repo.get(2) is None
+
+
+def test_where_methods_clear(repo, inner):
+	repo.get_all({'value': 1})
+	assert repo.update_where({'value': 1}, {'value': 5}) == 3
+	assert len(repo.get_all({'value': 5})) == 3
+	assert repo.delete_where({'value': 5}) == 3
+	assert repo.get_all({'value': 5}) == []
+
+
+def test_transaction_rollback(repo):
+	repo.get_all()
+	with pytest.raises(RuntimeError):
+		with repo.transaction():
+			repo.delete(1)
+			repo.get_all()
+			raise RuntimeError()
+	assert len(repo.get_all()) == 10
+	assert repo.get(1) is not None
+
+
+def test_unhashable_where(repo, inner):
+	repo.get_all({'name': ['1']})
+	repo.get_all({'name': ['1']})
+	assert inner.calls == 2
+
+
+def test_sqlite_subtree():
+	path = "test_cached_repository.db"
+	if os.path.exists(path):
+		os.unlink(path)
+	inner = SQLiteRepository(path, Custom)
+	repo = CachedRepository(inner)
+	root = Custom('root')
+	repo.add(root)
+	subtree = {'pk': InSubtree(root.pk, 'custom')}
+	assert len(repo.get_all(subtree)) == 1
+	repo.add(Custom('child', parent=root.pk))
+	assert len(repo.get_all(subtree)) == 2
+	os.unlink(path)
@@ -1,4 +1,9 @@
+from inspect import isgenerator
+
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import (
+	Between, Ge, Gt, In, Le, Lt, as_condition, order_objects
+)
 
 import pytest
 
@@ -71,3 +76,204 @@ def test_get_all_with_condition(repo, custom_class):
 		objects.append(o)
 	assert repo.get_all({'name': '0'}) == [objects[0]]
 	assert repo.get_all({'test': 'test'}) == objects
+
+
+def test_add_many(repo, custom_class):
+	objects = [custom_class() for i in range(5)]
+	pks = repo.add_many(objects)
+	assert pks == [o.pk for o in objects]
+	assert repo.get_all() == objects
+
+
+def test_cannot_add_many_with_pk(repo, custom_class):
+	objects = [custom_class() for i in range(3)]
+	objects[1].pk = 1
+	with pytest.raises(ValueError):
+		repo.add_many(objects)
+	assert repo.get_all() == []
+
+
+def test_update_many(repo, custom_class):
+	pks = repo.add_many(custom_class() for i in range(3))
+	objects = []
+	for pk in pks:
+		o = custom_class()
+		o.pk = pk
+		objects.append(o)
+	repo.update_many(objects)
+	assert repo.get_all() == objects
+
+
+def test_delete_many(repo, custom_class):
+	pks = repo.add_many(custom_class() for i in range(3))
+	repo.delete_many(pks[:2])
+	assert [o.pk for o in repo.get_all()] == pks[2:]
+	with pytest.raises(KeyError):
+		repo.delete_many([pks[2], pks[0]])
+	assert [o.pk for o in repo.get_all()] == pks[2:]
+
+
+def test_transaction_rollback(repo, custom_class):
+	obj = custom_class()
+	obj.name = 'old'
+	pk = repo.add(obj)
+	with pytest.raises(KeyError):
+		with repo.transaction():
+			repo.add(custom_class())
+			new = custom_class()
+			new.pk = pk
+			new.name = 'new'
+			repo.update(new)
+			repo.delete(100)
+	assert [o.pk for o in repo.get_all()] == [pk]
+	assert repo.get(pk).name == 'old'
+
+
+def test_update_where(repo, custom_class):
+	objects = []
+	for i in range(5):
+		o = custom_class()
+		o.name = str(i % 2)
+		objects.append(o)
+	repo.add_many(objects)
+	assert repo.update_where({'name': '0'}, {'name': '2'}) == 3
+	assert repo.get_all({'name': '2'}) == objects[::2]
+	assert repo.get_all({'name': '0'}) == []
+
+
+def test_delete_where(repo, custom_class):
+	objects = []
+	for i in range(5):
+		o = custom_class()
+		o.name = str(i % 2)
+		objects.append(o)
+	repo.add_many(objects)
+	assert repo.delete_where({'name': '0'}) == 3
+	assert repo.get_all() == objects[1::2]
+
+
+def test_get_all_with_query(repo, custom_class):
+	objects = []
+	for i in range(6):
+		o = custom_class()
+		o.n = i % 3
+		o.name = str(i)
+		objects.append(o)
+	repo.add_many(objects)
+	assert repo.get_all({'n': Ge(1), 'name': In(['1', '2', '3'])}) \
+		== [objects[1], objects[2]]
+	assert repo.get_all(order_by='-n', limit=3) \
+		== [objects[2], objects[5], objects[1]]
+	assert repo.get_all({'n': Lt(2)}, order_by='n', offset=2) \
+		== [objects[1], objects[4]]
+	assert repo.get_all(limit=2, offset=5) == [objects[5]]
+
+
+@pytest.fixture
+def indexed_repo():
+	return MemoryRepository(indexes=['name', 'n'], sorted_indexes=['n'])
+
+
+def _create(n, name):
+	class Custom():
+		pk = 0
+	o = Custom()
+	o.n = n
+	o.name = name
+	return o
+
+
+def test_indexed_get_all(indexed_repo):
+	objects = [_create(i % 4, str(i % 3)) for i in range(12)]
+	indexed_repo.add_many(objects)
+	for where in ({'name': '1'}, {'n': 2}, {'n': In([0, 3])},
+				  {'n': Ge(2)}, {'n': Gt(2)}, {'n': Lt(1)}, {'n': Le(1)},
+				  {'n': Between(1, 2), 'name': In(['0', '2'])},
+				  {'name': '5'}, {'n': In([])}):
+		expected = [o for o in objects
+					if all(as_condition(c).test(getattr(o, k))
+						   for k, c in where.items())]
+		assert indexed_repo.get_all(where) == expected, where
+
+
+def test_indexed_order(indexed_repo):
+	objects = [_create(i % 3, str(i)) for i in range(7)]
+	indexed_repo.add_many(objects)
+	for order_by in ('n', '-n'):
+		expected = order_objects(objects, order_by)
+		assert indexed_repo.get_all(order_by=order_by) == expected
+		assert indexed_repo.get_all(order_by=order_by, limit=3, offset=1) \
+			== expected[1:4]
+	assert indexed_repo.get_all({'name': In(['1', '2', '3'])}, order_by='-n') \
+		== [objects[2], objects[1], objects[3]]
+
+
+def test_order_not_covered(repo, indexed_repo):
+	# regression: в пустом репозитории без упорядоченного индекса по полю
+	# сортировка пыталась обойти несуществующий индекс (KeyError)
+	assert repo.get_all(order_by='-pk', limit=3) == []
+	assert indexed_repo.get_all(order_by='name', limit=3) == []
+	assert indexed_repo._covers('n') and not indexed_repo._covers('name')
+	objects = [_create(i, 'a') for i in range(3)]
+	indexed_repo.add_many(objects)
+	indexed_repo.delete_many([o.pk for o in objects])
+	assert indexed_repo.get_all(order_by='-n', limit=3) == []
+	assert indexed_repo.get_all(order_by='-name', limit=3) == []
+	indexed_repo.add(_create(None, 'b'))
+	assert not indexed_repo._covers('n')
+	assert [o.name for o in indexed_repo.get_all(order_by='n')] == ['b']
+
+def test_indexes_follow_changes(indexed_repo):
+	objects = [_create(i, 'a') for i in range(5)]
+	indexed_repo.add_many(objects)
+
+	changed = _create(10, 'b')
+	changed.pk = objects[0].pk
+	indexed_repo.update(changed)
+	indexed_repo.delete(objects[1].pk)
+	indexed_repo.update_where({'n': 2}, {'n': 20, 'name': 'b'})
+	indexed_repo.delete_where({'n': 3})
+	assert indexed_repo.get_all({'name': 'b'}) == [changed, objects[2]]
+	assert indexed_repo.get_all({'n': Ge(4)}) == [changed, objects[2], objects[4]]
+	assert indexed_repo.get_all(order_by='-n') == [objects[2], changed, objects[4]]
+
+	with pytest.raises(KeyError):
+		with indexed_repo.transaction():
+			indexed_repo.delete_many([changed.pk])
+			indexed_repo.delete(100)
+	assert [o.pk for o in indexed_repo.get_all({'name': 'b'})] \
+		== [changed.pk, objects[2].pk]
+
+
+def test_nested_transaction_rollback(indexed_repo):
+	objects = [_create(i, 'a') for i in range(5)]
+	indexed_repo.add_many(objects)
+	with pytest.raises(KeyError):
+		with indexed_repo.transaction():
+			with indexed_repo.transaction():
+				indexed_repo.delete(objects[1].pk)
+				indexed_repo.update_where({'n': 3}, {'name': 'b'})
+			with pytest.raises(KeyError):
+				with indexed_repo.transaction():
+					indexed_repo.delete_where({'n': 0})
+					indexed_repo.delete(100)
+			assert indexed_repo.get(objects[0].pk) is not None
+			indexed_repo.add(_create(10, 'b'))
+			indexed_repo.delete(100)
+	assert [o.pk for o in indexed_repo.get_all()] == [o.pk for o in objects]
+	assert [o.n for o in indexed_repo.get_all({'name': 'a'})] == [0, 1, 2, 3, 4]
+	assert indexed_repo.get_all({'name': 'b'}) == []
+	assert indexed_repo._undo == []
+
+
+def test_iter_all(indexed_repo):
+	objects = [_create(i % 4, str(i % 3)) for i in range(12)]
+	indexed_repo.add_many(objects)
+	gen = indexed_repo.iter_all({'n': Ge(2)})
+	assert isgenerator(gen)
+	assert list(gen) == indexed_repo.get_all({'n': Ge(2)})
+	assert list(indexed_repo.iter_all(order_by='-n')) \
+		== indexed_repo.get_all(order_by='-n')
+	for obj in indexed_repo.iter_all():
+		indexed_repo.delete(obj.pk)
+	assert indexed_repo.get_all() == []
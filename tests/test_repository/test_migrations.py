@@ -0,0 +1,168 @@
+from bookkeeper.repository.connection_pool import ConnectionPool
+from bookkeeper.repository.migrations import (
+	Migration, Migrator, add_column, columns, convert_dates, create_index, rewrite_table
+)
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+import pytest
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import os
+
+
+@pytest.fixture
+def pool():
+	path = "test_migrations.db"
+	if os.path.exists(path):
+		os.unlink(path)
+	with ConnectionPool(path) as p:
+		p.connection().execute("CREATE TABLE item(name TEXT, value INTEGER)")
+		p.connection().executemany(
+			"INSERT INTO item VALUES (?, ?)", [(str(i), i) for i in range(25)]
+		)
+		p.connection().commit()
+		yield p
+	os.unlink(path)
+
+
+def test_migrate(pool):
+	steps = [
+		Migration(2, "index", lambda con, progress: create_index(con, "item", ["value"])),
+		Migration(1, "column", lambda con, progress: add_column(con, "item", "x", "REAL")),
+	]
+	migrator = Migrator(pool, steps)
+	assert migrator.version() == 0
+	assert [m.version for m in migrator.pending()] == [1, 2]
+	reports = []
+	assert migrator.migrate(lambda *args: reports.append(args)) == 2
+	assert reports == [("column", 0, 1), ("column", 1, 1), ("index", 0, 1), ("index", 1, 1)]
+	assert "x" in columns(pool.connection(), "item")
+	assert pool.connection().execute(
+		"SELECT name FROM sqlite_master WHERE name = 'mig_idx_item__value'"
+	).fetchone()
+	assert migrator.pending() == []
+	assert migrator.migrate() == 2
+
+
+def test_migrate_rollback(pool):
+	def broken(con, progress):
+		add_column(con, "item", "x", "REAL")
+		raise RuntimeError("broken")
+
+	migrator = Migrator(pool, [
+		Migration(1, "ok", lambda con, progress: add_column(con, "item", "y", "TEXT")),
+		Migration(2, "broken", broken),
+	])
+	with pytest.raises(RuntimeError):
+		migrator.migrate()
+	assert migrator.version() == 1
+	assert list(columns(pool.connection(), "item")) == ["name", "value", "y"]
+
+
+def test_invalid_versions(pool):
+	step = Migration(1, "", lambda con, progress: None)
+	with pytest.raises(ValueError):
+		Migrator(pool, [step, step])
+	with pytest.raises(ValueError):
+		Migrator(pool, [Migration(0, "", lambda con, progress: None)])
+
+
+def test_add_column(pool):
+	con = pool.connection()
+	assert add_column(con, "item", "x", "REAL")
+	assert not add_column(con, "item", "x", "REAL")
+	assert columns(con, "item") == {"name": "TEXT", "value": "INTEGER", "x": "REAL"}
+
+
+def test_rewrite_table(pool):
+	con = pool.connection()
+	con.execute("DELETE FROM item WHERE value = 3")
+	con.commit()
+	rowids = [r[0] for r in con.execute("SELECT rowid FROM item ORDER BY rowid")]
+	reports = []
+	with pool.transaction():
+		done = rewrite_table(
+			con, "item", {"value": "TEXT", "double": "INTEGER", "note": "TEXT"},
+			{"value": "CAST(value AS TEXT)", "double": "value * 2"},
+			batch_size=10, progress=lambda *args: reports.append(args)
+		)
+	assert done == 24
+	assert [r[1:] for r in reports] == [(0, 24), (10, 24), (20, 24), (24, 24)]
+	assert columns(con, "item") == {"value": "TEXT", "double": "INTEGER", "note": "TEXT"}
+	rows = con.execute("SELECT rowid, value, double, note FROM item ORDER BY rowid").fetchall()
+	assert [r[0] for r in rows] == rowids
+	assert rows[3] == (rowids[3], "4", 8, None)
+
+
+def test_rewrite_table_keeps_indexes(pool):
+	con = pool.connection()
+	with pool.transaction():
+		create_index(con, "item", ["value"])
+		create_index(con, "item", ["name"])
+		con.execute("CREATE INDEX custom_idx ON item(value, name)")
+		rewrite_table(con, "item", {"value": "TEXT", "note": "TEXT"})
+	indexes = dict(con.execute(
+		"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'item'"
+	).fetchall())
+	assert indexes == {
+		"mig_idx_item__value":
+			"CREATE INDEX mig_idx_item__value ON item(value)",
+	}
+	plan = con.execute("EXPLAIN QUERY PLAN SELECT * FROM item WHERE value = '3'").fetchall()
+	assert "mig_idx_item__value" in plan[0][-1]
+
+
+@dataclass
+class Dated():
+	name: str = ""
+	date: datetime = datetime(2023, 1, 1)
+	pk: int = 0
+
+
+def test_convert_dates(pool):
+	steps = [Migration(1, "index", lambda con, progress: create_index(con, "dated", ["date"]))]
+	repo = SQLiteRepository(pool.db_file, Dated, pool, indexes=["name"])
+	repo.add_many(Dated(str(i), datetime(2023, 1, 1 + i, 12, 0, 0, 5)) for i in range(3))
+	Migrator(pool, steps).migrate()
+	steps.append(Migration(2, "epoch", lambda con, progress: convert_dates(
+		con, "dated", ["date"], epoch=True, progress=progress
+	)))
+	assert Migrator(pool, steps).migrate() == 2
+	epoch = SQLiteRepository(pool.db_file, Dated, pool, indexes=["name"], epoch_dates=True)
+	assert [o.date for o in epoch.get_all()] == [datetime(2023, 1, 1 + i, 12) for i in range(3)]
+	indexes = {row[0] for row in pool.connection().execute(
+		"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'dated'"
+	)}
+	assert indexes == {"idx_dated__name", "mig_idx_dated__date"}
+	with pool.transaction() as con:
+		assert convert_dates(con, "dated", ["date"], epoch=True) == 0
+
+
+@dataclass
+class Item():
+	name: str = ""
+	value: int = 0
+	comment: str = ""
+	pk: int = 0
+
+
+def test_repository_adds_new_fields(pool):
+	repo = SQLiteRepository(pool.db_file, Item, pool)
+	assert list(columns(pool.connection(), "item")) == ["name", "value", "comment"]
+	assert repo.get(1) == Item("0", 0, None, 1)
+	repo.update(Item("0", 0, "note", 1))
+	assert repo.get(1).comment == "note"
+
+
+def test_migrated_index_survives_reopen(pool):
+	steps = [Migration(1, "index", lambda con, progress: create_index(con, "item", ["value"]))]
+	assert Migrator(pool, steps).migrate() == 1
+	for _ in range(2):
+		SQLiteRepository(pool.db_file, Item, pool, indexes=["name"], drop_undeclared=True)
+		assert Migrator(pool, steps).pending() == []
+	indexes = {row[0] for row in pool.connection().execute(
+		"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'item'"
+	)}
+	assert indexes == {"mig_idx_item__value", "idx_item__name"}
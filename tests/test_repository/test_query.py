@@ -0,0 +1,108 @@
+from bookkeeper.repository.query import (
+    Eq, Ne, Lt, Le, Gt, Ge, Between, In, Period,
+    aggregate_objects, as_condition, matches, parse_order, order_objects
+)
+
+import pytest
+
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class Custom():
+    n: int = 0
+    s: str | None = None
+    pk: int = 0
+
+
+def test_conditions():
+    assert Eq(1).test(1) and not Eq(1).test(2)
+    assert Eq(None).test(None)
+    assert Ne(1).test(2) and not Ne(1).test(1)
+    assert Lt(1).test(0) and not Lt(1).test(1)
+    assert Le(1).test(1) and not Le(1).test(2)
+    assert Gt(1).test(2) and not Gt(1).test(1)
+    assert Ge(1).test(1) and not Ge(1).test(0)
+    assert Between(1, 3).test(1) and Between(1, 3).test(3)
+    assert not Between(1, 3).test(4)
+    assert In([1, 2]).test(2) and not In([1, 2]).test(3)
+
+
+def test_null_does_not_satisfy_comparisons():
+    for cond in (Ne(1), Lt(1), Le(1), Gt(1), Ge(1), Between(1, 2), In([1])):
+        assert not cond.test(None)
+
+
+def test_sql():
+    assert Eq(None).sql('a') == ('a IS NULL', [])
+    assert Eq(1).sql('a') == ('a = ?', [1])
+    assert Ge(1).sql('a') == ('a >= ?', [1])
+    assert Between(1, 2).sql('a') == ('a BETWEEN ? AND ?', [1, 2])
+    assert In(x for x in [1, 2]).sql('a') == ('a IN (?, ?)', [1, 2])
+
+
+def test_as_condition():
+    assert as_condition(1) == Eq(1)
+    assert as_condition(Gt(1)) == Gt(1)
+
+
+def test_matches():
+    obj = Custom(n=5, s='x')
+    assert matches(obj, None)
+    assert matches(obj, {'n': Between(1, 5), 's': 'x'})
+    assert not matches(obj, {'n': Between(1, 5), 's': 'y'})
+
+
+def test_parse_order():
+    assert parse_order(None) == []
+    assert parse_order('-n') == [('n', True)]
+    assert parse_order(['s', '-n']) == [('s', False), ('n', True)]
+
+
+def test_order_objects():
+    objs = [Custom(n=i % 3, s=str(i), pk=i) for i in range(7)]
+    assert [o.pk for o in order_objects(objs, 'n')] == [0, 3, 6, 1, 4, 2, 5]
+    assert [o.pk for o in order_objects(objs, '-n')] == [2, 5, 1, 4, 0, 3, 6]
+    assert [o.pk for o in order_objects(objs, ['-n', '-s'])] \
+        == [5, 2, 4, 1, 6, 3, 0]
+    assert [o.pk for o in order_objects(objs, '-n', limit=3, offset=1)] \
+        == [5, 1, 4]
+    assert [o.pk for o in order_objects(objs, ['n', 's'], limit=2)] == [0, 3]
+    objs = [Custom(s=s, pk=i) for i, s in enumerate(['b', None, 'a', None])]
+    assert [o.pk for o in order_objects(objs, 's')] == [1, 3, 2, 0]
+    assert [o.pk for o in order_objects(objs, '-s')] == [0, 2, 1, 3]
+    assert [o.pk for o in order_objects(objs, 's', limit=3)] == [1, 3, 2]
+    assert [o.pk for o in order_objects(objs, '-s', limit=3)] == [0, 2, 1]
+
+
+def test_period():
+    t = datetime(2023, 3, 12, 15, 9)
+    assert Period('t').key(t) == '2023-03-12'
+    assert Period('t', 'week').key(t) == '2023-10'
+    assert Period('t', 'month').key(t) == '2023-03'
+    assert Period('t', 'month').key(None) is None
+    with pytest.raises(ValueError):
+        Period('t', 'year')
+
+
+def test_aggregate_objects():
+    objs = [Custom(n=i, s=str(i % 2)) for i in range(5)] + [Custom(n=None, s='2')]
+    assert aggregate_objects(objs, 'n') == {(): 10}
+    assert aggregate_objects(objs, 'n', 'count') == {(): 5}
+    assert aggregate_objects(objs, 's', 'count') == {(): 6}
+    dated = [Custom(n=datetime(2023, 1, i)) for i in range(1, 4)]
+    assert aggregate_objects(dated, 'n', 'count') == {(): 3}
+    assert aggregate_objects(objs, 'n', 'sum', ['s']) \
+        == {('0',): 6, ('1',): 4, ('2',): 0}
+    assert aggregate_objects(objs, 'n', 'min', ['s']) \
+        == {('0',): 0, ('1',): 1, ('2',): None}
+    assert aggregate_objects(objs, 'n', 'max', ['s']) \
+        == {('0',): 4, ('1',): 3, ('2',): None}
+    assert aggregate_objects(objs, 'n', 'avg', ['s']) \
+        == {('0',): 2, ('1',): 2, ('2',): None}
+    assert aggregate_objects([], 'n') == {(): 0}
+    assert aggregate_objects([], 'n', 'max') == {(): None}
+    assert aggregate_objects([], 'n', 'sum', ['s']) == {}
+    with pytest.raises(ValueError):
+        aggregate_objects(objs, 'n', 'median')
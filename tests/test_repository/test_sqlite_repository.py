@@ -1,4 +1,7 @@
+from bookkeeper.repository.connection_pool import ConnectionPool
+from bookkeeper.repository.migrations import Migration, Migrator, convert_dates
 from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.query import Between, Ge, In, InSubtree, Lt, Ne, Period
 
 import pytest
 
@@ -8,6 +11,8 @@ from dataclasses import dataclass
 
 import os
 
+from inspect import isgenerator
+
 @dataclass
 class Custom():
 	pk: int = 0
@@ -96,3 +101,445 @@ def test_clear(repo, custom_class):
 	repo.clear()
 	with pytest.raises(KeyError):
 		repo.delete(pk)
+
+@pytest.fixture
+def pool():
+	path = "test_sqlite_repository.db"
+	if os.path.exists(path):
+		os.unlink(path)
+	with ConnectionPool(path, journal_mode="WAL", synchronous="NORMAL") as p:
+		yield p
+
+
+def test_persistent_pool_shared(pool, custom_class):
+	@dataclass
+	class Other():
+		name: str = ""
+		pk: int = 0
+
+	r1 = SQLiteRepository(pool.db_file, custom_class, pool)
+	r2 = SQLiteRepository(pool.db_file, Other, pool)
+	con = pool.connection()
+	pk = r1.add(custom_class())
+	r2.add(Other("test"))
+	assert pool.connection() is con
+	assert r1.get(pk) is not None
+	assert r2.get_all({'name': "test"})[0].name == "test"
+	assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+	assert con.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_pool_for_other_file(pool, custom_class):
+	with pytest.raises(ValueError):
+		SQLiteRepository("other.db", custom_class, pool)
+
+
+def test_close_and_reopen(pool, custom_class):
+	with SQLiteRepository(pool.db_file, custom_class, pool) as r:
+		con = pool.connection()
+		pk = r.add(custom_class())
+	assert pool.connection() is not con
+	assert r.get(pk) is not None
+
+
+
+def test_concurrent_reads_during_writes(pool, custom_class):
+	import sys
+	import threading
+	repo = SQLiteRepository(pool.db_file, custom_class, pool)
+	repo.add_many(custom_class(n=i) for i in range(100))
+	stop = threading.Event()
+	errors = []
+
+	def read():
+		try:
+			while not stop.is_set():
+				repo.get_all(limit=20)
+		except Exception as error:
+			errors.append(error)
+
+	interval = sys.getswitchinterval()
+	sys.setswitchinterval(1e-6)
+	reader = threading.Thread(target=read)
+	reader.start()
+	try:
+		for _ in range(500):
+			obj = custom_class()
+			pk = repo.add(obj)
+			assert pk > 100 and obj.pk == pk
+			repo.delete(pk)
+	finally:
+		stop.set()
+		reader.join()
+		sys.setswitchinterval(interval)
+	assert errors == []
+	assert len(repo.get_all()) == 100
+
+def test_add_many(repo, custom_class):
+	repo.add(custom_class())
+	objects = [custom_class(n=i) for i in range(5)]
+	pks = repo.add_many(objects)
+	assert pks == [o.pk for o in objects]
+	assert [repo.get(pk) for pk in pks] == objects
+
+
+def test_cannot_add_many_with_pk(repo, custom_class):
+	with pytest.raises(ValueError):
+		repo.add_many([custom_class(), custom_class(pk=1)])
+	assert repo.get_all() == []
+
+
+def test_update_many(repo, custom_class):
+	pks = repo.add_many(custom_class() for i in range(3))
+	objects = [custom_class(pk=pk, s=str(pk)) for pk in pks]
+	repo.update_many(objects)
+	assert repo.get_all() == objects
+
+
+def test_delete_many(repo, custom_class):
+	pks = repo.add_many(custom_class() for i in range(3))
+	repo.delete_many(pks[:2])
+	assert [o.pk for o in repo.get_all()] == pks[2:]
+	with pytest.raises(KeyError):
+		repo.delete_many([pks[2], pks[0]])
+	assert [o.pk for o in repo.get_all()] == pks[2:]
+
+
+def test_transaction_commit(repo, custom_class):
+	with repo.transaction():
+		pk = repo.add(custom_class())
+		repo.update(custom_class(pk=pk, s="updated"))
+	assert repo.get(pk).s == "updated"
+
+
+def test_transaction_rollback(repo, custom_class):
+	pk = repo.add(custom_class())
+	with pytest.raises(KeyError):
+		with repo.transaction():
+			repo.add(custom_class())
+			repo.delete(pk)
+			repo.delete(pk)
+	assert [o.pk for o in repo.get_all()] == [pk]
+
+
+def test_nested_transaction(repo, custom_class):
+	with repo.transaction():
+		pk1 = repo.add(custom_class())
+		with pytest.raises(ValueError):
+			with repo.transaction():
+				repo.add(custom_class())
+				raise ValueError
+		pk2 = repo.add(custom_class())
+	assert [o.pk for o in repo.get_all()] == [pk1, pk2]
+
+
+def test_transaction_across_repositories(pool, custom_class):
+	@dataclass
+	class Other():
+		name: str = ""
+		pk: int = 0
+
+	r1 = SQLiteRepository(pool.db_file, custom_class, pool)
+	r2 = SQLiteRepository(pool.db_file, Other, pool)
+	with pytest.raises(RuntimeError):
+		with r1.transaction(), r2.transaction():
+			r1.add(custom_class())
+			r2.add(Other())
+			raise RuntimeError
+	assert r1.get_all() == []
+	assert r2.get_all() == []
+
+
+def test_get_all_with_several_conditions(repo, custom_class):
+	objects = [custom_class(n=i % 2, s=str(i % 3)) for i in range(6)]
+	repo.add_many(objects)
+	assert repo.get_all({'n': 0, 's': '0'}) == [objects[0]]
+
+
+def test_get_all_with_null(repo, custom_class):
+	objects = [custom_class(s=None), custom_class()]
+	repo.add_many(objects)
+	assert repo.get_all({'s': None}) == [objects[0]]
+
+
+def test_update_where(repo, custom_class):
+	objects = [custom_class(n=i % 2) for i in range(5)]
+	repo.add_many(objects)
+	assert repo.update_where({'n': 0}, {'n': 2, 's': 'updated'}) == 3
+	assert [o.pk for o in repo.get_all({'n': 2, 's': 'updated'})] \
+		== [o.pk for o in objects[::2]]
+	assert repo.get_all({'n': 0}) == []
+
+
+def test_delete_where(repo, custom_class):
+	objects = [custom_class(n=i % 2) for i in range(5)]
+	repo.add_many(objects)
+	assert repo.delete_where({'n': 0}) == 3
+	assert repo.get_all() == objects[1::2]
+
+
+def test_get_all_with_query(repo, custom_class):
+	objects = [custom_class(n=i % 3, s=str(i)) for i in range(6)]
+	repo.add_many(objects)
+	assert repo.get_all({'n': Ge(1), 's': In(['1', '2', '3'])}) \
+		== [objects[1], objects[2]]
+	assert repo.get_all({'n': Between(1, 2), 'pk': Ne(objects[1].pk)}) \
+		== [objects[2], objects[4], objects[5]]
+	assert repo.get_all(order_by='-n', limit=3) \
+		== [objects[2], objects[5], objects[1]]
+	assert repo.get_all({'n': Lt(2)}, order_by='n', offset=2) \
+		== [objects[1], objects[4]]
+	assert repo.get_all(limit=2, offset=5) == [objects[5]]
+
+
+def test_get_all_unknown_field(repo):
+	with pytest.raises(ValueError):
+		repo.get_all({'unknown': 1})
+	with pytest.raises(ValueError):
+		repo.get_all(order_by='n; DROP TABLE custom')
+
+
+def _indexes(repo):
+	return {name: sql for name, sql in repo._execute(
+		"SELECT name, sql FROM sqlite_master WHERE type = 'index'"
+	)}
+
+
+def test_indexes(repo, custom_class):
+	repo = SQLiteRepository(repo.db_file, custom_class, indexes=['n', ('s', 't')])
+	assert set(_indexes(repo)) == {'idx_custom__n', 'idx_custom__s__t'}
+	plan = repo._execute("EXPLAIN QUERY PLAN SELECT * FROM custom WHERE n = 1")
+	assert 'idx_custom__n' in plan[0][-1]
+
+	repo = SQLiteRepository(repo.db_file, custom_class, indexes=['t'])
+	assert set(_indexes(repo)) == {'idx_custom__n', 'idx_custom__s__t', 'idx_custom__t'}
+	repo = SQLiteRepository(repo.db_file, custom_class)
+	assert len(_indexes(repo)) == 3
+
+	repo = SQLiteRepository(repo.db_file, custom_class, indexes=['t'], drop_undeclared=True)
+	assert set(_indexes(repo)) == {'idx_custom__t'}
+
+
+def test_indexes_keep_foreign(repo, custom_class):
+	repo._execute("CREATE INDEX other_index ON custom(f)")
+	repo = SQLiteRepository(repo.db_file, custom_class, indexes=['n'], drop_undeclared=True)
+	assert set(_indexes(repo)) == {'other_index', 'idx_custom__n'}
+
+
+def test_index_unknown_field(repo, custom_class):
+	with pytest.raises(ValueError):
+		SQLiteRepository(repo.db_file, custom_class, indexes=['unknown'])
+
+
+def test_iter_all(repo, custom_class):
+	objects = [custom_class(n=i % 3) for i in range(10)]
+	repo.add_many(objects)
+	gen = repo.iter_all({'n': Ge(1)}, order_by='-n', batch_size=3)
+	assert isgenerator(gen)
+	assert list(gen) == repo.get_all({'n': Ge(1)}, order_by='-n')
+	assert list(repo.iter_all(batch_size=4)) == objects
+
+
+def test_iter_all_keeps_connection(repo, custom_class):
+	repo.add_many(custom_class() for i in range(5))
+	gen = repo.iter_all(batch_size=2)
+	first = next(gen)
+	repo.add(custom_class())
+	assert ([first] + list(gen))[:5] == repo.get_all()[:5]
+
+
+def test_aggregate(repo, custom_class):
+	days = [datetime(2023, 3, d, 12) for d in (1, 1, 2, 9, 30)]
+	repo.add_many(custom_class(n=i, s=str(i % 2), t=t) for i, t in enumerate(days))
+	assert repo.aggregate('n') == {(): 10}
+	assert repo.aggregate('n', 'sum', {'n': Ge(10)}) == {(): 0}
+	assert repo.aggregate('n', 'count', {'t': Lt(days[3])}) == {(): 3}
+	assert repo.aggregate('n', 'avg', group_by=['s']) == {('0',): 2, ('1',): 2}
+	assert repo.aggregate('t', 'max') == {(): days[-1]}
+	assert repo.aggregate('n', 'sum', group_by=[Period('t')]) == {
+		('2023-03-01',): 1, ('2023-03-02',): 2,
+		('2023-03-09',): 3, ('2023-03-30',): 4,
+	}
+	assert repo.aggregate('n', 'sum', group_by=['s', Period('t', 'week')]) == {
+		('0', '2023-09'): 2, ('1', '2023-09'): 1,
+		('1', '2023-10'): 3, ('0', '2023-13'): 4,
+	}
+
+
+def test_aggregate_matches_memory(repo, custom_class):
+	from bookkeeper.repository.memory_repository import MemoryRepository
+	memory = MemoryRepository()
+	for i in range(20):
+		obj = custom_class(n=i % 7, s=str(i % 3), t=datetime(2023, 1 + i % 4, 1 + i))
+		repo.add(obj)
+		memory.add(custom_class(n=obj.n, s=obj.s, t=obj.t))
+	for func in ('sum', 'count', 'min', 'max', 'avg'):
+		for group_by in ([], ['s'], [Period('t', 'month')]):
+			assert repo.aggregate('n', func, {'n': Ge(2)}, group_by) \
+				== memory.aggregate('n', func, {'n': Ge(2)}, group_by)
+	for field in ('s', 't'):
+		assert repo.aggregate(field, 'count', group_by=['n']) \
+			== memory.aggregate(field, 'count', group_by=['n'])
+
+
+
+def test_paging_matches_memory(repo, custom_class):
+	from bookkeeper.repository.memory_repository import MemoryRepository
+	repo = SQLiteRepository(repo.db_file, custom_class, indexes=['n', 's'])
+	memory = MemoryRepository(indexes=['s'], sorted_indexes=['n'])
+	for i in range(30):
+		obj = custom_class(n=(i * 7) % 5, s=str(i % 3))
+		repo.add(obj)
+		memory.add(custom_class(n=obj.n, s=obj.s))
+	for where in (None, {'n': Ge(2)}, {'s': In(['0', '2'])}, {'n': Between(1, 3)}):
+		for order_by in (None, 'n', '-s'):
+			pages = [
+				[obj.pk for obj in repo.get_all(where, order_by, 4, offset)]
+				for offset in range(0, 32, 4)
+			]
+			assert pages == [
+				[obj.pk for obj in memory.get_all(where, order_by, 4, offset)]
+				for offset in range(0, 32, 4)
+			]
+			assert sorted(pk for page in pages for pk in page) \
+				== sorted(obj.pk for obj in repo.get_all(where))
+
+
+def test_order_nulls_matches_memory(pool):
+	from bookkeeper.models.category import Category
+	from bookkeeper.repository.memory_repository import MemoryRepository
+	repo = SQLiteRepository(pool.db_file, Category, pool)
+	memories = [MemoryRepository(), MemoryRepository(sorted_indexes=['parent'])]
+	for name, parent in [('a', None), ('b', 1), ('c', None), ('d', 3), ('e', 1)]:
+		for r in [repo, *memories]:
+			r.add(Category(name, parent))
+	for order_by in ('parent', '-parent', ['parent', '-name'], ['-parent', 'name']):
+		for limit, offset in ((None, 0), (2, 0), (2, 1), (10, 3)):
+			expected = [c.name for c in repo.get_all(None, order_by, limit, offset)]
+			for memory in memories:
+				assert [c.name for c in memory.get_all(None, order_by, limit, offset)] \
+					== expected, (order_by, limit, offset)
+	assert [c.name for c in repo.get_all(order_by='parent')] == ['a', 'c', 'b', 'e', 'd']
+	assert [c.name for c in repo.get_all(order_by='-parent')] == ['d', 'b', 'e', 'a', 'c']
+
+@pytest.fixture
+def hierarchy(pool):
+	from bookkeeper.models.category import Category
+	from bookkeeper.models.expense import Expense
+	cats = SQLiteRepository(pool.db_file, Category, pool)
+	exps = SQLiteRepository(pool.db_file, Expense, pool)
+	Category.create_from_tree(
+		[('продукты', None), ('мясо', 'продукты'), ('рыба', 'мясо'),
+		 ('хлеб', 'продукты'), ('книги', None)],
+		cats
+	)
+	pks = {cat.name: cat.pk for cat in cats.get_all()}
+	for amount, name in [(1, 'продукты'), (2, 'мясо'), (4, 'рыба'),
+	                     (8, 'хлеб'), (16, 'книги'), (32, 'рыба')]:
+		exps.add(Expense(amount, pks[name]))
+	return cats, exps, pks
+
+
+def test_descendants(hierarchy):
+	cats, _, pks = hierarchy
+	assert [c.name for c in cats.descendants(pks['продукты'])] == ['мясо', 'хлеб', 'рыба']
+	assert [c.name for c in cats.descendants(pks['мясо'])] == ['рыба']
+	assert cats.descendants(pks['книги']) == []
+
+
+def test_ancestors(hierarchy):
+	cats, _, pks = hierarchy
+	assert [c.name for c in cats.ancestors(pks['рыба'])] == ['мясо', 'продукты']
+	assert cats.ancestors(pks['продукты']) == []
+
+
+def test_in_subtree(hierarchy):
+	_, exps, pks = hierarchy
+	assert exps.aggregate('amount', where={'category': InSubtree(pks['продукты'])}) \
+		== {(): 47}
+	assert exps.aggregate('amount', where={'category': InSubtree(pks['мясо'])}) \
+		== {(): 38}
+	assert len(exps.get_all({'category': InSubtree(pks['рыба'])})) == 2
+	with pytest.raises(TypeError):
+		InSubtree(1).test(1)
+
+
+def test_hierarchy_matches_tree(hierarchy):
+	from bookkeeper.models.category_tree import CategoryTree
+	cats, exps, _ = hierarchy
+	tree = CategoryTree.from_repo(cats)
+	for cat in cats.get_all():
+		assert [c.pk for c in cats.ancestors(cat.pk)] == tree.ancestors(cat.pk)
+		assert {c.pk for c in cats.descendants(cat.pk)} == set(tree.descendants(cat.pk))
+		assert exps.aggregate('amount', where={'category': InSubtree(cat.pk)}) \
+			== exps.aggregate('amount', where={'category': In(tree.subtree(cat.pk))})
+
+
+def test_get_rows(repo, custom_class):
+	objs = [custom_class(n=i, t=datetime(2023, 1, 1, 12, 0, i, 123456)) for i in range(3)]
+	repo.add_many(objs)
+	rows = repo.get_rows(order_by='-n', limit=2)
+	assert rows == [(o.pk, o.s, o.n, o.f, o.t) for o in objs[::-1][:2]]
+	named = repo.get_rows({'n': 1}, named=True)
+	assert named[0].pk == objs[1].pk and named[0].t == objs[1].t
+	assert repo.get_all() == objs
+
+
+def test_row_factory_plain_class(pool):
+	class Plain:
+		a: int
+		pk: int
+
+		def __init__(self, a, pk=0):
+			self.a, self.pk = a, pk
+
+	repo = SQLiteRepository(pool.db_file, Plain, pool)
+	pk = repo.add(Plain(5))
+	obj = repo.get(pk)
+	assert (obj.pk, obj.a) == (pk, 5)
+
+
+def test_epoch_dates(pool, custom_class):
+	repo = SQLiteRepository(pool.db_file, custom_class, pool, epoch_dates=True)
+	objs = [custom_class(n=i, t=datetime(2023, 1 + i, 10, 12, 30, 15)) for i in range(4)]
+	repo.add_many(objs)
+	stored = pool.connection().execute("SELECT typeof(t), t + 0 FROM custom").fetchall()
+	assert stored[0] == ('integer', 1673353815)
+	assert repo.get_all() == objs
+	assert repo.get_all({'t': Between(datetime(2023, 2, 1), datetime(2023, 3, 31))}) == objs[1:3]
+	assert repo.get_all({'t': objs[2].t}) == [objs[2]]
+	assert repo.aggregate('t', 'max') == {(): objs[3].t}
+	assert repo.aggregate('n', 'count', group_by=[Period('t', 'month')]) \
+		== {('2023-01',): 1, ('2023-02',): 1, ('2023-03',): 1, ('2023-04',): 1}
+	repo.update_where({'n': 0}, {'t': datetime(2024, 1, 1)})
+	assert repo.get(objs[0].pk).t == datetime(2024, 1, 1)
+
+
+def test_convert_dates(pool, custom_class):
+	repo = SQLiteRepository(pool.db_file, custom_class, pool, indexes=['t'])
+	objs = [custom_class(n=i, t=datetime(2023, 3, 1 + i, 8, 0, 0, 5)) for i in range(3)]
+	repo.add_many(objs)
+	repo.delete(objs[0].pk)
+	with pytest.raises(ValueError):
+		SQLiteRepository(pool.db_file, custom_class, pool, epoch_dates=True)
+	assert pool.connection().execute("SELECT typeof(t) FROM custom").fetchone() == ('text',)
+
+	steps = [
+		Migration(1, "epoch", lambda con, progress: convert_dates(con, 'custom', ['t'], True)),
+		Migration(2, "text", lambda con, progress: convert_dates(con, 'custom', ['t'], False)),
+	]
+	Migrator(pool, steps[:1]).migrate()
+	epoch = SQLiteRepository(pool.db_file, custom_class, pool, epoch_dates=True)
+	assert [(o.pk, o.t) for o in epoch.get_all()] \
+		== [(o.pk, o.t.replace(microsecond=0)) for o in objs[1:]]
+	indexes = pool.connection().execute(
+		"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'custom'"
+	).fetchall()
+	assert indexes == [('idx_custom__t',)]
+	with pytest.raises(ValueError):
+		SQLiteRepository(pool.db_file, custom_class, pool)
+
+	Migrator(pool, steps).migrate()
+	back = SQLiteRepository(pool.db_file, custom_class, pool)
+	assert [o.t for o in back.get_all()] == [o.t.replace(microsecond=0) for o in objs[1:]]
+	assert pool.connection().execute("SELECT typeof(t) FROM custom").fetchone() == ('text',)
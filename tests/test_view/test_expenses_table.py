@@ -1,9 +1,10 @@
 
-from bookkeeper.view.expenses_table import ExpensesWidget
+from bookkeeper.view.expenses_table import ExpensesModel, ExpensesWidget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
 from bookkeeper.repository.abstract_repository import AbstractRepository
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Ge
 from bookkeeper.utils import read_tree
 
 import pytest
@@ -100,3 +101,166 @@ def test_hello(qtbot, cat_repo, exp_repo):
 		widget.table,
 		qt_api.QtCore.Qt.MouseButton.LeftButton
 	)
+
+
+def test_incremental_changes(qtbot, cat_repo, exp_repo):
+	from datetime import datetime
+
+	cat2pk = lambda name: cat_repo.get_all({"name": name})[0].pk
+	widget = ExpensesWidget(
+		lambda pk: cat_repo.get(pk).name, cat2pk,
+		exp_repo.get_all, lambda: [cat.name for cat in cat_repo.get_all()]
+	)
+	qtbot.addWidget(widget)
+	widget.update()
+	model = widget.model
+	assert model.rowCount() == len(exp_repo.get_all())
+
+	exp = Expense(1.0, cat2pk('хлеб'), expense_date=datetime(2023, 3, 10))
+	exp_repo.add(exp)
+	widget.expense_added(exp)
+	assert model.rowCount() == len(exp_repo.get_all())
+	assert model.row_of(exp.pk) == 6
+	assert [e.pk for e in model.rows] == [
+		e.pk for e in exp_repo.get_all(order_by='-expense_date')
+	]
+
+	exp.amount = 2.0
+	widget.expense_updated(exp, 'amount')
+	assert model.data(model.index(6, 1)) == '2.00'
+
+	exp.expense_date = datetime(2024, 1, 1)
+	widget.expense_updated(exp, 'expense_date')
+	assert model.row_of(exp.pk) == 0
+
+	exp_repo.delete(exp.pk)
+	widget.expense_deleted(exp.pk)
+	assert model.row_of(exp.pk) is None
+	assert model.rowCount() == len(exp_repo.get_all())
+
+
+@pytest.fixture
+def ledger():
+	from datetime import datetime, timedelta
+	repo = MemoryRepository[Expense]()
+	repo.add_many(
+		Expense(i, 1, expense_date=datetime(2023, 1, 1) + timedelta(days=i))
+		for i in range(25)
+	)
+	return repo
+
+
+def _model(repo, page_size=10):
+	return ExpensesModel(
+		repo.get_all, lambda exp, col: str(exp.amount), lambda *args: None,
+		page_size=page_size
+	)
+
+
+def test_model_pages(qtbot, ledger):
+	model = _model(ledger)
+	expected = [exp.pk for exp in ledger.get_all(order_by='-expense_date')]
+	assert model.rowCount() == 0 and model.canFetchMore()
+	model.fetchMore()
+	assert [exp.pk for exp in model.rows] == expected[:10]
+	assert model.data(model.index(9, 0)) == str(model.expense(9).amount)
+	model.fetchMore()
+	assert [exp.pk for exp in model.rows] == expected[:20]
+	assert model.canFetchMore()
+	model.fetchMore()
+	assert [exp.pk for exp in model.rows] == expected
+	assert model.exhausted and not model.canFetchMore()
+	model.fetchMore()
+	assert model.rowCount() == 25
+
+	model.reset()
+	assert [exp.pk for exp in model.rows] == expected[:10]
+	assert model.canFetchMore()
+
+
+def test_model_page_boundary(qtbot, ledger):
+	ledger.delete_where({'amount': Ge(20)})
+	model = _model(ledger)
+	model.fetchMore()
+	model.fetchMore()
+	assert model.rowCount() == 20
+	assert model.canFetchMore()
+	model.fetchMore()
+	assert model.rowCount() == 20
+	assert not model.canFetchMore()
+
+	exp = Expense(100, 1)
+	ledger.add(exp)
+	model.insert_expense(exp)
+	assert model.row_of(exp.pk) == 0
+	assert model.rowCount() == 21
+
+
+def test_model_not_loaded_insert(qtbot, ledger):
+	from datetime import datetime
+	model = _model(ledger)
+	model.fetchMore()
+	old = Expense(100, 1, expense_date=datetime(2000, 1, 1))
+	ledger.add(old)
+	model.insert_expense(old)
+	assert model.row_of(old.pk) is None
+	while model.canFetchMore():
+		model.fetchMore()
+	assert model.row_of(old.pk) == 25
+
+
+def test_model_delete_while_loading(qtbot, ledger):
+	import threading
+	from bookkeeper.view.loader import Loader
+	release = threading.Event()
+
+	def get_exps(**kwargs):
+		release.wait(5)
+		return ledger.get_all(**kwargs)
+
+	loader = Loader()
+	model = ExpensesModel(
+		get_exps, lambda exp, col: str(exp.amount), lambda *args: None,
+		page_size=10, loader=loader
+	)
+	release.set()
+	model.fetchMore()
+	qtbot.waitUntil(lambda: not model.loading)
+	release.clear()
+	model.fetchMore()
+	deleted = model.expense(3).pk
+	ledger.delete(deleted)
+	model.remove_expense(deleted)
+	release.set()
+	qtbot.waitUntil(lambda: not model.loading)
+	loader.wait()
+	assert [exp.pk for exp in model.rows] \
+		== [exp.pk for exp in ledger.get_all(order_by='-expense_date')][:19]
+
+
+def test_model_set_data(qtbot, cat_repo, exp_repo):
+	cat2pk = lambda name: cat_repo.get_all({"name": name})[0].pk
+	widget = ExpensesWidget(
+		lambda pk: cat_repo.get(pk).name, cat2pk,
+		exp_repo.get_all, lambda: [cat.name for cat in cat_repo.get_all()]
+	)
+	qtbot.addWidget(widget)
+	updates = []
+	widget.update_expense.connect(lambda *args: updates.append(args))
+	widget.update()
+	model = widget.model
+	Qt = qt_api.QtCore.Qt
+
+	assert not model.flags(model.index(0, 0)) & Qt.ItemIsEditable
+	assert model.flags(model.index(0, 1)) & Qt.ItemIsEditable
+	assert not model.setData(model.index(0, 1), "1", Qt.DisplayRole)
+
+	exp = model.expense(1)
+	assert model.setData(model.index(1, 1), "12.5")
+	assert model.setData(model.index(1, 2), "сыр")
+	assert model.setData(model.index(1, 3), "скидка")
+	assert updates == [
+		(exp, "amount", 12.5),
+		(exp, "category", cat2pk("сыр")),
+		(exp, "comment", "скидка"),
+	]
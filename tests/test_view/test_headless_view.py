@@ -0,0 +1,68 @@
+from bookkeeper.view.headless_view import HeadlessView
+from bookkeeper.presenter import Bookkeeper
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def view():
+	cat_repo = MemoryRepository[Category]()
+	exp_repo = MemoryRepository[Expense]()
+	food = Category('food')
+	cat_repo.add(food)
+	exp_repo.add_many(Expense(i, food.pk) for i in range(1, 6))
+	view = HeadlessView(page_size=3)
+	Bookkeeper(view, exp_repo, cat_repo)
+	return view
+
+
+def test_no_qt():
+	code = "import sys, bookkeeper.view.headless_view; print(any('PySide' in m for m in sys.modules))"
+	out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+	assert out.stdout.strip() == "False"
+
+
+def test_update(view):
+	assert view.updates == 1
+	assert len(view.expenses) == 3
+	assert [c.name for c in view.categories] == ['food']
+	assert len(view.budget) == len(view.budget_days)
+
+
+def test_handlers(view):
+	assert {'exp_create', 'exp_reads', 'cat_create', 'cat_delete'} <= view.handlers.keys()
+	view.handler('exp_create')(7.0, 'food')
+	(event, pk), = view.events
+	assert event == 'expense_added'
+	exp = view.handler('exp_read')(pk)
+	assert exp.amount == 7.0
+	view.handler('exp_update')(exp, 'amount', 8.0)
+	view.handler('exp_delete')(pk)
+	assert [e for e, _ in view.events] == ['expense_added', 'expense_updated', 'expense_deleted']
+	assert view.statuses == [
+		"Добавлена запись расходов.", "Запись расходов обновлена.", "Запись расходов удалена."
+	]
+	assert view.updates == 1
+
+
+def test_categories(view):
+	view.handler('cat_create')('fruit', 'food')
+	assert [c.name for c in view.categories] == ['food', 'fruit']
+	view.handler('cat_delete')('fruit')
+	assert [e for e, _ in view.events] == ['category_added', 'category_deleted']
+	assert view.updates == 2
+	view.handler('cat_delete')('fruit')
+	assert view.statuses[-1] == "Категория [fruit] не существует!"
+
+
+def test_no_page():
+	view = HeadlessView(page_size=None)
+	Bookkeeper(view, MemoryRepository[Expense](), MemoryRepository[Category]())
+	assert view.updates == 1
+	assert view.expenses == []
@@ -0,0 +1,92 @@
+from bookkeeper.view.loader import Loader
+from bookkeeper.view.expenses_table import ExpensesModel
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def loader(qtbot):
+	loader = Loader()
+	yield loader
+	loader.wait()
+
+
+def test_background(qtbot, loader):
+	results = []
+	threads = []
+	loader.request("key", lambda: threads.append(threading.get_ident()) or 1, results.append)
+	assert loader.pending("key")
+	qtbot.waitUntil(lambda: results == [1])
+	assert not loader.pending("key")
+	assert threads != [threading.get_ident()]
+
+
+def test_superseded(qtbot, loader):
+	started = threading.Event()
+	release = threading.Event()
+	results = []
+
+	def slow():
+		started.set()
+		release.wait(5)
+		return "old"
+
+	loader.request("key", slow, results.append)
+	started.wait(5)
+	loader.request("key", lambda: "queued", results.append)
+	loader.request("key", lambda: "new", results.append)
+	release.set()
+	loader.wait()
+	qtbot.waitUntil(lambda: results == ["new"])
+	qtbot.wait(10)
+	assert results == ["new"]
+
+
+def test_cancel(qtbot, loader):
+	release = threading.Event()
+	results = []
+	loader.request("other", lambda: release.wait(5), lambda _: None)
+	loader.request("key", lambda: "value", results.append)
+	loader.cancel("key")
+	release.set()
+	loader.wait()
+	qtbot.wait(10)
+	assert results == []
+	assert not loader.pending("key")
+
+
+def test_failed(qtbot, loader):
+	errors = []
+	loader.failed.connect(lambda key, error: errors.append((key, str(error))))
+	loader.request("key", lambda: 1 / 0, lambda _: None)
+	qtbot.waitUntil(lambda: errors == [("key", "division by zero")])
+
+
+def test_synchronous():
+	results = []
+	loader = Loader(background=False)
+	loader.request("key", lambda: 1, results.append)
+	assert results == [1]
+	assert not loader.pending("key")
+
+
+def test_model_background(qtbot, loader):
+	repo = MemoryRepository[Expense]()
+	repo.add_many(Expense(i, 1) for i in range(25))
+	model = ExpensesModel(repo.get_all, lambda exp, col: "", lambda *args: None,
+		page_size=10, loader=loader)
+	model.fetchMore()
+	assert model.loading and not model.canFetchMore()
+	qtbot.waitUntil(lambda: model.rowCount() == 10)
+	model.fetchMore()
+	model.reset()
+	qtbot.waitUntil(lambda: not model.loading)
+	assert model.rowCount() == 10
+	while model.canFetchMore():
+		model.fetchMore()
+		qtbot.waitUntil(lambda: not model.loading)
+	assert sorted(exp.pk for exp in model.rows) == list(range(1, 26))
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from PySide6.QtCore import QDateTime
+
+from bookkeeper.view import utils
+
+
+def test_datetime_conversions():
+	time = datetime(2023, 3, 12, 15, 9, 7)
+	text = "2023-03-12 15:09:07"
+	assert utils.datetime2str(time) == text
+	assert utils.datetime2str(time.replace(microsecond=123)) == text
+	assert utils.str2datetime(text) == time
+	qtime = utils.datetime2qdatetime(time)
+	assert qtime == QDateTime.fromString(text, utils.datetime_formats["Qt"])
+	assert utils.qdatetime2str(qtime) == text
+	assert utils.qdatetime2datetime(qtime) == time
+	assert utils.str2qdatetime(text) == qtime